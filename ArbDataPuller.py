@@ -1,10 +1,9 @@
 # =============================================================================
 # IMPORTS
 # =============================================================================
-import os, sys, json
+import os, sys, json, time, threading
 import boto3
 from dotenv import load_dotenv
-import pandas as pd
 import concurrent.futures
 from itertools import repeat
 
@@ -26,7 +25,23 @@ from classes.DiscordAlert import DiscordAlert
 from classes.EodDiff import EodDiff
 from classes.SaveRawData import SaveRawData
 from classes.FrozenOrderbook import FrozenOrderbook
+from classes.QuoteStore import QuoteStore
+from classes.QueryServer import QueryServer
+from classes.AdaptiveScheduler import AdaptiveScheduler
+from classes.TickReporter import TickReporter
+from classes.SinkPipeline import get_sink_pipeline
+from classes.Profiler import Profiler
+from classes.ExecutableSpreads import ExecutableSpreads
+from classes.SpreadSketches import SpreadSketches
+from classes.LeadLag import LeadLag
+from classes.SpreadBars import SpreadBars
+from classes.SharedQuotes import SharedQuotePublisher
+from classes.ShardMerger import ShardMerger
+from classes.FetchBarrier import FetchBarrier
+from classes.TickPipeline import TickPipeline
+from utils.constants import QUERY_SERVER_PORT, SHARD_INDEX
 from utils.discord_hook import ping_private_discord
+from utils.s3_paths import create_raw_base_path
 
 # =============================================================================
 # CONFIG
@@ -45,21 +60,43 @@ s3 = boto3.client(
 # CLASS
 # =============================================================================
 class ArbDataPuller:
-    def __init__(self, market: str, exchanges_obj: dict):
+    def __init__(
+        self,
+        market: str,
+        exchanges_obj: dict,
+        config: dict = None,
+        query_port: int = QUERY_SERVER_PORT,
+    ):
         self.market = self.check_market(market)
         self.exchanges_obj = exchanges_obj
+        self.config = config or {}  # answers to the prompts, for headless runs
+        self.running = True
         self.interval = self.ask_user_for_interval()
 
         self.exchanges = self.make_list_of_exchanges(exchanges_obj)
         self.diff_pairs = self.create_unique_exchange_pairs()
         self.S3_BASE_PATHS = self.determine_general_s3_filepaths()
         self.s3 = s3
+        self.Sinks = get_sink_pipeline(self.s3)
 
         self.GetBidAsks = GetBidAsks(self)
+        self.FetchBarrier = FetchBarrier(self)
         self.FrozenOrderbook = FrozenOrderbook(self)
+        self.ExecutableSpreads = ExecutableSpreads(self)
+        self.SpreadSketches = SpreadSketches(self)
+        self.LeadLag = LeadLag(self)
+        self.SpreadBars = SpreadBars(self)
+        self.SharedQuotes = SharedQuotePublisher(self)
         self.Discord = DiscordAlert(self)
         self.SaveRawData = SaveRawData(self)
         self.EodDiff = EodDiff(self)
+        self.Shards = ShardMerger(self)
+        self.QueryServer = QueryServer(self, port=query_port)
+        self.Scheduler = AdaptiveScheduler(self)
+        self.TickReporter = TickReporter(self)
+        self.Profiler = Profiler(self)
+        self.Pipeline = TickPipeline(self)
+        self.check_interval_against_rate_limits()
 
     # =============================================================================
     # Get market data for exchanges, iterate infinitely
@@ -67,77 +104,94 @@ class ArbDataPuller:
     def main(self):
         print("MAKE SURE THRESHS ARE APPROPRIATE!")
         self.reset_for_new_day()
-        sleep_to_desired_interval(self.interval)
-        while True:
+        self.QueryServer.start()
+        self.sleep_to_next_tick()
+        while self.running:
             if determine_if_new_day(self.midnight):
                 self.handle_midnight_event()
             self.get_bid_ask_and_process_df_and_test_diff()
-            sleep_to_desired_interval(self.interval)
+            self.sleep_to_next_tick()
+
+    # =============================================================================
+    # Sleep to the next grid point (shifted by this shard's phase offset), a
+    # fetch barrier's lead earlier to prepare the requests
+    # =============================================================================
+    def sleep_to_next_tick(self):
+        interval = self.Scheduler.interval
+        offset = self.Shards.determine_phase_offset()
+        sleep_to_desired_interval(interval, offset - self.FetchBarrier.lead)
 
     # =============================================================================
     # It's midnight! Save important data and reset for next day
     # =============================================================================
     def handle_midnight_event(self):
-        if self.today not in [
-            "2023-01-27",
-            "2023-01-28",
-            "2023-01-29",
-        ]:
-            self.SaveRawData.save_raw_bid_ask_data_to_s3()
-            self.EodDiff.determine_eod_diff_n_create_summary(self.df_obj, self.today)
+        with self.Profiler.stage("eod"):
+            if not self.Pipeline.drain():
+                print(f"{self.market}: pipeline not drained, EOD misses ticks.")
+            if self.today not in [
+                "2023-01-27",
+                "2023-01-28",
+                "2023-01-29",
+            ]:
+                self.save_raw_data_n_eod_diff()
         self.reset_for_new_day()  # must come last!
 
     # =============================================================================
-    # Get bid ask data and update dataframe obj for all exchanges
+    # Sharded: save the shard, shard 0 diffs the merged day in the background
+    # =============================================================================
+    def save_raw_data_n_eod_diff(self):
+        if self.Shards.enabled:
+            return self.Shards.save_shard_n_merge(self.today)
+        self.SaveRawData.save_raw_bid_ask_data_to_s3()
+        self.SpreadSketches.save_sidecar(self.today)
+        self.EodDiff.determine_eod_diff_n_create_summary(self.df_obj, self.today)
+
+    # =============================================================================
+    # Fetch & schedule on the tick thread, store & analyses go to the pipeline
     # =============================================================================
     def get_bid_ask_and_process_df_and_test_diff(self) -> dict:
-        bid_asks = self.get_bid_ask_from_exchanges()
-        self.update_df_obj_with_new_bid_ask_data(bid_asks)
-        self.FrozenOrderbook.check_all_orderbooks_if_frozen()
-        self.Discord.determine_exchange_diff_and_alert_discord(bid_asks)
-        print("=========================================\n")
-        jprint(self.df_obj)
+        self.Profiler.start_tick()
+        self.TickReporter.start_tick()
+        with self.Profiler.stage("fetch"):
+            bid_asks = self.get_bid_ask_from_exchanges()
+        sampled_at = next(iter(bid_asks.values()))["timestamp"]
+        interval = self.Scheduler.determine_slept_interval(sampled_at)
+        with self.Profiler.stage("schedule"):
+            self.Scheduler.update(bid_asks)
+        self.Pipeline.submit(bid_asks, interval)
+        self.TickReporter.end_tick(bid_asks, dict(self.GetBidAsks.latencies))
+        self.Profiler.end_tick()
 
     # =============================================================================
     # Get current bid ask data from exchange using THREADDING
     # =============================================================================
     def get_bid_ask_from_exchanges(self) -> dict:
+        if self.FetchBarrier.enabled:
+            interval = self.Scheduler.interval
+            offset = self.Shards.determine_phase_offset()
+            return self.FetchBarrier.fetch_all(interval, offset)
         bid_asks = {}
         now = determine_cur_utc_timestamp()
+        self.FetchBarrier.start_tick()
         with concurrent.futures.ThreadPoolExecutor() as executor:
             result = executor.map(
-                self.GetBidAsks.get_bid_ask_from_specific_exchange,
+                self.FetchBarrier.fetch_one,  # records send times
                 self.exchanges_obj.items(),
                 repeat(now),
             )
             for r in result:
                 exchange, bid_ask = r
                 bid_asks[exchange] = bid_ask
+        self.FetchBarrier.record_skew()
         return bid_asks
 
     # =============================================================================
-    # If no data frame exists, create dataframe
-    # =============================================================================
-    def update_df_obj_with_new_bid_ask_data(self, bid_asks: dict) -> dict:
-        for exchange, bid_ask in bid_asks.items():
-            if exchange not in self.df_obj:
-                df = self.create_new_df_with_bid_ask(bid_ask)
-            else:
-                cur_df = self.df_obj[exchange]
-                df = self.append_existing_df_with_bid_ask(bid_ask, cur_df)
-            self.df_obj[exchange] = df
-
-    # =============================================================================
-    # Start of new day, create a new df
-    # =============================================================================
-    def create_new_df_with_bid_ask(self, bid_ask) -> pd.DataFrame:
-        return pd.DataFrame([bid_ask])
-
-    # =============================================================================
-    # Append to existing dataframe
+    # Append new bid ask rows to the quote store for all exchanges
     # =============================================================================
-    def append_existing_df_with_bid_ask(self, bid_ask, df):
-        return pd.concat([df, pd.DataFrame([bid_ask])], ignore_index=True)
+    def update_df_obj_with_new_bid_ask_data(self, bid_asks: dict, interval) -> dict:
+        for bid_ask in bid_asks.values():
+            bid_ask["interval"] = interval  # weight for EOD stats
+        self.df_obj.append_tick(bid_asks, interval)
 
     # =============================================================================
     #
@@ -174,8 +228,7 @@ class ArbDataPuller:
     def determine_general_s3_filepaths(self) -> dict:
         s3_base_paths = {}
         for exchange in self.exchanges_obj.keys():
-            path = f"{exchange}/{self.market}/{exchange}-{self.market}"
-            s3_base_paths[exchange] = path
+            s3_base_paths[exchange] = create_raw_base_path(exchange, self.market)
         return s3_base_paths
 
     # =============================================================================
@@ -184,17 +237,47 @@ class ArbDataPuller:
     def reset_for_new_day(self):
         self.today = determine_today_str_timestamp()
         self.midnight = determine_next_midnight()
-        self.df_obj = {}
+        old_store = getattr(self, "df_obj", None)
+        self.df_obj = QuoteStore(exchanges=self.exchanges)
+        self.GetBidAsks.Metadata.refresh_in_background(self.exchanges)  # ttl'd
+        self.ExecutableSpreads.reset_day_stats()
+        self.SpreadSketches.reset_day()
+        if old_store is not None:
+            old_store.close()  # removes spilled files of the previous day
+
+    # =============================================================================
+    # Warn if the interval can't be sustained within the exchanges' rate limits
+    # =============================================================================
+    def check_interval_against_rate_limits(self):
+        limiter = self.GetBidAsks.RateLimiter
+        interval = min(self.Scheduler.ladder)
+        for exchange in self.exchanges:
+            min_interval = limiter.determine_min_interval(exchange, 1)
+            retries = limiter.determine_retry_budget(exchange, interval, 1)
+            if min_interval > interval:
+                msg = f"WARNING: {exchange} rate limit allows one request every {round(min_interval, 2)}s, interval is {interval}s."
+                print(msg)
+            elif retries >= 0:
+                print(f"{exchange}: {retries} retries per tick fit into rate limit.")
 
     # =============================================================================
     # Ask user for interval on how often to fetch bid/ask
     # =============================================================================
     def ask_user_for_interval(self):
-        inp = int(input("Specify the desired interval in seconds: ").strip())
+        prompt = "Specify the desired interval in seconds: "
+        inp = int(str(self.ask_user("interval", prompt)).strip())
         if inp < 5:
             raise ValueError("Interval is too small. Execution cancelled.")
         return inp
 
+    # =============================================================================
+    # Take answer from config if given (headless), otherwise prompt the user
+    # =============================================================================
+    def ask_user(self, key: str, prompt: str):
+        if key in self.config:
+            return self.config[key]
+        return input(prompt)
+
     # =============================================================================
     # Make sure standardized market input has a valid format
     # =============================================================================
@@ -204,20 +287,45 @@ class ArbDataPuller:
         return market
 
 
+# =============================================================================
+# Several markets in one process (FETCH_MODE=batched coalesces their requests)
+# =============================================================================
+def run_pullers_in_threads(pullers: list):
+    threads = []
+    for puller in pullers:
+        thread = threading.Thread(target=puller.main, name=puller.market, daemon=True)
+        thread.start()
+        threads.append(thread)
+    while all(t.is_alive() for t in threads):
+        time.sleep(1)
+    dead = [t.name for t in threads if not t.is_alive()]
+    raise Exception(f"Puller thread(s) stopped: {dead}")
+
+
 if __name__ == "__main__":
     # to activate EC2: ssh -i "ec2-arb-stats.pem" ec2-user@ec2-3-120-243-216.eu-central-1.compute.amazonaws.com
     # to active venv: source venv/bin/activate
     # BTC-USD '{"DYDX": "BTC-USD", "BINANCE_GLOBAL": "BTCBUSD"}'
     # ETH-USD '{"DYDX": "ETH-USD", "BINANCE_GLOBAL": "ETHBUSD"}'
-    if len(sys.argv) < 3:
+    # several markets: BTC-USD '{...}' ETH-USD '{...}'
+    if len(sys.argv) < 3 or len(sys.argv) % 2 == 0:
         raise Exception(
             'Need to enter exchanges dict like so: \'{"BINANCE_GLOBAL": "BTC/USD", "DYDX": "BTC-USD"}\''
         )
-    market = sys.argv[1]
-    exchanges_obj = json.loads(sys.argv[2])
-    obj = ArbDataPuller(market=market, exchanges_obj=exchanges_obj)
+    markets = {}
+    for market, exchanges_json in zip(sys.argv[1::2], sys.argv[2::2]):
+        markets[market] = json.loads(exchanges_json)
+    pullers = []
+    for i, (market, exchanges_obj) in enumerate(markets.items()):
+        # one port per market & shard, shards run as processes on the same host
+        port = QUERY_SERVER_PORT + SHARD_INDEX * len(markets) + i
+        port = port if QUERY_SERVER_PORT else 0
+        pullers.append(ArbDataPuller(market, exchanges_obj, query_port=port))
     try:
-        ping_private_discord(f"Initiating arb-tracker for {market} on {exchanges_obj}")
-        obj.main()
+        ping_private_discord(f"Initiating arb-tracker for {markets}")
+        if len(pullers) == 1:
+            pullers[0].main()
+        else:
+            run_pullers_in_threads(pullers)
     finally:
         ping_private_discord("ALARM: ARB_DATAPULLER EXECUTION WAS STOPPED")
@@ -0,0 +1,134 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import numpy as np
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.constants import (
+    SAMPLING_MODE,
+    ADAPTIVE_FLOOR_SECS,
+    ADAPTIVE_CEILING_SECS,
+    ADAPTIVE_VOL_HIGH,
+    ADAPTIVE_VOL_LOW,
+    ADAPTIVE_CHANGE_RATE_HIGH,
+    ADAPTIVE_CALM_TICKS,
+)
+
+QUOTE_COLS = ["bid_price", "bid_size", "ask_price", "ask_size"]
+
+
+# =============================================================================
+# Decides the sampling interval of the next tick.
+# fixed:    always the user's interval.
+# adaptive: steps between floor * 2^k (stays on the floor's grid) up to the
+#           ceiling. Tightens when spreads move or quotes change a lot, backs
+#           off after ADAPTIVE_CALM_TICKS calm ticks (e.g. static books).
+# =============================================================================
+class AdaptiveScheduler:
+    def __init__(self, Caller, mode: str = SAMPLING_MODE):
+        self.Caller = Caller
+        self.mode = mode
+        self.ladder = self.create_interval_ladder(Caller.interval)
+        self.level = self.determine_start_level(Caller.interval)
+        self.interval = self.ladder[self.level]
+
+        self.alpha = 0.3  # ewm weight of the newest tick for the signals
+        self.spread_vol = 0.0
+        self.change_rate = 0.0
+        self.calm_ticks = 0
+        self.prev_quotes = None
+        self.prev_spreads = None
+        self.last_sampled_at = None
+
+    # =============================================================================
+    # Update signals with this tick's quotes and pick the next interval
+    # =============================================================================
+    def update(self, bid_asks: dict) -> float:
+        if self.mode != "adaptive":
+            return self.interval
+        quotes, spreads = self.extract_quotes_and_spreads(bid_asks)
+        if self.prev_quotes is not None:
+            self.update_signals(quotes, spreads)
+            self.adjust_interval()
+        self.prev_quotes, self.prev_spreads = quotes, spreads
+        return self.interval
+
+    # =============================================================================
+    # Secs since the previous tick was sampled, the time this tick's row stands
+    # for in the weighted EOD stats. Includes ladder changes (the first tick on
+    # a new rung waits for the rung's grid point) and late or skipped ticks.
+    # Capped at the slowest rung, longer gaps are outages, not sampled time
+    # =============================================================================
+    def determine_slept_interval(self, sampled_at) -> float:
+        last, self.last_sampled_at = self.last_sampled_at, sampled_at
+        if last is None:
+            return float(self.interval)
+        secs = (sampled_at - last).total_seconds()
+        return min(max(secs, 0.0), float(max(self.ladder)))
+
+    # =============================================================================
+    # EWM of |change in pct spread| and of the share of books that changed
+    # =============================================================================
+    def update_signals(self, quotes: np.ndarray, spreads: np.ndarray):
+        with np.errstate(invalid="ignore"):
+            moves = np.abs(spreads - self.prev_spreads)
+        vol = np.nanmean(moves) if np.any(~np.isnan(moves)) else 0.0
+        both_nan = np.isnan(quotes) & np.isnan(self.prev_quotes)
+        changed = np.any((quotes != self.prev_quotes) & ~both_nan, axis=1).mean()
+        self.spread_vol += self.alpha * (vol - self.spread_vol)
+        self.change_rate += self.alpha * (changed - self.change_rate)
+
+    # =============================================================================
+    # Step one level down when busy, one level up after enough calm ticks
+    # =============================================================================
+    def adjust_interval(self):
+        busy = (
+            self.spread_vol >= ADAPTIVE_VOL_HIGH
+            or self.change_rate >= ADAPTIVE_CHANGE_RATE_HIGH
+        )
+        calm = self.spread_vol <= ADAPTIVE_VOL_LOW and not busy
+        self.calm_ticks = self.calm_ticks + 1 if calm else 0
+        if busy and self.level > 0:
+            self.level -= 1
+        elif (
+            self.calm_ticks >= ADAPTIVE_CALM_TICKS and self.level < len(self.ladder) - 1
+        ):
+            self.level += 1
+            self.calm_ticks = 0
+        self.interval = self.ladder[self.level]
+
+    # =============================================================================
+    # Quote matrix (exchanges x QUOTE_COLS) + pct mid spreads of all pairs
+    # =============================================================================
+    def extract_quotes_and_spreads(self, bid_asks: dict) -> tuple:
+        exchanges = self.Caller.exchanges
+        quotes = np.array(
+            [[bid_asks[ex][c] for c in QUOTE_COLS] for ex in exchanges], dtype=float
+        )
+        mids = {ex: bid_asks[ex]["mid"] for ex in exchanges}
+        spreads = []
+        for pair in self.Caller.diff_pairs:
+            ex0, ex1 = pair.split("-")
+            spreads.append(
+                (mids[ex0] - mids[ex1]) / ((mids[ex0] + mids[ex1]) / 2) * 100
+            )
+        return quotes, np.array(spreads, dtype=float)
+
+    # =============================================================================
+    # floor, 2*floor, 4*floor, ... <= ceiling
+    # =============================================================================
+    def create_interval_ladder(self, interval) -> list:
+        if self.mode != "adaptive":
+            return [interval]
+        ladder = [ADAPTIVE_FLOOR_SECS]
+        while ladder[-1] * 2 <= ADAPTIVE_CEILING_SECS:
+            ladder.append(ladder[-1] * 2)
+        return ladder
+
+    # =============================================================================
+    # Start at the rung closest to the user's interval
+    # =============================================================================
+    def determine_start_level(self, interval) -> int:
+        return int(np.argmin([abs(i - interval) for i in self.ladder]))
@@ -0,0 +1,147 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import re, time, threading
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.constants import (
+    OKX_BASEURL,
+    BINANCE_US_API_URL,
+    BINANCE_GLOBAL_BASEURL,
+    BULK_REQUEST_WEIGHTS,
+    BATCH_MAX_AGE,
+)
+from classes.RateLimiter import get_rate_limiter, RateLimitExceeded
+from classes.HedgedRequests import get_hedged_requests
+
+OKX_FUTURES_REGEX = re.compile(r".*-\d{6}$")  # e.g. BTC-USD-230331
+
+
+# =============================================================================
+# Coalesces the orderbook requests of all markets (all pullers in this
+# process) on one venue into one bulk top-of-book call per tick.
+# The first caller of a tick fetches, everyone else waits on the venue lock
+# and is served from the response while it's younger than BATCH_MAX_AGE.
+# DYDX & COINBASE have no bulk book endpoint and keep their single requests.
+# Bulk endpoints only give the top of book, so depth based numbers (VWAP
+# executable spreads) aren't available for batched venues.
+# =============================================================================
+class BatchFetcher:
+    BULK_VENUES = ["BINANCE_GLOBAL", "BINANCE_US", "OKX"]
+
+    def __init__(self, max_age: float = BATCH_MAX_AGE):
+        self.max_age = max_age
+        self.RateLimiter = get_rate_limiter()
+        self.Hedger = get_hedged_requests()
+        self.locks = {}
+        self.cache = {}  # (venue, group) -> (fetched_at, {symbol: book})
+        self.stats = {v: {"bulk_calls": 0, "served": 0} for v in self.BULK_VENUES}
+        self.stats_lock = threading.Lock()
+
+    # =============================================================================
+    # Top of book of symbol as {"asks": [[p, s]], "bids": [[p, s]]}
+    # =============================================================================
+    def get_book(self, exchange: str, symbol: str) -> dict:
+        key = (exchange, self.determine_group(exchange, symbol))
+        with self.locks.setdefault(key, threading.Lock()):
+            fetched_at, books = self.cache.get(key, (0.0, {}))
+            if time.monotonic() - fetched_at > self.max_age:
+                books = self.fetch_bulk(*key)
+                self.cache[key] = (time.monotonic(), books)
+        with self.stats_lock:
+            self.stats[exchange]["served"] += 1
+        if symbol not in books:
+            raise Exception(f"{exchange} bulk response has no book for {symbol}")
+        return books[symbol]
+
+    # =============================================================================
+    # Drop the cached response, e.g. when a book in it failed the error check
+    # =============================================================================
+    def invalidate(self, exchange: str):
+        for key in list(self.cache.keys()):
+            if key[0] == exchange:
+                self.cache.pop(key, None)
+
+    # =============================================================================
+    # One bulk request, parsed into {symbol: book}
+    # =============================================================================
+    def fetch_bulk(self, exchange: str, group: str) -> dict:
+        if exchange == "BINANCE_GLOBAL":
+            res = self.http_get(exchange, f"{BINANCE_GLOBAL_BASEURL}/ticker/bookTicker")
+            return self.parse_binance_book_tickers(res.json())
+        elif exchange == "BINANCE_US":
+            res = self.http_get(exchange, f"{BINANCE_US_API_URL}/ticker/bookTicker")
+            return self.parse_binance_book_tickers(res.json())
+        elif exchange == "OKX":
+            url = f"{OKX_BASEURL}api/v5/market/tickers?instType={group}"
+            res = self.http_get(exchange, url)
+            return self.parse_okx_tickers(res.json()["data"])
+        raise Exception(f"No bulk endpoint for exchange {exchange}")
+
+    # =============================================================================
+    # GET through the shared rate limiter (and hedger), with the bulk weight
+    # =============================================================================
+    def http_get(self, exchange: str, url: str):
+        weight = BULK_REQUEST_WEIGHTS[exchange]
+        self.RateLimiter.acquire(exchange, weight=weight)
+        res = self.Hedger.get(exchange, url, weight=weight)
+        if res.status_code in [418, 429]:
+            raise RateLimitExceeded(f"{exchange} answered {res.status_code}: {url}")
+        with self.stats_lock:
+            self.stats[exchange]["bulk_calls"] += 1
+        return res
+
+    # =============================================================================
+    # OKX tickers are requested per instrument type
+    # =============================================================================
+    def determine_group(self, exchange: str, symbol: str) -> str:
+        if exchange != "OKX":
+            return "ALL"
+        if symbol.endswith("-SWAP"):
+            return "SWAP"
+        if OKX_FUTURES_REGEX.match(symbol):
+            return "FUTURES"
+        return "SPOT"
+
+    # =============================================================================
+    # Binance: [{"symbol", "bidPrice", "bidQty", "askPrice", "askQty"}, ...]
+    # =============================================================================
+    def parse_binance_book_tickers(self, tickers: list) -> dict:
+        books = {}
+        for t in tickers:
+            books[t["symbol"]] = {
+                "asks": [[t["askPrice"], t["askQty"]]],
+                "bids": [[t["bidPrice"], t["bidQty"]]],
+            }
+        return books
+
+    # =============================================================================
+    # OKX: [{"instId", "bidPx", "bidSz", "askPx", "askSz"}, ...]
+    # =============================================================================
+    def parse_okx_tickers(self, tickers: list) -> dict:
+        books = {}
+        for t in tickers:
+            if not t.get("askPx") or not t.get("bidPx"):
+                continue  # no quotes (e.g. suspended instrument)
+            books[t["instId"]] = {
+                "asks": [[t["askPx"], t["askSz"]]],
+                "bids": [[t["bidPx"], t["bidSz"]]],
+            }
+        return books
+
+
+_batch_fetcher = None
+_batch_fetcher_lock = threading.Lock()
+
+
+# =============================================================================
+# Process wide instance, shared by all pullers so their requests coalesce
+# =============================================================================
+def get_batch_fetcher() -> BatchFetcher:
+    global _batch_fetcher
+    with _batch_fetcher_lock:
+        if not _batch_fetcher:
+            _batch_fetcher = BatchFetcher()
+    return _batch_fetcher
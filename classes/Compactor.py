@@ -0,0 +1,211 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import os, sys, json
+from io import BytesIO
+from itertools import combinations
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from botocore.exceptions import ClientError
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+sys.path.append(os.path.abspath("./utils"))
+from utils.constants import BUCKET_NAME, S3
+from utils.s3_paths import create_compacted_key, create_compacted_index_key
+from classes.HistoricalLoader import HistoricalLoader
+
+
+# =============================================================================
+# Roll daily raw/diff csvs of a month into one parquet file per exchange/pair.
+# One row group per day + a json index with min/max stats per row group, so
+# range and spread queries only read the row groups they need.
+# =============================================================================
+class Compactor:
+    def __init__(self, s3=S3, bucket: str = BUCKET_NAME, loader=None):
+        self.s3 = s3
+        self.bucket = bucket
+        self.loader = loader or HistoricalLoader(s3=s3, bucket=bucket)
+
+    # =============================================================================
+    # Compact one month (YYYY-MM) of a market and update the index
+    # =============================================================================
+    def compact_month(self, exchanges: list, market: str, month: str) -> dict:
+        start, end = self.determine_month_range(month)
+        index = self.load_index(market)
+        for ex in exchanges:
+            df = self.loader.load_raw([ex], market, start, end)
+            entry = self.compact_df(df, "raw", market, ex, month)
+            self.update_index_entry(index, entry)
+        for ex0, ex1 in combinations(exchanges, 2):
+            pair = f"{ex0}-{ex1}"
+            df = self.loader.load_diff([ex0, ex1], market, start, end)
+            entry = self.compact_df(df, "diff", market, pair, month)
+            self.update_index_entry(index, entry)
+        self.save_index(market, index)
+        return index
+
+    # =============================================================================
+    # Write df as parquet (row group per day), return its index entry
+    # =============================================================================
+    def compact_df(self, df: pd.DataFrame, kind: str, market, name, month):
+        if df.empty:
+            print(f"No {kind} data for {name} in {month}, skipping.")
+            return None
+        df = df.drop(columns=["exchange", "pair"], errors="ignore")
+        df = df.sort_values("timestamp", ignore_index=True)
+        if kind == "diff":
+            df[f"{name}_pct"] = self.compute_pct_spread(df, name)
+        days = df["timestamp"].dt.strftime("%Y-%m-%d")
+
+        buffer, row_groups = BytesIO(), []
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        with pq.ParquetWriter(buffer, schema, compression="zstd") as writer:
+            for day, day_df in df.groupby(days, sort=True):
+                tbl = pa.Table.from_pandas(day_df, schema=schema, preserve_index=False)
+                writer.write_table(tbl, row_group_size=len(day_df))
+                row_groups.append(
+                    self.determine_row_group_stats(kind, name, day, day_df)
+                )
+
+        key = create_compacted_key(kind, market, name, month)
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=buffer.getvalue())
+        print(f"{key} compacted: {len(df)} rows in {len(row_groups)} row groups")
+        return {
+            "key": key,
+            "kind": kind,
+            "name": name,
+            "month": month,
+            "row_groups": row_groups,
+        }
+
+    # =============================================================================
+    # Per row group: timestamp range, and spread range for diffs / mid for raw
+    # =============================================================================
+    def determine_row_group_stats(self, kind, name, day, df) -> dict:
+        stats = {
+            "date": day,
+            "rows": len(df),
+            "ts_min": df["timestamp"].min().isoformat(),
+            "ts_max": df["timestamp"].max().isoformat(),
+        }
+        if kind == "diff":
+            cols = {"spread_abs": f"{name}_mid", "spread_pct": f"{name}_pct"}
+        else:
+            cols = {"mid": "mid"}
+        for stat, col in cols.items():
+            stats[f"{stat}_min"] = self.convert_nan_to_none(df[col].min())
+            stats[f"{stat}_max"] = self.convert_nan_to_none(df[col].max())
+        return stats
+
+    # =============================================================================
+    # Abs mid diff relative to the mean of both mids, like EodDiff
+    # =============================================================================
+    def compute_pct_spread(self, df: pd.DataFrame, pair: str) -> pd.Series:
+        ex0, ex1 = pair.split("-")
+        mean = (df[f"{ex0}_mid"] + df[f"{ex1}_mid"]) / 2
+        return (df[f"{pair}_mid"] / mean * 100).round(3)
+
+    # =============================================================================
+    # Index entries are keyed by their file key, re-compacting replaces them
+    # =============================================================================
+    def update_index_entry(self, index: dict, entry):
+        if entry is not None:
+            index["files"][entry["key"]] = entry
+
+    # =============================================================================
+    # Read current index, or start a new one
+    # =============================================================================
+    def load_index(self, market: str) -> dict:
+        key = create_compacted_index_key(market)
+        try:
+            res = self.s3.get_object(Bucket=self.bucket, Key=key)
+        except ClientError:
+            return {"market": market, "files": {}}
+        return json.loads(res["Body"].read())
+
+    def save_index(self, market: str, index: dict):
+        key = create_compacted_index_key(market)
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=json.dumps(index))
+
+    # =============================================================================
+    # First and last day of month
+    # =============================================================================
+    def determine_month_range(self, month: str) -> tuple:
+        start = pd.Timestamp(f"{month}-01")
+        end = start + pd.offsets.MonthEnd(0)
+        return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+    def convert_nan_to_none(self, val):
+        return None if pd.isna(val) else float(val)
+
+
+# =============================================================================
+# Use the index to only read the relevant row groups of compacted files
+# =============================================================================
+class CompactedQuery:
+    def __init__(self, market: str, s3=S3, bucket: str = BUCKET_NAME, loader=None):
+        self.loader = loader or HistoricalLoader(s3=s3, bucket=bucket)
+        self.index = Compactor(s3, bucket, self.loader).load_index(market)
+
+    # =============================================================================
+    # Row groups overlapping [start, end] (+ spread_pct_max > min_spread_pct)
+    # =============================================================================
+    def prune(self, kind: str, name: str, start=None, end=None, min_spread_pct=None):
+        start = pd.Timestamp(start or "1970-01-01")
+        end = pd.Timestamp(end or "2262-01-01")
+        selected = {}
+        for key, entry in self.index["files"].items():
+            if entry["kind"] != kind or entry["name"] != name:
+                continue
+            for i, rg in enumerate(entry["row_groups"]):
+                if (
+                    pd.Timestamp(rg["ts_max"]) < start
+                    or pd.Timestamp(rg["ts_min"]) > end
+                ):
+                    continue
+                if min_spread_pct is not None:
+                    if (
+                        rg.get("spread_pct_max") is None
+                        or rg["spread_pct_max"] <= min_spread_pct
+                    ):
+                        continue
+                selected.setdefault(key, []).append(i)
+        return selected
+
+    # =============================================================================
+    # Days on which the pair's pct spread exceeded `pct`
+    # =============================================================================
+    def find_days_spread_exceeded(self, pair: str, pct: float) -> list:
+        days = []
+        for key, rgs in self.prune("diff", pair, min_spread_pct=pct).items():
+            row_groups = self.index["files"][key]["row_groups"]
+            days += [row_groups[i]["date"] for i in rgs]
+        return sorted(days)
+
+    # =============================================================================
+    # Read only the pruned row groups and filter rows exactly
+    # =============================================================================
+    def read(self, kind: str, name: str, start=None, end=None, min_spread_pct=None):
+        dfs = []
+        for key, rgs in self.prune(kind, name, start, end, min_spread_pct).items():
+            path = self.loader.fetch_to_cache(key)
+            dfs.append(pq.ParquetFile(path).read_row_groups(rgs).to_pandas())
+        if not dfs:
+            return pd.DataFrame()
+        df = pd.concat(dfs, ignore_index=True)
+        if start is not None:
+            df = df[df["timestamp"] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df["timestamp"] <= pd.Timestamp(end)]
+        if min_spread_pct is not None:
+            df = df[df[f"{name}_pct"] > min_spread_pct]
+        return df.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    # python -m classes.Compactor BTC-USD '["DYDX", "BINANCE_GLOBAL"]' 2023-02
+    market, exchanges, month = sys.argv[1:4]
+    Compactor().compact_month(json.loads(exchanges), market, month)
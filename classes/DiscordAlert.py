@@ -2,13 +2,28 @@
 # IMPORTS
 # =============================================================================
 import traceback
+import numpy as np
 from decimal import Decimal
 from discord import SyncWebhook
 from utils.decimal_helper import dec
 from utils.jprint import jprint
 from utils.time_helpers import determine_cur_utc_timestamp
 from utils.discord_hook import post_msgs_to_discord
-from utils.constants import DISCORD_URL, SECS_PER_HOUR
+from utils.constants import (
+    DISCORD_URL,
+    SECS_PER_HOUR,
+    ALERT_MODE,
+    ZSCORE_WINDOW,
+    ZSCORE_HALFLIFE,
+    ZSCORE_MIN_PERIODS,
+    ZSCORE_ALERT_Z,
+    ZSCORE_ALERT_PERCENTILE,
+    ZSCORE_ALERT_COOLDOWN,
+    MAX_SPREAD_TICKS,
+    EXEC_ALERT_PCT,
+    EXEC_ALERT_COOLDOWN,
+)
+from classes.RollingSpreadStats import RollingSpreadStats
 from copy import deepcopy
 
 # =============================================================================
@@ -17,15 +32,44 @@ from copy import deepcopy
 class DiscordAlert:
     def __init__(self, Caller):
         self.Caller = Caller
+        self.alert_mode = ALERT_MODE
+        self.max_bid_ask_spread = 0.15
+        self.last_exec_alert = {}  # ordered pair -> epoch secs
 
+        if self.alert_mode == "zscore":
+            self.setup_zscore_mode()
+            return
         self.thresh_base = self.generate_thresh_base_dict()
         self.thresholds = {
             p: deepcopy(self.thresh_base) for p in self.Caller.diff_pairs
         }
         self.thresh_incr = self.ask_for_thresh_incrementer()
-        self.max_bid_ask_spread = 0.15
         self.thresh_reset_time = SECS_PER_HOUR
 
+    # =============================================================================
+    # Rolling stats instead of static thresholds, indexes to vectorize pairs
+    # =============================================================================
+    def setup_zscore_mode(self):
+        pairs = self.Caller.diff_pairs
+        exchanges = self.Caller.exchanges
+        self.RollingStats = RollingSpreadStats(
+            pairs,
+            ZSCORE_WINDOW,
+            ZSCORE_HALFLIFE,
+            ZSCORE_MIN_PERIODS,
+            percentiles=ZSCORE_ALERT_PERCENTILE > 0,
+        )
+        self.pair_idx0 = np.array([exchanges.index(p.split("-")[0]) for p in pairs])
+        self.pair_idx1 = np.array([exchanges.index(p.split("-")[1]) for p in pairs])
+        metadata = self.Caller.GetBidAsks.Metadata
+        self.tick_sizes = np.array(
+            [
+                metadata.get_tick_size(ex, self.Caller.exchanges_obj[ex]) or np.nan
+                for ex in exchanges
+            ]
+        )
+        self.last_zscore_alert = np.zeros(len(pairs))
+
     # =============================================================================
     # Check $$$ diff between exchanges and alert discord if sufficient.
     # =============================================================================
@@ -43,8 +87,9 @@ class DiscordAlert:
     # Check $$$ diff between exchanges
     # =============================================================================
     def determine_exchange_diff(self, bid_asks: list):
-        msgs = []
-        jprint("Threshs: ", self.thresholds)
+        msgs = self.determine_executable_breaches()
+        if self.alert_mode == "zscore":
+            return msgs + self.determine_zscore_breaches(bid_asks)
         for pair in self.Caller.diff_pairs:
             if self.check_if_orderbook_is_loose(bid_asks, pair):
                 continue
@@ -58,14 +103,98 @@ class DiscordAlert:
                 self.increase_and_update_threshold(pair, diff)
         return msgs
 
+    # =============================================================================
+    # Alert on pairs whose spread breaks out of its own rolling distribution
+    # =============================================================================
+    def determine_zscore_breaches(self, bid_asks: dict):
+        spreads, tick_spreads = self.compute_pair_spreads(bid_asks)
+        z = self.RollingStats.compute_zscores(spreads, std_floor=tick_spreads)
+        breach = np.abs(z["ew"]) > ZSCORE_ALERT_Z
+        pct = np.full(len(spreads), np.nan)
+        if ZSCORE_ALERT_PERCENTILE > 0:
+            pct = self.RollingStats.compute_percentiles(spreads)
+            tails = (pct >= ZSCORE_ALERT_PERCENTILE) | (
+                pct <= 100 - ZSCORE_ALERT_PERCENTILE
+            )
+            # a new window max is only a real tail once the window is big enough
+            min_count = 100 / (100 - ZSCORE_ALERT_PERCENTILE)
+            enough = self.RollingStats.win_count >= min_count
+            breach |= tails & enough
+        self.RollingStats.update(spreads)
+
+        now = determine_cur_utc_timestamp().timestamp()
+        breach &= (now - self.last_zscore_alert) > ZSCORE_ALERT_COOLDOWN
+        self.last_zscore_alert[breach] = now
+        msgs = []
+        for i in np.flatnonzero(breach):
+            pair = self.Caller.diff_pairs[i]
+            stats = {
+                "spread": spreads[i],
+                "ew_z": z["ew"][i],
+                "window_z": z["window"][i],
+                "window_mean": z["win_mean"][i],
+                "percentile": pct[i],
+            }
+            mids = self.extract_mid_prices(bid_asks, pair)
+            msgs.append(self.format_zscore_msg_for_discord(pair, mids, stats))
+        return msgs
+
+    # =============================================================================
+    # Alert when buying one venue's asks and selling another's bids for the
+    # smallest EXEC_SIZES notional earns more than EXEC_ALERT_PCT
+    # =============================================================================
+    def determine_executable_breaches(self) -> list:
+        spreads = self.Caller.ExecutableSpreads
+        if EXEC_ALERT_PCT <= 0 or spreads.latest is None:
+            return []
+        now = determine_cur_utc_timestamp().timestamp()
+        vwap = spreads.latest["vwap"][:, 0]
+        msgs = []
+        with np.errstate(invalid="ignore"):
+            breaches = np.flatnonzero(vwap > EXEC_ALERT_PCT)
+        for i in breaches:
+            pair = spreads.pairs[i]
+            if now - self.last_exec_alert.get(pair, 0) <= EXEC_ALERT_COOLDOWN:
+                continue
+            self.last_exec_alert[pair] = now
+            msgs.append(self.format_exec_msg_for_discord(pair, spreads.format_latest()))
+        return msgs
+
+    # =============================================================================
+    # Signed pct mid diff (ex0 - ex1) of all pairs, nan if an orderbook is loose
+    # =============================================================================
+    def compute_pair_spreads(self, bid_asks: dict) -> tuple:
+        quotes = [bid_asks[ex] for ex in self.Caller.exchanges]
+        bids = np.array([q["bid_price"] for q in quotes], dtype=float)
+        asks = np.array([q["ask_price"] for q in quotes], dtype=float)
+        mids = np.array([q["mid"] for q in quotes], dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            max_spread = np.fmax(
+                mids * self.max_bid_ask_spread / 100, self.tick_sizes * MAX_SPREAD_TICKS
+            )
+            loose = np.abs(bids - asks) > max_spread
+            m0, m1 = mids[self.pair_idx0], mids[self.pair_idx1]
+            spreads = (m0 - m1) / ((m0 + m1) / 2) * 100
+            # smallest spread move: one tick of the coarser venue (nan: unknown)
+            ticks = np.fmax(
+                self.tick_sizes[self.pair_idx0], self.tick_sizes[self.pair_idx1]
+            )
+            tick_spreads = ticks / ((m0 + m1) / 2) * 100
+        spreads[loose[self.pair_idx0] | loose[self.pair_idx1]] = np.nan
+        return spreads, tick_spreads
+
     # =============================================================================
     # Check if the bid-ask spread is tight
     # =============================================================================
     def check_if_orderbook_is_loose(self, bid_asks: dict, pair: str):
+        metadata = self.Caller.GetBidAsks.Metadata
         for ex in pair.split("-"):
             bid, ask = bid_asks[ex]["bid_price"], bid_asks[ex]["ask_price"]
-            diff = abs(bid - ask) / bid * 100
-            if diff > self.max_bid_ask_spread:
+            symbol = self.Caller.exchanges_obj[ex]
+            max_spread = metadata.determine_max_spread(
+                ex, symbol, (bid + ask) / 2, self.max_bid_ask_spread
+            )
+            if abs(bid - ask) > max_spread:
                 print("Loose orderbook. ")
                 return True  # orderbook loose
         return False  # orderbook is tight
@@ -124,6 +253,19 @@ class DiscordAlert:
         msg5 = f"{ex0}-price: {mids[ex0]}, {ex1}-price: {mids[ex1]}\n"
         return msg0 + msg1 + msg2 + msg3 + msg4 + msg5
 
+    # =============================================================================
+    # Format z-score message for discord webhook
+    # =============================================================================
+    def format_zscore_msg_for_discord(self, pair: str, mids: dict, stats: dict):
+        ex0, ex1 = pair.split("-")
+        msg0 = f"ALERT: Spread left its usual range.\n"
+        msg1 = f"{ex0} & {ex1} trading {self.Caller.market} at interval {self.Caller.interval} seconds:\n"
+        msg2 = f"Spread ({ex0} - {ex1}): {round(stats['spread'], 3)}%, rolling mean: {round(stats['window_mean'], 3)}%\n"
+        msg3 = f"EWM z-score: {round(stats['ew_z'], 2)}, window z-score: {round(stats['window_z'], 2)}\n"
+        msg4 = f"Window percentile: {round(stats['percentile'], 2)}\n"
+        msg5 = f"{ex0}-price: {mids[ex0]}, {ex1}-price: {mids[ex1]}\n"
+        return msg0 + msg1 + msg2 + msg3 + msg4 + msg5
+
     # =============================================================================
     # Reset thresholds
     # =============================================================================
@@ -134,12 +276,28 @@ class DiscordAlert:
     # Ask user for threshold base value in percent
     # =============================================================================
     def generate_thresh_base_dict(self):
-        val = input("Enter the Discord alert (%) threshold base value: ")
+        prompt = "Enter the Discord alert (%) threshold base value: "
+        val = self.Caller.ask_user("thresh_base", prompt)
         return {"value": float(val), "timestamp": None}
 
     # =============================================================================
     # Ask user for threshold incrementer
     # =============================================================================
     def ask_for_thresh_incrementer(self):
-        val = input("Enter the Discord alert (%) threshold INCREMENTER: ")
+        prompt = "Enter the Discord alert (%) threshold INCREMENTER: "
+        val = self.Caller.ask_user("thresh_incr", prompt)
         return float(val)
+
+    # =============================================================================
+    # Format executable spread message for discord webhook
+    # =============================================================================
+    def format_exec_msg_for_discord(self, pair: str, latest: dict):
+        buy, sell = pair.split(">")
+        spreads = latest[pair]
+        msg0 = f"ALERT: Executable arbitrage.\n"
+        msg1 = f"Buy {self.Caller.market} on {buy}, sell on {sell} at interval {self.Caller.interval} seconds:\n"
+        msg2 = f"Top of book: {spreads['top']}%\n"
+        msg3 = "".join(
+            f"VWAP for {size}: {pct}%\n" for size, pct in spreads.items() if size != "top"
+        )
+        return msg0 + msg1 + msg2 + msg3
@@ -4,11 +4,12 @@
 from cmath import pi
 import pandas as pd
 import traceback
-from io import StringIO
 from pprint import pprint
 from utils.jprint import jprint
 from utils.discord_hook import post_msgs_to_discord
-from utils.constants import BUCKET_NAME, DISCORD_URL, S3
+from utils.constants import DISCORD_URL
+from utils.s3_paths import create_diff_key
+from classes.SpreadSketches import format_quantile
 
 
 # =============================================================================
@@ -18,17 +19,30 @@ from utils.constants import BUCKET_NAME, DISCORD_URL, S3
 class EodDiff:
     def __init__(self, Caller):
         self.Caller = Caller
+        self.sketches = None
+        self.executable_stats = None
 
     # =============================================================================
-    # Compute diffs between exchanges, save to S3 and send summary to Discord
+    # Compute diffs between exchanges, save to S3 and send summary to Discord.
+    # sketches & executable_stats: the day's, when the EOD runs after the reset
     # =============================================================================
-    def determine_eod_diff_n_create_summary(self, df_obj: dict, today: str):
+    def determine_eod_diff_n_create_summary(
+        self, df_obj: dict, today: str, sketches=None, executable_stats=None
+    ):
+        if sketches is None:
+            sketches = self.Caller.SpreadSketches
+        if executable_stats is None:
+            executable_stats = self.Caller.ExecutableSpreads.day_stats
+        self.sketches = sketches
+        self.executable_stats = executable_stats
         try:
             self.merge_dfs_for_pairs(df_obj)
             self.compute_price_diffs()
             self.reorder_df_columns()
             self.prepare_diff_dfs_for_s3()
             self.save_diff_dfs_to_s3(today)
+            self.Caller.SpreadBars.determine_n_save(df_obj, self.merged_obj, today)
+            self.lead_lag = self.Caller.LeadLag.determine_n_save(df_obj, today)
             self.create_n_send_summary_to_discord(today)
         except Exception as e:
             traceback.print_exc()
@@ -42,7 +56,7 @@ class EodDiff:
         for pair in self.Caller.diff_pairs:
             ex0, ex1 = pair.split("-")
             df0, df1 = df_obj[ex0], df_obj[ex1]
-            df0 = self.rename_columns(ex0, df0)
+            df0 = self.rename_columns(ex0, df0, keep_interval=True)
             df1 = self.rename_columns(ex1, df1)
             merged = pd.merge(df0, df1, on="timestamp", how="inner")
             merged_obj[pair] = merged
@@ -51,8 +65,11 @@ class EodDiff:
     # =============================================================================
     # Rename columns to include exchange in column name
     # =============================================================================
-    def rename_columns(self, ex, df) -> pd.DataFrame:
-        df = df[["timestamp", "ask_price", "bid_price", "mid"]]
+    def rename_columns(self, ex, df, keep_interval=False) -> pd.DataFrame:
+        cols = ["timestamp", "ask_price", "bid_price", "mid"]
+        if keep_interval and "interval" in df.columns:
+            cols.append("interval")  # same for all exchanges of a tick
+        df = df[cols]
         rename_dict = {
             "ask_price": f"{ex}_ask",
             "bid_price": f"{ex}_bid",
@@ -77,20 +94,21 @@ class EodDiff:
     def reorder_df_columns(self):
         for pair, df in self.merged_obj.items():
             ex0, ex1 = pair.split("-")
-            df = df[
-                [
-                    "timestamp",
-                    f"{ex0}_bid",
-                    f"{ex0}_ask",
-                    f"{ex0}_mid",
-                    f"{ex1}_bid",
-                    f"{ex1}_ask",
-                    f"{ex1}_mid",
-                    f"{pair}_bid",
-                    f"{pair}_ask",
-                    f"{pair}_mid",
-                ]
+            cols = [
+                "timestamp",
+                f"{ex0}_bid",
+                f"{ex0}_ask",
+                f"{ex0}_mid",
+                f"{ex1}_bid",
+                f"{ex1}_ask",
+                f"{ex1}_mid",
+                f"{pair}_bid",
+                f"{pair}_ask",
+                f"{pair}_mid",
             ]
+            if "interval" in df.columns:
+                cols.append("interval")
+            df = df[cols]
             self.merged_obj[pair] = df
 
     # =============================================================================
@@ -106,17 +124,11 @@ class EodDiff:
     # Format timestamps and such
     # =============================================================================
     def save_diff_dfs_to_s3(self, today):
-        base = f"Difference/{self.Caller.market}/{today}"
+        jobs = []
         for ex_pair, df in self.merged_obj.items():
-            path = f"{base}/{ex_pair}_{self.Caller.market}_{today}.csv"
-            csv_buffer = StringIO()
-            df.to_csv(csv_buffer)
-            response = S3.put_object(
-                Bucket=BUCKET_NAME, Key=path, Body=csv_buffer.getvalue()
-            )
-            print(
-                f"{path} saved with status code: {response['ResponseMetadata']['HTTPStatusCode']}"
-            )
+            path = create_diff_key(ex_pair, self.Caller.market, today)
+            jobs.append((path, df))
+        self.Caller.Sinks.submit_dfs(jobs)
 
     # =============================================================================
     # Make message and send to discord
@@ -127,6 +139,8 @@ class EodDiff:
         for pair, df in self.merged_obj.items():
             info = self.determine_eod_vals(date, pair, df)
             self.format_msg_for_discord(info)
+        self.format_executable_msg_for_discord()
+        self.format_lead_lag_msg_for_discord()
         post_msgs_to_discord(DISCORD_URL, self.msg)
 
     # =============================================================================
@@ -145,16 +159,42 @@ class EodDiff:
         info["min_abs"] = _min[diff_col]
         info["min_perc"] = self.compute_perc_diff(diff_col, _min, ex0, ex1)
 
-        info["mean_abs"] = round(df[diff_col].mean(), 2)
+        info["mean_abs"] = round(self.compute_weighted_mean(df, diff_col), 2)
+        info["mean_interval"] = self.compute_mean_interval(df)
+        sketches = self.sketches
+        info["quantiles_abs"] = sketches.determine_quantiles(pair, "abs")
+        info["quantiles_pct"] = sketches.determine_quantiles(pair, "pct")
         return info
 
+    # =============================================================================
+    # Mean weighted by each row's sampling interval (adaptive sampling)
+    # =============================================================================
+    def compute_weighted_mean(self, df: pd.DataFrame, col: str) -> float:
+        if "interval" not in df.columns:
+            return df[col].mean()
+        valid = df[col].notna() & df["interval"].notna()
+        weights = df.loc[valid, "interval"]
+        if weights.sum() == 0:
+            return df[col].mean()
+        return (df.loc[valid, col] * weights).sum() / weights.sum()
+
+    # =============================================================================
+    # Effective secs between the pair's rows (adaptive sampling, shards, missed
+    # ticks), not the configured interval
+    # =============================================================================
+    def compute_mean_interval(self, df: pd.DataFrame) -> float:
+        if len(df) < 2:
+            return self.Caller.interval
+        secs = (df.index[-1] - df.index[0]).total_seconds()
+        return round(secs / (len(df) - 1), 2)
+
     # =============================================================================
     # Format msg with info
     # =============================================================================
     def format_msg_for_discord(self, info):
         ex0, ex1 = info["pair"].split("-")
 
-        msg1 = f"{ex0} & {ex1} trading {self.Caller.market} at interval {self.Caller.interval} seconds:\n"
+        msg1 = f"{ex0} & {ex1} trading {self.Caller.market} at a mean interval of {info['mean_interval']} seconds:\n"
 
         msg2 = f" - Max diff absolute: ${info['max_abs']}\n"
         msg3 = f" - Max diff percentage: {info['max_perc']}%\n"
@@ -163,10 +203,60 @@ class EodDiff:
         msg5 = f" - Min diff percentage: {info['min_perc']}%\n"
 
         msg6 = f" - Mean diff absolute: ${info['mean_abs']}\n"
+        msg7 = self.format_quantiles_msg("absolute", info["quantiles_abs"], "$", "")
+        msg8 = self.format_quantiles_msg("percentage", info["quantiles_pct"], "", "%")
         msg_div = f"\n=================================\n\n"
-        pair_msg = msg_div + msg1 + msg2 + msg3 + msg4 + msg5 + msg6
+        pair_msg = msg_div + msg1 + msg2 + msg3 + msg4 + msg5 + msg6 + msg7 + msg8
         self.msg += pair_msg
 
+    # =============================================================================
+    # " - Diff quantiles absolute (p50/p90/p99/p99.9): $1.2 / $3.4 / ..."
+    # =============================================================================
+    def format_quantiles_msg(self, name: str, quantiles: dict, pre: str, post: str):
+        labels = "/".join(format_quantile(q) for q in quantiles)
+        vals = " / ".join(
+            "n/a" if v is None else f"{pre}{round(v, 3)}{post}"
+            for v in quantiles.values()
+        )
+        return f" - Diff quantiles {name} ({labels}): {vals}\n"
+
+    # =============================================================================
+    # Best executable spread of the day per ordered pair (buy>sell)
+    # =============================================================================
+    def format_executable_msg_for_discord(self):
+        spreads = self.Caller.ExecutableSpreads
+        stats = self.executable_stats
+        if stats["ticks"] == 0:
+            return
+        msg = f"\n=================================\n\nExecutable spreads ({stats['ticks']} ticks, best of day / ticks > 0):\n"
+        for i, pair in enumerate(spreads.pairs):
+            msg += f" - {pair} top: {self.format_pct(stats['top_max'][i])} / {stats['top_positive'][i]}"
+            for j, size in enumerate(spreads.sizes):
+                msg += f", {size:g}: {self.format_pct(stats['vwap_max'][i, j])} / {stats['vwap_positive'][i, j]}"
+            msg += "\n"
+        self.msg += msg
+
+    # =============================================================================
+    # Peak cross-correlation of returns per pair: who leads by how much
+    # =============================================================================
+    def format_lead_lag_msg_for_discord(self):
+        df = self.lead_lag
+        if df is None:
+            return
+        step = df["step_secs"].iloc[0]
+        msg = f"\n=================================\n\nLead-lag of mid returns ({step:g}s grid, peak corr / corr at 0):\n"
+        for pair, row in df.iterrows():
+            if row["leader"] is None or pd.isna(row["leader"]):
+                msg += f" - {pair}: n/a\n"
+            elif row["leader"] == "none":
+                msg += f" - {pair}: in sync, {row['corr']} / {row['corr_at_0']}\n"
+            else:
+                msg += f" - {pair}: {row['leader']} leads by {row['lag_secs']:g}s, {row['corr']} / {row['corr_at_0']}\n"
+        self.msg += msg
+
+    def format_pct(self, val) -> str:
+        return "n/a" if pd.isna(val) else f"{round(val, 3)}%"
+
     # =============================================================================
     # Compute mean on mid prices
     # =============================================================================
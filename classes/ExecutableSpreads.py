@@ -0,0 +1,128 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import numpy as np
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.constants import DEPTH_LEVELS, EXEC_SIZES
+
+
+# =============================================================================
+# What a round trip would actually earn: buy on A at the ask, sell on B at
+# the bid, for every ordered pair "A>B".
+#   top:  bid_B - ask_A at the best levels
+#   vwap: vwap_bid_B(size) - vwap_ask_A(size) walking the book levels for
+#         every notional size, nan when the fetched depth is too thin
+#         (FETCH_MODE=batched venues only fetch the top level)
+# Both in pct of the pair's average mid. Positive = tradable before fees.
+# Vectorized over exchanges x levels x sizes, then gathered into pairs.
+# =============================================================================
+class ExecutableSpreads:
+    def __init__(self, Caller, sizes: list = EXEC_SIZES, levels: int = DEPTH_LEVELS):
+        self.Caller = Caller
+        self.sizes = np.array(sizes, dtype=float)
+        self.levels = levels
+        exchanges = Caller.exchanges
+        ordered = [(a, b) for a in exchanges for b in exchanges if a != b]
+        self.pairs = [f"{a}>{b}" for a, b in ordered]
+        self.buy_idx = np.array([exchanges.index(a) for a, _ in ordered], dtype=int)
+        self.sell_idx = np.array([exchanges.index(b) for _, b in ordered], dtype=int)
+        self.latest = None
+        self.reset_day_stats()
+
+    # =============================================================================
+    # Compute this tick's spreads and fold them into the day stats
+    # =============================================================================
+    def update(self, bid_asks: dict) -> dict:
+        books = self.stack_books(bid_asks)
+        vwap_ask = compute_vwaps(books[:, 0], books[:, 1], self.sizes)
+        vwap_bid = compute_vwaps(books[:, 2], books[:, 3], self.sizes)
+        top_ask, top_bid = books[:, 0, 0], books[:, 2, 0]
+        buy, sell = self.buy_idx, self.sell_idx
+        with np.errstate(invalid="ignore"):
+            mids = (top_ask + top_bid) / 2
+            ref = (mids[buy] + mids[sell]) / 2
+            top = (top_bid[sell] - top_ask[buy]) / ref * 100
+            vwap = (vwap_bid[sell] - vwap_ask[buy]) / ref[:, None] * 100
+        self.update_day_stats(top, vwap)
+        self.latest = {"top": top, "vwap": vwap}
+        return self.latest
+
+    # =============================================================================
+    # exchanges x [ask_px, ask_sz, bid_px, bid_sz] x levels, nan if no book
+    # =============================================================================
+    def stack_books(self, bid_asks: dict) -> np.ndarray:
+        books = np.full((len(self.Caller.exchanges), 4, self.levels), np.nan)
+        books[:, [1, 3]] = 0.0
+        for i, ex in enumerate(self.Caller.exchanges):
+            book = bid_asks[ex].get("book")
+            if book is not None:
+                n = min(book.shape[1], self.levels)
+                books[i, :, :n] = book[:, :n]
+        return books
+
+    # =============================================================================
+    # Running max & count of positive ticks per pair (and size), reset daily
+    # =============================================================================
+    def update_day_stats(self, top: np.ndarray, vwap: np.ndarray):
+        stats = self.day_stats
+        stats["ticks"] += 1
+        stats["top_max"] = np.fmax(stats["top_max"], top)
+        stats["vwap_max"] = np.fmax(stats["vwap_max"], vwap)
+        with np.errstate(invalid="ignore"):
+            stats["top_positive"] += top > 0
+            stats["vwap_positive"] += vwap > 0
+
+    def reset_day_stats(self):
+        n_pairs, n_sizes = len(self.pairs), len(self.sizes)
+        self.day_stats = {
+            "ticks": 0,
+            "top_max": np.full(n_pairs, np.nan),
+            "top_positive": np.zeros(n_pairs, dtype=int),
+            "vwap_max": np.full((n_pairs, n_sizes), np.nan),
+            "vwap_positive": np.zeros((n_pairs, n_sizes), dtype=int),
+        }
+
+    # =============================================================================
+    # Latest spreads as {"A>B": {"top": pct, "1000": pct, ...}}, nan -> None
+    # =============================================================================
+    def format_latest(self) -> dict:
+        if self.latest is None:
+            return {}
+        out = {}
+        for i, pair in enumerate(self.pairs):
+            row = {"top": self.latest["top"][i]}
+            for j, size in enumerate(self.sizes):
+                row[f"{size:g}"] = self.latest["vwap"][i, j]
+            out[pair] = {
+                k: None if np.isnan(v) else round(float(v), 4) for k, v in row.items()
+            }
+        return out
+
+
+# =============================================================================
+# VWAP to fill `targets` notional on one side of every book.
+# prices, sizes: exchanges x levels (best level first, nan/0 padded)
+# returns exchanges x targets, nan where the book is too thin
+# =============================================================================
+def compute_vwaps(prices: np.ndarray, sizes: np.ndarray, targets: np.ndarray):
+    valid = ~np.isnan(prices)
+    qty = np.where(valid, sizes, 0.0)
+    notional = np.where(valid, prices * qty, 0.0)
+    zeros = np.zeros((len(prices), 1))
+    cum_notional = np.concatenate([zeros, np.cumsum(notional, axis=1)], axis=1)
+    cum_qty = np.concatenate([zeros, np.cumsum(qty, axis=1)], axis=1)
+
+    reached = cum_notional[:, 1:, None] >= targets[None, None, :]  # ex x lvl x tgt
+    filled = reached.any(axis=1)
+    level = reached.argmax(axis=1)  # level where the target is reached
+    prev_notional = np.take_along_axis(cum_notional, level, axis=1)
+    prev_qty = np.take_along_axis(cum_qty, level, axis=1)
+    level_px = np.take_along_axis(np.where(valid, prices, 1.0), level, axis=1)
+    total_qty = prev_qty + (targets[None, :] - prev_notional) / level_px
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vwaps = targets[None, :] / total_qty
+    vwaps[~filled] = np.nan
+    return vwaps
@@ -0,0 +1,171 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import time, threading
+import datetime as dt
+import concurrent.futures
+from collections import deque
+import numpy as np
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.constants import FETCH_SYNC, FETCH_SYNC_LEAD
+from utils.time_helpers import determine_cur_epoch, determine_time_scale
+
+_local = threading.local()  # the barrier the current fetch thread waits at
+
+
+# =============================================================================
+# Called by the http layer with the request built, right before sending.
+# Blocks the first send of a barrier fetch thread until the barrier opens.
+# =============================================================================
+def wait_to_send(exchange: str):
+    barrier = getattr(_local, "barrier", None)
+    if barrier is None:
+        return
+    _local.barrier = None  # retries & later requests of the tick go right away
+    started = time.perf_counter()
+    barrier.pass_barrier(exchange, sending=True)
+    _local.waited = getattr(_local, "waited", 0.0) + time.perf_counter() - started
+
+
+# =============================================================================
+# Secs the current thread waited at the barrier since the last call, fetch
+# timers subtract it so latencies start at the release
+# =============================================================================
+def pop_barrier_wait() -> float:
+    waited = getattr(_local, "waited", 0.0)
+    _local.waited = 0.0
+    return waited
+
+
+# =============================================================================
+# FETCH_SYNC=barrier: the tick wakes FETCH_SYNC_LEAD secs before its grid
+# point, persistent per venue threads prepare their requests and wait at one
+# barrier, which the tick's thread opens on the grid point. All venues send
+# at once, over the warm keep-alive connections of the http layer.
+# The send time of every request is recorded (in "off" mode too, to compare),
+# skew = latest - earliest send. Venues that don't send this tick (rate
+# limited, served from the batch cache) still pass the barrier so it never
+# waits for them.
+# =============================================================================
+class FetchBarrier:
+    def __init__(self, Caller, mode: str = FETCH_SYNC, lead: float = FETCH_SYNC_LEAD):
+        self.Caller = Caller
+        self.enabled = mode == "barrier"
+        self.lead = lead if self.enabled else 0.0
+        self.barrier = None
+        self.lock = threading.Lock()
+        self.send_times = {}  # exchange -> perf_counter of this tick's send
+        self.released = None
+        self.skews = deque(maxlen=1000)  # secs, last ticks
+        self.last_offsets = {}  # exchange -> secs after release
+        self.stats = {"ticks": 0, "broken": 0, "late_releases": 0}
+        self.executor = None
+        if self.enabled:
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                len(Caller.exchanges), thread_name_prefix=f"fetch-{Caller.market}"
+            )
+
+    # =============================================================================
+    # Fetch all venues of the puller, released together on the grid point
+    # =============================================================================
+    def fetch_all(self, interval, offset: float) -> dict:
+        release = self.determine_release_epoch(interval, offset)
+        now = dt.datetime.utcfromtimestamp(release)  # the tick's sampling time
+        items = list(self.Caller.exchanges_obj.items())
+        self.barrier = threading.Barrier(len(items) + 1, timeout=self.lead + 5)
+        self.start_tick()
+        futures = [self.executor.submit(self.fetch_one, item, now) for item in items]
+        self.release_at(release)
+        bid_asks = dict(f.result() for f in futures)
+        self.record_skew()
+        return bid_asks
+
+    # =============================================================================
+    # Fetch one venue, its first send waits at the barrier (if enabled)
+    # =============================================================================
+    def fetch_one(self, exchange_n_market: tuple, now) -> tuple:
+        exchange = exchange_n_market[0]
+        if self.enabled and self.Caller.GetBidAsks.check_if_batched(exchange):
+            # bulk requests are shared under a venue lock, don't wait holding it
+            self.pass_barrier(exchange, sending=True)
+        else:
+            _local.barrier = self
+        try:
+            GetBidAsks = self.Caller.GetBidAsks
+            return GetBidAsks.get_bid_ask_from_specific_exchange(exchange_n_market, now)
+        finally:
+            if getattr(_local, "barrier", None) is not None:
+                _local.barrier = None
+                self.pass_barrier(exchange, sending=False)
+
+    # =============================================================================
+    # Grid point (interval boundary + phase offset) this tick woke up for: the
+    # one closest to now + lead. A late wake still releases on its grid point
+    # (right away, counted as late release) instead of skipping an interval
+    # =============================================================================
+    def determine_release_epoch(self, interval, offset: float) -> float:
+        interval = float(interval)
+        now = determine_cur_epoch()
+        return round((now + self.lead - offset) / interval) * interval + offset
+
+    # =============================================================================
+    # Sleep to the grid point, then open the barrier by arriving last
+    # =============================================================================
+    def release_at(self, release: float):
+        secs = (release - determine_cur_epoch()) / determine_time_scale()
+        if secs > 0:
+            time.sleep(secs)
+        else:
+            self.stats["late_releases"] += 1  # preparing took longer than the lead
+        self.pass_barrier(None, sending=False)
+        self.released = time.perf_counter()
+
+    def pass_barrier(self, exchange, sending: bool):
+        try:
+            if self.enabled:
+                self.barrier.wait()
+        except threading.BrokenBarrierError:
+            with self.lock:
+                self.stats["broken"] += 1
+        if sending:
+            with self.lock:
+                self.send_times[exchange] = time.perf_counter()
+
+    # =============================================================================
+    # Without barrier the send times are relative to the start of the fetch
+    # =============================================================================
+    def start_tick(self):
+        with self.lock:
+            self.send_times = {}
+        self.released = time.perf_counter()
+
+    # =============================================================================
+    # Spread of this tick's send times, and each send relative to the release
+    # =============================================================================
+    def record_skew(self):
+        self.stats["ticks"] += 1
+        with self.lock:
+            send_times = dict(self.send_times)
+        if not send_times:
+            return
+        self.last_offsets = {ex: t - self.released for ex, t in send_times.items()}
+        self.skews.append(max(send_times.values()) - min(send_times.values()))
+
+    def determine_last_skew(self):
+        return self.skews[-1] if self.skews else None
+
+    def determine_stats(self) -> dict:
+        skews = np.array(self.skews) * 1000
+        stats = {**self.stats, "enabled": self.enabled, "lead_secs": self.lead}
+        for q in [50, 99]:
+            stats[f"skew_p{q}_ms"] = (
+                round(float(np.percentile(skews, q)), 3) if len(skews) else None
+            )
+        stats["skew_max_ms"] = round(float(skews.max()), 3) if len(skews) else None
+        stats["last_send_offsets_ms"] = {
+            ex: round(secs * 1000, 3) for ex, secs in self.last_offsets.items()
+        }
+        return stats
@@ -5,6 +5,7 @@ import traceback
 from utils.jprint import jprint
 from utils.discord_hook import post_msgs_to_discord
 from utils.constants import DISCORD_URL
+from utils.time_helpers import determine_cur_utc_timestamp
 import datetime as dt
 
 # =============================================================================
@@ -29,10 +30,11 @@ class FrozenOrderbook:
     # Actual function
     # =============================================================================
     def check_orderbooks_if_frozen(self):
-        for ex, df in self.Caller.df_obj.items():
-            if len(df.index) <= self.window:
+        store = self.Caller.df_obj
+        for ex in store:
+            if store.count_rows(ex) <= self.window:
                 continue
-            rows = df.tail(self.window)
+            rows = store.tail(ex, self.window)
             self.check_specific_orderbook(ex, rows)
 
     # =============================================================================
@@ -75,7 +77,7 @@ class FrozenOrderbook:
     def check_if_active_alert_limit(self, exchange):
         print("Orderbook frozen...")
         cur_limit = self.alert_limits[exchange]
-        now = dt.datetime.utcnow()
+        now = determine_cur_utc_timestamp()
         diff = now - cur_limit
         hours = diff.total_seconds() / (60 * 60)
         print(cur_limit, now, hours)
@@ -88,7 +90,8 @@ class FrozenOrderbook:
     # Ask user how many rows back we should check for identical orderbooks
     # =============================================================================
     def ask_user_for_frozen_orderbook_window(self):
-        return int(input("Enter frozen orderbook window: "))
+        prompt = "Enter frozen orderbook window: "
+        return int(self.Caller.ask_user("frozen_window", prompt))
 
     # =============================================================================
     # Create an alert limit on the max amount so we don't spray 'n pray alerts
@@ -96,5 +99,5 @@ class FrozenOrderbook:
     def create_alert_limit(self):
         limit = {}
         for ex in self.Caller.exchanges:
-            limit[ex] = dt.datetime.utcnow() - dt.timedelta(hours=1)
+            limit[ex] = determine_cur_utc_timestamp() - dt.timedelta(hours=1)
         return limit
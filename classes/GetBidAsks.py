@@ -3,7 +3,6 @@
 # =============================================================================
 import os, sys, time
 from dotenv import load_dotenv
-import requests
 import pandas as pd
 import numpy as np
 import traceback
@@ -20,9 +19,17 @@ from utils.constants import (
     BINANCE_US_BASEURL,
     BINANCE_GLOBAL_BASEURL,
     COINBASE_BASEURL,
+    FETCH_MODE,
+    DEPTH_LEVELS,
+    EXEC_SIZES,
 )
 from utils.logger import get_logger
 from utils.discord_hook import ping_private_discord
+from classes.RateLimiter import get_rate_limiter, RateLimitExceeded
+from classes.BatchFetcher import get_batch_fetcher
+from classes.InstrumentMetadata import get_instrument_metadata
+from classes.HedgedRequests import get_hedged_requests
+from classes.FetchBarrier import pop_barrier_wait
 
 log = get_logger()
 
@@ -47,13 +54,25 @@ class GetBidAsks:
 
     def __init__(self, Caller):
         self.Caller = Caller
+        self.RateLimiter = get_rate_limiter()
+        self.fetch_mode = FETCH_MODE
+        self.BatchFetcher = get_batch_fetcher()
+        self.Metadata = get_instrument_metadata()
+        self.Metadata.refresh_in_background(Caller.exchanges)  # pct limits meanwhile
+        self.Hedger = get_hedged_requests()
+        self.latencies = {}  # secs the last fetch of each exchange took
+        self.warn_if_batched_books_are_top_only()
 
     # =============================================================================
     # Determine the exchange and run function
     # =============================================================================
     def get_bid_ask_from_specific_exchange(self, exchange_n_market: tuple, now) -> dict:
         exchange, market = exchange_n_market[0], exchange_n_market[1]
+        pop_barrier_wait()
+        started = time.perf_counter()
         bid_ask = self.get_bid_ask_n_error_check(exchange, market)
+        secs = time.perf_counter() - started
+        self.latencies[exchange] = secs - pop_barrier_wait()  # from the release
         bid_ask["timestamp"] = now
         bid_ask["mid"] = self.compute_mid(bid_ask)
         return exchange, bid_ask
@@ -65,14 +84,24 @@ class GetBidAsks:
         count = 0
         while True:
             try:
-                res = self.determine_exch_n_get_data(exchange, market)
-                return self.process_n_error_check_res(res, exchange)
+                with self.Caller.Profiler.stage("http"):
+                    res = self.determine_exch_n_get_data(exchange, market)
+                with self.Caller.Profiler.stage("parse"):
+                    return self.process_n_error_check_res(res, exchange, market)
+            except RateLimitExceeded as e:
+                print(e)  # don't ping discord, the retry would just add load
+                return self.create_nan_bid_ask_dict()
             except Exception as e:
                 ping_private_discord(e)
                 log.exception(e)
                 self.print_exception(exchange, e)
+                if self.check_if_batched(exchange):
+                    self.BatchFetcher.invalidate(exchange)  # refetch on retry
                 if count >= self.MAX_RETRIES:
                     return self.create_nan_bid_ask_dict()
+                if not self.RateLimiter.can_retry(exchange):
+                    print(f"No rate limit budget left to retry {exchange}.")
+                    return self.create_nan_bid_ask_dict()
                 count += 1
                 time.sleep(0.1)
         return self.create_nan_bid_ask_dict()
@@ -81,6 +110,8 @@ class GetBidAsks:
     # Determine which exchange, and fetch data
     # =============================================================================
     def determine_exch_n_get_data(self, exchange, market):
+        if self.check_if_batched(exchange):
+            return self.BatchFetcher.get_book(exchange, market)
         if exchange == "DYDX":
             return self.get_bid_ask_dydx(market)
         elif exchange == "BINANCE_US":
@@ -94,11 +125,38 @@ class GetBidAsks:
         else:
             raise Exception("No function exists for this exchange.")
 
+    # =============================================================================
+    # Batched venues only fetch the top level, there's no depth to walk
+    # =============================================================================
+    def warn_if_batched_books_are_top_only(self):
+        batched = [ex for ex in self.Caller.exchanges if self.check_if_batched(ex)]
+        if batched and EXEC_SIZES:
+            print(
+                f"FETCH_MODE=batched: {batched} only have the top of book, their VWAP executable spreads beyond it are nan"
+            )
+
+    # =============================================================================
+    # Batched mode only applies to venues with a bulk endpoint
+    # =============================================================================
+    def check_if_batched(self, exchange: str) -> bool:
+        bulk_venues = self.BatchFetcher.BULK_VENUES
+        return self.fetch_mode == "batched" and exchange in bulk_venues
+
+    # =============================================================================
+    # GET within the exchange's rate limit (hedged if HEDGE_MODE is on)
+    # =============================================================================
+    def http_get(self, exchange: str, url: str, **kwargs):
+        self.RateLimiter.acquire(exchange)
+        res = self.Hedger.get(exchange, url, **kwargs)
+        if res.status_code in [418, 429]:
+            raise RateLimitExceeded(f"{exchange} answered {res.status_code}: {url}")
+        return res
+
     # =============================================================================
     # Get bid/ask market data for DyDx
     # =============================================================================
     def get_bid_ask_dydx(self, market: str) -> dict:
-        res = requests.get(f"{DYDX_BASEURL}/orderbook/{market}")
+        res = self.http_get("DYDX", f"{DYDX_BASEURL}/orderbook/{market}")
         return res.json()
 
     # =============================================================================
@@ -106,7 +164,7 @@ class GetBidAsks:
     # =============================================================================
     def get_bid_ask_okx(self, market: str) -> dict:
         url = f"{OKX_BASEURL}api/v5/market/books?instId={market}&sz=5"
-        res = requests.get(url).json()["data"]
+        res = self.http_get("OKX", url).json()["data"]
         if len(res) > 1:
             raise Exception(f"OKX returned more than one orderbook: {res}")
         res = res[0]
@@ -118,14 +176,15 @@ class GetBidAsks:
     # Pull best bid/ask from Binance US
     # =============================================================================
     def get_bid_ask_binance_us(self, market):
-        res = requests.get(BINANCE_US_BASEURL + f"symbol={market}")
+        res = self.http_get("BINANCE_US", BINANCE_US_BASEURL + f"symbol={market}")
         return res.json()
 
     # =============================================================================
     # Pull best bid/ask from Binance Global
     # =============================================================================
     def get_bid_ask_binance_global(self, market):
-        res = requests.get(BINANCE_GLOBAL_BASEURL + f"/depth?symbol={market}&limit=10")
+        url = BINANCE_GLOBAL_BASEURL + f"/depth?symbol={market}&limit=10"
+        res = self.http_get("BINANCE_GLOBAL", url)
         return res.json()
 
     # =============================================================================
@@ -133,14 +192,15 @@ class GetBidAsks:
     # =============================================================================
     def get_bid_ask_coinbase(self, market):
         url = f"{COINBASE_BASEURL}{market}/book?level=1"
-        res = requests.get(url, headers={"accept": "application/json"}).json()
+        headers = {"accept": "application/json"}
+        res = self.http_get("COINBASE", url, headers=headers).json()
         print("Make sure Coinbase is alright!")
         return {"bids": [res["bids"][0][0:2]], "asks": [res["asks"][0][0:2]]}
 
     # =============================================================================
     # Pull best bid/ask for DyDx, verify it's sorted correctly
     # =============================================================================
-    def process_n_error_check_res(self, res: list, exchange: str) -> tuple:
+    def process_n_error_check_res(self, res, exchange: str, market: str) -> tuple:
         asks, bids = self.convert_orderbook_to_df(res, exchange)
 
         best_ask = asks.iloc[asks["price"].idxmin()]
@@ -152,9 +212,23 @@ class GetBidAsks:
             "bid_size": best_bid["size"],
         }
 
-        self.error_check_bid_ask_orderbook(bid_ask, exchange, asks, bids)
+        self.error_check_bid_ask_orderbook(bid_ask, exchange, market, asks, bids)
+        bid_ask["book"] = self.extract_book_levels(asks, bids)
         return bid_ask
 
+    # =============================================================================
+    # Best DEPTH_LEVELS levels as [ask_px, ask_sz, bid_px, bid_sz] x levels,
+    # padded with nan prices & 0 sizes (not stored, used for executable spreads)
+    # =============================================================================
+    def extract_book_levels(self, asks, bids) -> np.ndarray:
+        book = np.full((4, DEPTH_LEVELS), np.nan)
+        book[[1, 3]] = 0.0
+        asks = asks.sort_values("price").head(DEPTH_LEVELS)
+        bids = bids.sort_values("price", ascending=False).head(DEPTH_LEVELS)
+        book[0, : len(asks)], book[1, : len(asks)] = asks["price"], asks["size"]
+        book[2, : len(bids)], book[3, : len(bids)] = bids["price"], bids["size"]
+        return book
+
     # =============================================================================
     # Pull data out of res and process to dataframe considering exchange specifics
     # =============================================================================
@@ -189,7 +263,7 @@ class GetBidAsks:
     # Error check the bid ask orderbook to check for irregularities
     # =============================================================================
     def error_check_bid_ask_orderbook(
-        self, bid_ask: dict, exchange: str, asks: list, bids: list
+        self, bid_ask: dict, exchange: str, market: str, asks: list, bids: list
     ):
         # error checking
         if bid_ask["ask_price"] != asks.iloc[0]["price"]:
@@ -199,18 +273,14 @@ class GetBidAsks:
             print(f"{exchange} order book messed up: \n {bids}")
             raise Exception(f"{exchange} orderbook messed up: \n {bids}")
 
-        diff = self.determine_bid_ask_diff(bid_ask)
-        if diff >= self.MAX_BID_ASK_DIFF:
-            raise Exception(f"{exchange} orderbook is lose: {bid_ask}")
-
-    # =============================================================================
-    # Determine tick difference between bid, ask, to make sure orderbook is proper
-    # =============================================================================
-    def determine_bid_ask_diff(self, bid_ask):
         ask, bid = bid_ask["ask_price"], bid_ask["bid_price"]
-        mid = self.compute_mid(bid_ask)
-        diff = ((ask - bid) / mid) * 100
-        return abs(diff)
+        if ask < bid:
+            raise Exception(f"{exchange} orderbook is crossed: {bid_ask}")
+        max_spread = self.Metadata.determine_max_spread(
+            exchange, market, self.compute_mid(bid_ask), self.MAX_BID_ASK_DIFF
+        )
+        if ask - bid >= max_spread:
+            raise Exception(f"{exchange} orderbook is lose: {bid_ask}")
 
     # =============================================================================
     # If exchange doesn't return proper data, create nan dictionary
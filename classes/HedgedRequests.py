@@ -0,0 +1,224 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import threading
+import concurrent.futures
+from collections import deque
+from urllib.parse import urlparse
+import time
+import numpy as np
+import requests
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.constants import (
+    HEDGE_MODE,
+    HEDGE_HOSTS,
+    HEDGE_PERCENTILE,
+    HEDGE_MAX_RATE,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_WINDOW,
+    HEDGE_WORKERS,
+    HTTP_POOL_SIZE,
+)
+from classes.RateLimiter import get_rate_limiter, RateLimitExceeded
+from classes.FetchBarrier import wait_to_send
+
+
+# =============================================================================
+# Hedged GETs to cut tail latency (HEDGE_MODE=on, venues with HEDGE_HOSTS).
+# If the primary hasn't answered after the venue's HEDGE_PERCENTILE latency,
+# the same request goes to the next alternate host and whichever answers
+# first wins. Hedges need their own rate limit tokens and are capped at
+# HEDGE_MAX_RATE of the venue's recent requests, so load can't double.
+# Every response (loser too) feeds its headers into the rate limiter.
+# Requests go out over one keep-alive session per venue (warm connections)
+# and are prepared before a fetch barrier (FetchBarrier) releases them.
+# =============================================================================
+class HedgedRequests:
+    def __init__(self, mode: str = HEDGE_MODE, hosts: dict = HEDGE_HOSTS):
+        self.enabled = mode == "on"
+        self.hosts = hosts
+        self.RateLimiter = get_rate_limiter()
+        self.lock = threading.Lock()
+        self.latencies = {}  # exchange -> deque of secs
+        self.hedge_flags = {}  # exchange -> deque of 0/1, was request hedged
+        self.next_host = {}
+        self.stats = {}
+        self.sessions = {}
+        self.executor = None
+        if self.enabled:
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                HEDGE_WORKERS, thread_name_prefix="hedge"
+            )
+
+    # =============================================================================
+    # GET url, hedged if enabled for the venue. Caller acquired the primary's
+    # rate limit tokens, `weight` is what the hedge has to acquire.
+    # =============================================================================
+    def get(self, exchange: str, url: str, weight=None, **kwargs):
+        self.setup_exchange(exchange)
+        request = self.prepare(exchange, url, **kwargs)
+        wait_to_send(exchange)  # no-op unless this thread fetches at a barrier
+        if not self.enabled or not self.hosts.get(exchange):
+            return self.timed_send(exchange, request)
+        primary = self.executor.submit(self.timed_send, exchange, request)
+        delay = self.determine_hedge_delay(exchange)
+        hedged = delay is not None and not self.wait_for(primary, delay)
+        if hedged:
+            hedged = self.check_hedge_budget(exchange) and self.acquire(
+                exchange, weight
+            )
+        self.record_request(exchange, hedged)
+        if not hedged:
+            return primary.result()
+        hedge_url = self.rewrite_url(exchange, url)
+        hedge_request = self.prepare(exchange, hedge_url, **kwargs)
+        hedge = self.executor.submit(self.timed_send, exchange, hedge_request)
+        return self.take_first(exchange, primary, hedge)
+
+    # =============================================================================
+    # First ok response. Errors & non 2xx answers only count if both fail
+    # =============================================================================
+    def take_first(self, exchange: str, primary, hedge):
+        pending = {primary, hedge}
+        error, fallback = None, None
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                if not future.result().ok:
+                    fallback = fallback or future.result()
+                    continue
+                if future is hedge:
+                    with self.lock:
+                        self.stats[exchange]["hedge_wins"] += 1
+                return future.result()
+        if fallback is not None:
+            return fallback
+        raise error
+
+    # =============================================================================
+    # Prepared GET on the venue's session, send it as is later
+    # =============================================================================
+    def prepare(self, exchange: str, url: str, **kwargs):
+        session = self.sessions[exchange]
+        return session.prepare_request(requests.Request("GET", url, **kwargs))
+
+    # =============================================================================
+    # Send, record latency and report headers to the rate limiter
+    # =============================================================================
+    def timed_send(self, exchange: str, request):
+        started = time.perf_counter()
+        res = self.sessions[exchange].send(request)
+        secs = time.perf_counter() - started
+        self.RateLimiter.update_from_response(exchange, res)
+        with self.lock:
+            self.latencies[exchange].append(secs)
+        return res
+
+    def wait_for(self, future, secs: float) -> bool:
+        done, _ = concurrent.futures.wait([future], timeout=secs)
+        return len(done) > 0
+
+    # =============================================================================
+    # Percentile of the venue's recent latencies, None until enough samples
+    # =============================================================================
+    def determine_hedge_delay(self, exchange: str):
+        with self.lock:
+            samples = list(self.latencies[exchange])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return float(np.percentile(samples, HEDGE_PERCENTILE))
+
+    # =============================================================================
+    # Hedges stay below HEDGE_MAX_RATE of the recent requests
+    # =============================================================================
+    def check_hedge_budget(self, exchange: str) -> bool:
+        with self.lock:
+            flags = self.hedge_flags[exchange]
+            return sum(flags) < HEDGE_MAX_RATE * max(len(flags), 1)
+
+    def acquire(self, exchange: str, weight) -> bool:
+        try:
+            self.RateLimiter.acquire(exchange, max_wait=0, weight=weight)
+            return True
+        except RateLimitExceeded:
+            return False  # no spare budget, just wait for the primary
+
+    # =============================================================================
+    # Same path & query on the next alternate host (round robin)
+    # =============================================================================
+    def rewrite_url(self, exchange: str, url: str) -> str:
+        hosts = self.hosts[exchange]
+        with self.lock:
+            i = self.next_host[exchange] % len(hosts)
+            self.next_host[exchange] += 1
+        parsed = urlparse(url)
+        alternate = urlparse(hosts[i])
+        return parsed._replace(
+            scheme=alternate.scheme, netloc=alternate.netloc
+        ).geturl()
+
+    # =============================================================================
+    # Stats
+    # =============================================================================
+    def record_request(self, exchange: str, hedged: bool):
+        with self.lock:
+            self.hedge_flags[exchange].append(int(hedged))
+            self.stats[exchange]["requests"] += 1
+            self.stats[exchange]["hedged"] += int(hedged)
+
+    def setup_exchange(self, exchange: str):
+        if exchange in self.stats:
+            return
+        with self.lock:
+            self.latencies.setdefault(exchange, deque(maxlen=HEDGE_WINDOW))
+            self.hedge_flags.setdefault(exchange, deque(maxlen=HEDGE_WINDOW))
+            self.next_host.setdefault(exchange, 0)
+            self.sessions.setdefault(exchange, self.create_session())
+            self.stats.setdefault(
+                exchange, {"requests": 0, "hedged": 0, "hedge_wins": 0}
+            )
+
+    def create_session(self):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=HTTP_POOL_SIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def determine_stats(self) -> dict:
+        out = {}
+        with self.lock:
+            items = [
+                (ex, dict(s), list(self.latencies[ex])) for ex, s in self.stats.items()
+            ]
+        for exchange, stats, samples in items:
+            stats["hedge_rate"] = round(stats["hedged"] / max(stats["requests"], 1), 4)
+            stats["win_rate"] = round(stats["hedge_wins"] / max(stats["hedged"], 1), 4)
+            for q in [50, 99]:
+                p = np.percentile(samples, q) * 1000 if samples else None
+                stats[f"p{q}_ms"] = None if p is None else round(float(p), 1)
+            out[exchange] = stats
+        return out
+
+
+_hedged_requests = None
+_hedged_requests_lock = threading.Lock()
+
+
+# =============================================================================
+# Process wide instance, latency history is per venue not per puller
+# =============================================================================
+def get_hedged_requests() -> HedgedRequests:
+    global _hedged_requests
+    with _hedged_requests_lock:
+        if not _hedged_requests:
+            _hedged_requests = HedgedRequests()
+    return _hedged_requests
@@ -0,0 +1,256 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import os, sys, json, threading
+import concurrent.futures
+from itertools import combinations
+import pandas as pd
+from botocore.exceptions import ClientError
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+sys.path.append(os.path.abspath("./utils"))
+from utils.constants import (
+    BUCKET_NAME,
+    S3,
+    LOADER_CACHE_DIR,
+    LOADER_CACHE_MAX_MB,
+    LOADER_FETCH_WORKERS,
+    LOADER_PARSE_WORKERS,
+)
+from utils.disk_cache import DiskCache
+from utils.compression import decompress
+from utils.s3_paths import (
+    create_raw_key,
+    create_diff_key,
+    create_sketch_key,
+    create_bars_key,
+    create_ticks_key,
+    create_changes_key,
+)
+from classes.QuoteStore import expand_changes
+from classes.SpreadSketches import create_sidecar_df, parse_sidecar_df
+
+
+# =============================================================================
+# Parse one cached csv into a typed df (module level so processes can pickle it)
+# =============================================================================
+def parse_csv_file(path: str, label_col: str, label: str) -> pd.DataFrame:
+    df = pd.read_csv(path, parse_dates=["timestamp"])
+    for col in df.columns:
+        if col != "timestamp":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    df.insert(0, label_col, label)
+    return df
+
+
+# =============================================================================
+# Load historical raw & diff csvs from S3 for a date range into one df.
+# Fetches concurrently, parses in parallel, keeps a local LRU disk cache.
+# Pass `s3=LocalS3(...)` to run against a local object store.
+# =============================================================================
+class HistoricalLoader:
+    def __init__(
+        self,
+        s3=S3,
+        bucket: str = BUCKET_NAME,
+        cache_dir: str = LOADER_CACHE_DIR,
+        cache_mb: float = LOADER_CACHE_MAX_MB,
+        fetch_workers: int = LOADER_FETCH_WORKERS,
+        parse_workers: int = LOADER_PARSE_WORKERS,
+    ):
+        self.s3 = s3
+        self.bucket = bucket
+        self.cache = DiskCache(cache_dir, cache_mb)
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers
+        self.stats = {"cache_hits": 0, "downloads": 0, "missing": []}
+        self.stats_lock = threading.Lock()
+
+    # =============================================================================
+    # Raw bid/ask data of exchanges between start and end date (inclusive).
+    # Days with a tick grid were saved by a delta store: their changes keys
+    # are loaded instead of the raw keys and filled back onto the grid
+    # =============================================================================
+    def load_raw(self, exchanges: list, market: str, start: str, end: str):
+        dates = self.create_date_range(start, end)
+        grids = self.load_tick_grids(market, dates)
+        jobs, delta_jobs = [], []
+        for date in dates:
+            for ex in exchanges:
+                if date in grids:
+                    key = create_changes_key(ex, market, date)
+                    delta_jobs.append((key, "exchange", ex))
+                else:
+                    jobs.append((create_raw_key(ex, market, date), "exchange", ex))
+        df = self.load_jobs(jobs, "exchange")
+        if not delta_jobs:
+            return df
+        changes = self.load_jobs(delta_jobs, "exchange")
+        return self.expand_delta_days(df, changes, grids)
+
+    # =============================================================================
+    # {date: tick grid} of the days saved by a delta store (QUOTE_STORE_MODE=delta)
+    # =============================================================================
+    def load_tick_grids(self, market: str, dates: list) -> dict:
+        keys = [create_ticks_key(market, date) for date in dates]
+        paths = self.fetch_keys_to_cache(keys)
+        return {
+            date: pd.read_csv(path, parse_dates=["timestamp"])
+            for date, path in zip(dates, paths)
+            if path is not None
+        }
+
+    # =============================================================================
+    # Forward fill the changed rows onto their day's grid, one exchange & day
+    # at a time, and add them to the full resolution rows in df
+    # =============================================================================
+    def expand_delta_days(self, df: pd.DataFrame, changes: pd.DataFrame, grids: dict):
+        if changes.empty:
+            return df
+        parts = [] if df.empty else [df]
+        days = changes["timestamp"].dt.strftime("%Y-%m-%d")
+        for (ex, day), rows in changes.groupby(["exchange", days], observed=True):
+            expanded = expand_changes(rows.drop(columns="exchange"), grids[day])
+            expanded.insert(0, "exchange", ex)
+            parts.append(expanded)
+        df = pd.concat(parts, ignore_index=True)
+        df["exchange"] = df["exchange"].astype("category")
+        return df.sort_values(["timestamp", "exchange"], ignore_index=True)
+
+    # =============================================================================
+    # Diff data of all exchange pairs (same pair order as ArbDataPuller)
+    # =============================================================================
+    def load_diff(self, exchanges: list, market: str, start: str, end: str):
+        pairs = [f"{ex0}-{ex1}" for ex0, ex1 in combinations(exchanges, 2)]
+        jobs = []
+        for date in self.create_date_range(start, end):
+            for pair in pairs:
+                jobs.append((create_diff_key(pair, market, date), "pair", pair))
+        return self.load_jobs(jobs, "pair")
+
+    # =============================================================================
+    # Spread distributions over a date range (week, month..): the daily sketch
+    # sidecars merged into {(pair, metric): DDSketch}
+    # =============================================================================
+    def load_spread_sketches(self, market: str, start: str, end: str) -> dict:
+        dates = self.create_date_range(start, end)
+        keys = [create_sketch_key(market, date) for date in dates]
+        paths = self.fetch_keys_to_cache(keys)
+        sketches = {}
+        for path in paths:
+            if path is None:
+                continue
+            for key, sketch in parse_sidecar_df(pd.read_csv(path)).items():
+                if key in sketches:
+                    sketches[key].merge(sketch)
+                else:
+                    sketches[key] = sketch
+        return sketches
+
+    # =============================================================================
+    # Quantiles of the merged range, same columns as the daily sidecar
+    # =============================================================================
+    def load_spread_quantiles(self, market: str, start: str, end: str):
+        sketches = self.load_spread_sketches(market, start, end)
+        if not sketches:
+            return pd.DataFrame()
+        return create_sidecar_df(sketches).drop(columns="sketch")
+
+    # =============================================================================
+    # Pre-aggregated OHLC bars (SpreadBars) of a resolution over a date range,
+    # optionally only some names (exchanges / pairs)
+    # =============================================================================
+    def load_bars(
+        self, market: str, resolution: str, start: str, end: str, names=None
+    ) -> pd.DataFrame:
+        dates = self.create_date_range(start, end)
+        keys = [create_bars_key(market, date, resolution) for date in dates]
+        paths = self.fetch_keys_to_cache(keys)
+        dfs = [pd.read_csv(p, parse_dates=["timestamp"]) for p in paths if p]
+        if not dfs:
+            return pd.DataFrame()
+        df = pd.concat(dfs, ignore_index=True)
+        if names is not None:
+            df = df[df["name"].isin(names)]
+        return df.sort_values(["timestamp", "name"], ignore_index=True)
+
+    # =============================================================================
+    # Fetch all keys concurrently, parse in parallel, combine into one df
+    # =============================================================================
+    def load_jobs(self, jobs: list, label_col: str) -> pd.DataFrame:
+        paths = self.fetch_keys_to_cache([j[0] for j in jobs])
+        found = [(p, j[1], j[2]) for p, j in zip(paths, jobs) if p is not None]
+        if not found:
+            return pd.DataFrame()
+        dfs = self.parse_files(found)
+        df = pd.concat(dfs, ignore_index=True)
+        df[label_col] = df[label_col].astype("category")
+        return df.sort_values(["timestamp", label_col], ignore_index=True)
+
+    # =============================================================================
+    # Parse files, in several processes if configured
+    # =============================================================================
+    def parse_files(self, found: list) -> list:
+        paths, label_cols, labels = zip(*found)
+        if self.parse_workers <= 1 or len(found) == 1:
+            return list(map(parse_csv_file, paths, label_cols, labels))
+        workers = min(self.parse_workers, len(found))
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            return list(executor.map(parse_csv_file, paths, label_cols, labels))
+
+    # =============================================================================
+    # Local paths of keys (None if missing), fetched concurrently. The cache
+    # index gets the access times of all hits in one write at the end
+    # =============================================================================
+    def fetch_keys_to_cache(self, keys: list) -> list:
+        with concurrent.futures.ThreadPoolExecutor(self.fetch_workers) as executor:
+            paths = list(executor.map(self.fetch_to_cache, keys))
+        self.cache.flush()
+        return paths
+
+    # =============================================================================
+    # Local path of key: cached if ETag still matches, else download first
+    # =============================================================================
+    def fetch_to_cache(self, key: str):
+        try:
+            etag = self.s3.head_object(Bucket=self.bucket, Key=key)["ETag"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ["404", "NoSuchKey"]:
+                self.count_stat("missing", key)
+                return None
+            raise
+        path = self.cache.get(key, etag)
+        if path is not None:
+            self.count_stat("cache_hits")
+            return path
+        res = self.s3.get_object(Bucket=self.bucket, Key=key)
+        self.count_stat("downloads")
+        body = decompress(res["Body"].read(), res.get("ContentEncoding"))
+        return self.cache.put(key, body, res["ETag"])
+
+    # =============================================================================
+    # Fetches run in threads, count under lock
+    # =============================================================================
+    def count_stat(self, name: str, key: str = None):
+        with self.stats_lock:
+            if key is None:
+                self.stats[name] += 1
+            else:
+                self.stats[name].append(key)
+
+    # =============================================================================
+    # All dates between start and end as YYYY-MM-DD
+    # =============================================================================
+    def create_date_range(self, start: str, end: str) -> list:
+        return [d.strftime("%Y-%m-%d") for d in pd.date_range(start, end, freq="D")]
+
+
+if __name__ == "__main__":
+    # python -m classes.HistoricalLoader BTC-USD '["DYDX", "BINANCE_GLOBAL"]' 2023-02-01 2023-02-07
+    market, exchanges, start, end = sys.argv[1:5]
+    loader = HistoricalLoader()
+    df = loader.load_diff(json.loads(exchanges), market, start, end)
+    print(df)
+    print(loader.stats)
@@ -0,0 +1,247 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import os, json, time, threading
+import requests
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.constants import (
+    DYDX_BASEURL,
+    OKX_BASEURL,
+    BINANCE_US_API_URL,
+    BINANCE_GLOBAL_BASEURL,
+    COINBASE_BASEURL,
+    INSTRUMENT_CACHE_PATH,
+    INSTRUMENT_CACHE_TTL,
+    INSTRUMENT_REQUEST_WEIGHTS,
+    INSTRUMENT_RATE_LIMIT_WAIT,
+    MAX_SPREAD_TICKS,
+)
+from classes.RateLimiter import get_rate_limiter, RateLimitExceeded
+
+
+# =============================================================================
+# Tick size, lot size and base/quote of every symbol of a venue, bulk loaded
+# with one (OKX: one per instrument type) request per venue, indexed by
+# symbol and persisted to INSTRUMENT_CACHE_PATH for INSTRUMENT_CACHE_TTL
+# secs. Lookups are dict gets. A venue that can't be loaded keeps its stale
+# entries (or none: callers then fall back to pct-only checks).
+# Requests go through the shared RateLimiter with the endpoint's weight, the
+# daily refresh of a running puller runs in the background.
+# =============================================================================
+class InstrumentMetadata:
+    def __init__(
+        self, path: str = INSTRUMENT_CACHE_PATH, ttl: float = INSTRUMENT_CACHE_TTL
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.RateLimiter = get_rate_limiter()
+        self.refreshing = None  # thread of the running background refresh
+        self.venues = self.load_from_disk()  # venue -> {"loaded_at", "symbols"}
+        self.by_asset = {}  # (venue, base, quote) -> symbol
+        for venue in self.venues:
+            self.index_assets(venue)
+
+    # =============================================================================
+    # {"tick", "lot", "base", "quote"} of a symbol or None
+    # =============================================================================
+    def get(self, venue: str, symbol: str):
+        entry = self.venues.get(venue)
+        return None if entry is None else entry["symbols"].get(symbol)
+
+    def get_tick_size(self, venue: str, symbol: str):
+        info = self.get(venue, symbol)
+        return None if info is None else info["tick"]
+
+    # =============================================================================
+    # Symbol mapping: the venue's symbol for a base/quote asset pair
+    # =============================================================================
+    def find_symbol(self, venue: str, base: str, quote: str):
+        return self.by_asset.get((venue, base.upper(), quote.upper()))
+
+    # =============================================================================
+    # Widest spread that still counts as a proper book: the pct limit, or
+    # MAX_SPREAD_TICKS ticks on coarse tick grids (where 1 tick > pct limit).
+    # Only ever loosens the pct check, never tightens it: a book a few ticks
+    # wide is as tight as a coarse grid allows
+    # =============================================================================
+    def determine_max_spread(self, venue: str, symbol: str, mid: float, max_pct: float):
+        max_spread = mid * max_pct / 100
+        tick = self.get_tick_size(venue, symbol)
+        if tick:
+            max_spread = max(max_spread, tick * MAX_SPREAD_TICKS)
+        return max_spread
+
+    # =============================================================================
+    # Load venues that are missing or older than the TTL
+    # =============================================================================
+    def refresh_if_stale(self, venues: list):
+        with self.lock:
+            now = time.time()
+            stale = [
+                v
+                for v in venues
+                if v not in self.venues or now - self.venues[v]["loaded_at"] > self.ttl
+            ]
+            if not stale:
+                return
+            for venue in stale:
+                try:
+                    symbols = self.fetch_venue(venue)
+                    if not symbols:
+                        raise Exception("empty instrument list")
+                except Exception as e:
+                    print(f"Couldn't load {venue} instruments, using cached: {e}")
+                    continue
+                self.venues[venue] = {"loaded_at": now, "symbols": symbols}
+                self.index_assets(venue)
+                print(f"Loaded {len(symbols)} {venue} instruments.")
+            self.save_to_disk()
+
+    # =============================================================================
+    # Same off the calling thread (tick thread at midnight), stale entries
+    # keep serving lookups meanwhile
+    # =============================================================================
+    def refresh_in_background(self, venues: list):
+        if self.refreshing is not None and self.refreshing.is_alive():
+            return
+        self.refreshing = threading.Thread(
+            target=self.refresh_if_stale,
+            args=(venues,),
+            name="instrument-refresh",
+            daemon=True,
+        )
+        self.refreshing.start()
+
+    # =============================================================================
+    # One bulk request per venue, parsed into {symbol: info}
+    # =============================================================================
+    def fetch_venue(self, venue: str) -> dict:
+        if venue == "BINANCE_GLOBAL":
+            return self.parse_binance(
+                self.http_get(venue, f"{BINANCE_GLOBAL_BASEURL}/exchangeInfo")
+            )
+        if venue == "BINANCE_US":
+            return self.parse_binance(
+                self.http_get(venue, f"{BINANCE_US_API_URL}/exchangeInfo")
+            )
+        if venue == "DYDX":
+            return self.parse_dydx(self.http_get(venue, f"{DYDX_BASEURL}/markets"))
+        if venue == "OKX":
+            symbols = {}
+            for inst_type in ["SPOT", "SWAP", "FUTURES"]:
+                url = f"{OKX_BASEURL}api/v5/public/instruments?instType={inst_type}"
+                symbols.update(self.parse_okx(self.http_get(venue, url)))
+            return symbols
+        if venue == "COINBASE":
+            url = COINBASE_BASEURL.rstrip("/")
+            return self.parse_coinbase(self.http_get(venue, url))
+        raise Exception(f"No instrument endpoint for exchange {venue}")
+
+    # =============================================================================
+    # GET within the venue's rate limit (same budget as the orderbook requests)
+    # =============================================================================
+    def http_get(self, venue: str, url: str):
+        weight = INSTRUMENT_REQUEST_WEIGHTS.get(venue, 1)
+        self.RateLimiter.acquire(venue, INSTRUMENT_RATE_LIMIT_WAIT, weight)
+        res = requests.get(url, timeout=10)
+        self.RateLimiter.update_from_response(venue, res)
+        if res.status_code in [418, 429]:
+            raise RateLimitExceeded(f"{venue} answered {res.status_code}: {url}")
+        res.raise_for_status()
+        return res.json()
+
+    # =============================================================================
+    # Venue formats
+    # =============================================================================
+    def parse_binance(self, res: dict) -> dict:
+        symbols = {}
+        for s in res["symbols"]:
+            filters = {f["filterType"]: f for f in s["filters"]}
+            symbols[s["symbol"]] = self.create_info(
+                filters["PRICE_FILTER"]["tickSize"],
+                filters["LOT_SIZE"]["stepSize"],
+                s["baseAsset"],
+                s["quoteAsset"],
+            )
+        return symbols
+
+    def parse_dydx(self, res: dict) -> dict:
+        return {
+            m: self.create_info(
+                i["tickSize"], i["stepSize"], i["baseAsset"], i["quoteAsset"]
+            )
+            for m, i in res["markets"].items()
+        }
+
+    def parse_okx(self, res: dict) -> dict:
+        symbols = {}
+        for i in res["data"]:
+            base = i.get("baseCcy") or i["instId"].split("-")[0]  # derivatives
+            quote = i.get("quoteCcy") or i.get("settleCcy") or i["instId"].split("-")[1]
+            symbols[i["instId"]] = self.create_info(
+                i["tickSz"], i["lotSz"], base, quote
+            )
+        return symbols
+
+    def parse_coinbase(self, res: list) -> dict:
+        return {
+            p["id"]: self.create_info(
+                p["quote_increment"],
+                p["base_increment"],
+                p["base_currency"],
+                p["quote_currency"],
+            )
+            for p in res
+        }
+
+    def create_info(self, tick, lot, base: str, quote: str) -> dict:
+        return {
+            "tick": float(tick),
+            "lot": float(lot),
+            "base": base.upper(),
+            "quote": quote.upper(),
+        }
+
+    def index_assets(self, venue: str):
+        for symbol, info in self.venues[venue]["symbols"].items():
+            self.by_asset[(venue, info["base"], info["quote"])] = symbol
+
+    # =============================================================================
+    # Disk persistence, written to a temp file and renamed
+    # =============================================================================
+    def load_from_disk(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Ignoring unreadable instrument cache {self.path}: {e}")
+            return {}
+
+    def save_to_disk(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.venues, f)
+        os.replace(tmp, self.path)
+
+
+_instrument_metadata = None
+_instrument_metadata_lock = threading.Lock()
+
+
+# =============================================================================
+# Process wide instance, all pullers share one cache
+# =============================================================================
+def get_instrument_metadata() -> InstrumentMetadata:
+    global _instrument_metadata
+    with _instrument_metadata_lock:
+        if not _instrument_metadata:
+            _instrument_metadata = InstrumentMetadata()
+    return _instrument_metadata
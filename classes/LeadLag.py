@@ -0,0 +1,129 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import time, traceback
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.constants import LEADLAG_MAX_LAG
+from utils.s3_paths import create_lead_lag_key
+
+
+# =============================================================================
+# Which venue leads price discovery: at EOD every exchange's mids are put on
+# the sampling grid (floor interval / shards, forward filled where adaptive
+# sampling skipped slots), turned into log returns, and the cross-correlation
+# of every pair is computed over lags of +-LEADLAG_MAX_LAG secs with one FFT
+# per venue and one inverse FFT per pair (O(n log n) instead of O(n * lags)).
+# Positive lag: ex0's returns show up in ex1 lag secs later, ex0 leads.
+# =============================================================================
+class LeadLag:
+    def __init__(self, Caller, max_lag: float = LEADLAG_MAX_LAG):
+        self.Caller = Caller
+        self.max_lag = max_lag
+        exchanges, pairs = Caller.exchanges, Caller.diff_pairs
+        self.idx0 = np.array([exchanges.index(p.split("-")[0]) for p in pairs])
+        self.idx1 = np.array([exchanges.index(p.split("-")[1]) for p in pairs])
+        self.last_secs = None
+
+    # =============================================================================
+    # Lead-lag df of the day (one row per pair), saved next to the diffs.
+    # None if it failed or there's too little data, the diffs go on regardless
+    # =============================================================================
+    def determine_n_save(self, df_obj, today: str):
+        try:
+            started = time.perf_counter()
+            df = self.determine_lead_lag(df_obj)
+            self.last_secs = time.perf_counter() - started
+            if df is None:
+                return None
+            print(f"Lead-lag of {self.Caller.market} in {self.last_secs:.2f}s")
+            key = create_lead_lag_key(self.Caller.market, today.split(" ")[0])
+            self.Caller.Sinks.submit_df(key, df)
+            return df
+        except Exception as e:
+            traceback.print_exc()
+            print(f"LeadLag failed execution with error message: {e}")
+            return None
+
+    def determine_lead_lag(self, df_obj):
+        step = self.determine_step()
+        returns = self.create_return_matrix(df_obj, step)
+        max_lag = min(int(self.max_lag / step), len(returns) - 1)
+        if max_lag < 1:
+            return None
+        lags, corrs = compute_cross_correlations(returns, self.idx0, self.idx1, max_lag)
+        rows = []
+        for i, pair in enumerate(self.Caller.diff_pairs):
+            ex0, ex1 = pair.split("-")
+            corr = corrs[i]
+            if np.isnan(corr).all():
+                peak, leader = None, None
+            else:
+                peak = int(np.nanargmax(corr))
+                leader = ex0 if lags[peak] > 0 else ex1 if lags[peak] < 0 else "none"
+            rows.append(
+                {
+                    "pair": pair,
+                    "leader": leader,
+                    "lag_secs": None if peak is None else lags[peak] * step,
+                    "corr": None if peak is None else round(float(corr[peak]), 4),
+                    "corr_at_0": round(float(corr[max_lag]), 4),
+                    "samples": len(returns),
+                    "step_secs": step,
+                }
+            )
+        return pd.DataFrame(rows).set_index("pair")
+
+    # =============================================================================
+    # Finest grid the day was sampled on, same slots as the shard merge
+    # =============================================================================
+    def determine_step(self) -> float:
+        return self.Caller.Shards.determine_slot_secs()
+
+    # =============================================================================
+    # grid slots x exchanges of log mid returns, 0 where a mid is missing
+    # =============================================================================
+    def create_return_matrix(self, df_obj, step: float) -> np.ndarray:
+        slots = {}
+        for ex in self.Caller.exchanges:
+            df = df_obj[ex]
+            ts = pd.to_datetime(df["timestamp"]).values.astype("datetime64[ns]")
+            secs = ts.astype(np.int64) / 1e9
+            slots[ex] = (np.round(secs / step).astype(np.int64), df["mid"].values)
+        filled = [s for s, _ in slots.values() if len(s)]
+        if not filled:
+            return np.zeros((0, len(self.Caller.exchanges)))
+        start = min(s.min() for s in filled)
+        end = max(s.max() for s in filled)
+        mids = np.full((end - start + 1, len(self.Caller.exchanges)), np.nan)
+        for i, (ex_slots, ex_mids) in enumerate(slots.values()):
+            mids[ex_slots - start, i] = ex_mids
+        mids = pd.DataFrame(mids).ffill().values
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = np.diff(np.log(mids), axis=0)
+        returns[~np.isfinite(returns)] = 0.0
+        return returns
+
+
+# =============================================================================
+# Correlation of x[:, idx0[p]] at t with x[:, idx1[p]] at t + lag for every
+# pair p and lag in -max_lag..max_lag. Zero padded to >= n + max_lag so the
+# circular FFT correlation doesn't wrap into the lags we look at.
+# =============================================================================
+def compute_cross_correlations(x: np.ndarray, idx0, idx1, max_lag: int) -> tuple:
+    x = x - x.mean(axis=0)
+    size = 1 << int(np.ceil(np.log2(len(x) + max_lag)))
+    spectra = np.fft.rfft(x, size, axis=0)
+    norms = np.sqrt((x**2).sum(axis=0))
+    lags = np.arange(-max_lag, max_lag + 1)
+    corrs = np.full((len(idx0), len(lags)), np.nan)
+    for p, (i, j) in enumerate(zip(idx0, idx1)):
+        if norms[i] == 0 or norms[j] == 0:
+            continue  # flat series, nothing to correlate
+        cross = np.fft.irfft(np.conj(spectra[:, i]) * spectra[:, j], size)
+        corrs[p] = cross[lags] / (norms[i] * norms[j])  # negative lags wrap
+    return lags, corrs
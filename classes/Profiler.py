@@ -0,0 +1,337 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import os, sys, json, time, signal, pstats, cProfile, threading, tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.time_helpers import determine_cur_utc_timestamp
+from utils.constants import (
+    PROFILE_DIR,
+    PROFILE_TICKS,
+    PROFILE_MODE,
+    PROFILE_SAMPLE_INTERVAL,
+)
+
+MODES = ["cprofile", "sample", "tracemalloc"]
+_profilers = []
+_tracemalloc_users = set()
+_tracemalloc_lock = threading.Lock()
+
+
+# =============================================================================
+# `kill -USR2 <pid>` -> every puller profiles its next PROFILE_TICKS ticks
+# =============================================================================
+def request_profile(signum=None, frame=None):
+    for profiler in _profilers:
+        profiler.request()
+
+
+# =============================================================================
+# Runtime profiling of a running puller, no restart needed.
+# Always on: per-stage timers (count, total, max secs) around fetch, http,
+#   parse, store, frozen check, alerts, scheduling and EOD.
+# On request (SIGUSR2 or GET /profile on the query server), for the next
+# N ticks, any of:
+#   cprofile:    deterministic profile -> .prof (pstats). The tick thread is
+#                profiled throughout, the fetch & pipeline threads inside
+#                their stage timers (cProfile only hooks the thread that
+#                enables it, so each thread runs its own, merged at the end)
+#   sample:      stacks of all threads every PROFILE_SAMPLE_INTERVAL secs
+#                -> collapsed stacks (flamegraph.pl / speedscope)
+#   tracemalloc: allocation snapshot at the end -> .tracemalloc (dump) and a
+#                summary of quote store, pandas & numpy allocations
+# Files go to PROFILE_DIR/{market}_{timestamp}.*
+# =============================================================================
+class Profiler:
+    def __init__(self, Caller, out_dir: str = PROFILE_DIR):
+        self.Caller = Caller
+        self.out_dir = out_dir
+        self.lock = threading.Lock()
+        self.stages = {}  # name -> [count, total secs, max secs]
+        self.requested = None  # (ticks, modes) waiting for the next tick
+        self.capture = None
+        self.last_files = []
+        _profilers.append(self)
+        self.register_signal_handler()
+
+    # =============================================================================
+    # Ask for a capture of the next `ticks` ticks, starts at the next tick
+    # =============================================================================
+    def request(self, ticks: int = PROFILE_TICKS, modes: list = None) -> dict:
+        modes = modes or PROFILE_MODE.split(",")
+        unknown = [m for m in modes if m not in MODES]
+        if unknown:
+            raise ValueError(f"Unknown profile mode(s) {unknown}, choose from {MODES}")
+        with self.lock:
+            self.requested = (max(int(ticks), 1), modes)
+        print(f"Profiling {self.Caller.market} for {ticks} ticks: {modes}")
+        return self.determine_status()
+
+    # =============================================================================
+    # Time a stage, safe to use from the fetch threads
+    # =============================================================================
+    @contextmanager
+    def stage(self, name: str):
+        profile = self.enable_thread_profile()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            secs = time.perf_counter() - started
+            with self.lock:
+                stats = self.stages.setdefault(name, [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += secs
+                stats[2] = max(stats[2], secs)
+            if profile is not None:
+                self.disable_thread_profile(profile)
+
+    # =============================================================================
+    # cProfile of the calling thread while a cprofile capture runs, None if
+    # there's none or it's on already (tick thread, nested stage).
+    # Entries are [profile, enabled], one per thread & capture
+    # =============================================================================
+    def enable_thread_profile(self):
+        capture = self.capture
+        if capture is None or "cprofiles" not in capture:
+            return None
+        ident = threading.get_ident()
+        with self.lock:
+            if capture["closed"]:
+                return None
+            entry = capture["cprofiles"].setdefault(ident, [cProfile.Profile(), False])
+            if entry[1]:
+                return None
+            entry[1] = True
+        try:
+            entry[0].enable()
+        except ValueError:  # 3.12+: one cProfile per process at a time
+            with self.lock:
+                capture["cprofiles"].pop(ident, None)
+            return None
+        return entry
+
+    def disable_thread_profile(self, entry: list):
+        entry[0].disable()
+        with self.lock:
+            entry[1] = False
+
+    # =============================================================================
+    # Start a requested capture
+    # =============================================================================
+    def start_tick(self):
+        with self.lock:
+            requested, self.requested = self.requested, None
+        if requested is not None and self.capture is None:
+            self.begin_capture(*requested)
+
+    # =============================================================================
+    # Count down the capture, write files once done
+    # =============================================================================
+    def end_tick(self):
+        if self.capture is None:
+            return
+        self.capture["ticks_left"] -= 1
+        if self.capture["ticks_left"] <= 0:
+            self.finish_capture()
+
+    # =============================================================================
+    # Turn on the requested profilers
+    # =============================================================================
+    def begin_capture(self, ticks: int, modes: list):
+        capture = {
+            "ticks": ticks,
+            "ticks_left": ticks,
+            "modes": modes,
+            "started": time.perf_counter(),
+            "stages_before": self.copy_stages(),
+        }
+        if "cprofile" in modes:
+            capture["cprofiles"], capture["closed"] = {}, False
+            self.capture = capture
+            capture["tick_profile"] = self.enable_thread_profile()
+            if capture["tick_profile"] is None:
+                print("cProfile not started, another profiler is active")
+                capture.pop("cprofiles")
+        if "sample" in modes:
+            capture["sampler"] = StackSampler(PROFILE_SAMPLE_INTERVAL)
+            capture["sampler"].start()
+        if "tracemalloc" in modes:
+            with _tracemalloc_lock:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(25)
+                _tracemalloc_users.add(id(self))
+        self.capture = capture
+
+    # =============================================================================
+    # Turn profilers off and write everything to PROFILE_DIR
+    # =============================================================================
+    def finish_capture(self):
+        capture, self.capture = self.capture, None
+        os.makedirs(self.out_dir, exist_ok=True)
+        now = determine_cur_utc_timestamp().strftime("%Y%m%d_%H%M%S")
+        base = os.path.join(self.out_dir, f"{self.Caller.market}_{now}")
+        files = []
+        if "cprofiles" in capture:
+            cprofile = self.merge_thread_profiles(capture)
+            if cprofile is not None:
+                cprofile.dump_stats(f"{base}.prof")
+                files.append(f"{base}.prof")
+        if "sampler" in capture:
+            capture["sampler"].stop()
+            capture["sampler"].write_collapsed(f"{base}.stacks.txt")
+            files.append(f"{base}.stacks.txt")
+        if "tracemalloc" in capture["modes"]:
+            files += self.write_tracemalloc_snapshot(base)
+        stages = self.diff_stages(capture["stages_before"], self.copy_stages())
+        summary = {
+            "market": self.Caller.market,
+            "ticks": capture["ticks"],
+            "secs": round(time.perf_counter() - capture["started"], 3),
+            "interval": self.Caller.Scheduler.interval,
+            "stages": stages,
+        }
+        if "cprofiles" in capture:
+            summary["cprofile_threads"] = capture["cprofile_threads"]
+            summary["cprofile_skipped"] = capture["cprofile_skipped"]
+        with open(f"{base}.stages.json", "w") as f:
+            json.dump(summary, f, indent=2)
+        files.append(f"{base}.stages.json")
+        self.last_files = files
+        print(f"Profile of {self.Caller.market} written: {files}")
+
+    # =============================================================================
+    # One pstats of all threads' profiles. Threads still inside a stage keep
+    # their profile on, those are left out (their stats can't be read yet)
+    # =============================================================================
+    def merge_thread_profiles(self, capture: dict):
+        self.disable_thread_profile(capture["tick_profile"])
+        with self.lock:
+            capture["closed"] = True
+            entries = list(capture["cprofiles"].values())
+        done = [p for p, enabled in entries if not enabled and p.getstats()]
+        capture["cprofile_threads"] = len(done)
+        capture["cprofile_skipped"] = len(entries) - len(done)
+        if not done:
+            return None
+        return pstats.Stats(*done)
+
+    # =============================================================================
+    # Snapshot dump for offline analysis + top allocations of interest
+    # =============================================================================
+    def write_tracemalloc_snapshot(self, base: str) -> list:
+        with _tracemalloc_lock:
+            snapshot = tracemalloc.take_snapshot()
+            _tracemalloc_users.discard(id(self))
+            if not _tracemalloc_users:
+                tracemalloc.stop()
+        snapshot.dump(f"{base}.tracemalloc")
+        groups = {
+            "quote store": "*QuoteStore.py",
+            "pandas": "*pandas*",
+            "numpy": "*numpy*",
+            "all": "*",
+        }
+        lines = []
+        for title, pattern in groups.items():
+            filtered = snapshot.filter_traces([tracemalloc.Filter(True, pattern)])
+            stats = filtered.statistics("lineno")
+            total = sum(s.size for s in stats) / 1024**2
+            lines.append(f"=== {title}: {round(total, 2)} MB ===")
+            lines += [str(s) for s in stats[:15]]
+            lines.append("")
+        with open(f"{base}.tracemalloc.txt", "w") as f:
+            f.write("\n".join(lines))
+        return [f"{base}.tracemalloc", f"{base}.tracemalloc.txt"]
+
+    # =============================================================================
+    # Stage timers as {name: {count, total, mean, max}}
+    # =============================================================================
+    def copy_stages(self) -> dict:
+        with self.lock:
+            return {name: list(stats) for name, stats in self.stages.items()}
+
+    def diff_stages(self, before: dict, after: dict) -> dict:
+        stages = {}
+        for name, (count, total, max_secs) in after.items():
+            count_before, total_before, _ = before.get(name, [0, 0.0, 0.0])
+            count, total = count - count_before, total - total_before
+            if count:
+                stages[name] = self.format_stage(count, total, max_secs)
+        return stages
+
+    def format_stage(self, count, total, max_secs) -> dict:
+        return {
+            "count": count,
+            "total": round(total, 4),
+            "mean": round(total / count, 5),
+            "max": round(max_secs, 4),  # since start, not only this capture
+        }
+
+    # =============================================================================
+    # For GET /profile
+    # =============================================================================
+    def determine_status(self) -> dict:
+        stages = {n: self.format_stage(*s) for n, s in self.copy_stages().items() if s[0]}
+        capture = self.capture
+        return {
+            "requested": self.requested,
+            "capturing": None
+            if capture is None
+            else {"modes": capture["modes"], "ticks_left": capture["ticks_left"]},
+            "last_files": self.last_files,
+            "stages": stages,
+        }
+
+    # =============================================================================
+    # Signals can only be registered from the main thread
+    # =============================================================================
+    def register_signal_handler(self):
+        if not hasattr(signal, "SIGUSR2"):
+            return  # windows
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR2, request_profile)
+
+
+# =============================================================================
+# Poor man's sampling profiler: stacks of all threads every `every` secs,
+# counted as collapsed stacks ("thread;outer;...;inner count")
+# =============================================================================
+class StackSampler:
+    def __init__(self, every: float):
+        self.every = every
+        self.counts = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self.stopped.wait(self.every):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    file = os.path.basename(code.co_filename)
+                    stack.append(f"{code.co_name} ({file}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.counts[";".join(reversed(stack))] += 1
+
+    def write_collapsed(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
@@ -0,0 +1,127 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import math
+import numpy as np
+
+
+# =============================================================================
+# DDSketch of non-negative values: quantiles within `alpha` relative error,
+# log spaced buckets (a bucket covers [gamma^(k-1), gamma^k)), so memory only
+# grows with the log of the value range and is capped at max_bins (the lowest
+# buckets get collapsed, the upper quantiles stay exact). Weighted adds.
+# Two sketches with the same alpha merge by adding bucket weights: merging
+# daily sketches gives the same result as one sketch over all the days.
+# =============================================================================
+class DDSketch:
+    MIN_VALUE = 1e-12  # smaller values count as zero
+
+    def __init__(self, alpha: float = 0.01, max_bins: int = 2048):
+        self.alpha = alpha
+        self.max_bins = max_bins
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = {}  # bucket key -> weight
+        self.zero = 0.0
+        self.count = 0.0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    # =============================================================================
+    # Add values (scalar or array, nans are skipped) with a weight each
+    # =============================================================================
+    def add(self, values, weight: float = 1.0):
+        values = np.atleast_1d(np.asarray(values, dtype=float))
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        if (values < 0).any():
+            raise ValueError("DDSketch only takes non-negative values")
+        self.count += weight * len(values)
+        self.sum += weight * float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        positive = values[values > self.MIN_VALUE]
+        self.zero += weight * (len(values) - len(positive))
+        keys = np.ceil(np.log(positive) / self.log_gamma).astype(np.int64)
+        for key, n in zip(*np.unique(keys, return_counts=True)):
+            key = int(key)
+            self.bins[key] = self.bins.get(key, 0.0) + weight * int(n)
+        if len(self.bins) > self.max_bins:
+            self.collapse_lowest_bins()
+
+    # =============================================================================
+    # Value at quantile q (0..1), None if empty
+    # =============================================================================
+    def quantile(self, q: float):
+        if self.count == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * self.count
+        cum = self.zero
+        if cum > rank:
+            return 0.0
+        for key in sorted(self.bins):
+            cum += self.bins[key]
+            if cum > rank:
+                value = 2 * self.gamma**key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def quantiles(self, qs: list) -> list:
+        return [self.quantile(q) for q in qs]
+
+    def mean(self):
+        return None if self.count == 0 else self.sum / self.count
+
+    # =============================================================================
+    # Add another sketch's weights into this one
+    # =============================================================================
+    def merge(self, other: "DDSketch"):
+        if other.alpha != self.alpha:
+            raise ValueError(
+                f"Can't merge sketches of alpha {self.alpha} & {other.alpha}"
+            )
+        for key, weight in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0.0) + weight
+        self.zero += other.zero
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self.bins) > self.max_bins:
+            self.collapse_lowest_bins()
+        return self
+
+    def collapse_lowest_bins(self):
+        keys = sorted(self.bins)
+        n = len(keys) - self.max_bins + 1  # lowest n buckets become one
+        self.bins[keys[n - 1]] = sum(self.bins.pop(k) for k in keys[:n])
+
+    # =============================================================================
+    # Plain dict (json serializable) and back
+    # =============================================================================
+    def to_dict(self) -> dict:
+        return {
+            "alpha": self.alpha,
+            "max_bins": self.max_bins,
+            "zero": self.zero,
+            "count": self.count,
+            "sum": self.sum,
+            "min": None if self.count == 0 else self.min,
+            "max": None if self.count == 0 else self.max,
+            "bins": {str(k): w for k, w in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "DDSketch":
+        sketch = cls(d["alpha"], d["max_bins"])
+        sketch.bins = {int(k): float(w) for k, w in d["bins"].items()}
+        sketch.zero, sketch.count, sketch.sum = d["zero"], d["count"], d["sum"]
+        if d["count"]:
+            sketch.min, sketch.max = d["min"], d["max"]
+        return sketch
@@ -0,0 +1,224 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import json, threading, traceback
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.constants import QUERY_SERVER_HOST, QUERY_SERVER_PORT, PROFILE_TICKS
+
+
+# =============================================================================
+# HTTP endpoint on localhost for today's data in the quote store.
+# Every request reads snapshots of the store, the sampling loop never waits.
+# Read-only, except /profile with params: that starts a capture on the puller.
+#   GET /latest                                  -> latest quote per exchange
+#   GET /range?exchange=DYDX&start=...&end=...   -> rows in [start, end)
+#   GET /bars?exchange=DYDX&rule=1min&col=mid    -> OHLC bars + count
+#   GET /spreads                                 -> current pair spreads
+#   GET /sinks                                   -> output sink metrics
+#   GET /executable                              -> latest executable spreads
+#   GET /hedging                                 -> hedge & win rate per venue
+#   GET /fetch_sync                              -> fetch barrier send skew
+#   GET /pipeline                                -> stage queues, drops & lag
+#   GET /profile[?ticks=20&mode=cprofile,sample] -> stage timers, and with
+#       params: profile the next ticks (changes state, see above)
+# =============================================================================
+class QueryServer:
+    def __init__(
+        self, Caller, host: str = QUERY_SERVER_HOST, port: int = QUERY_SERVER_PORT
+    ):
+        self.Caller = Caller
+        self.host = host
+        self.port = port
+        self.server = None
+        self.routes = {
+            "/latest": self.query_latest,
+            "/range": self.query_range,
+            "/bars": self.query_bars,
+            "/spreads": self.query_spreads,
+            "/profile": self.query_profile,
+            "/sinks": self.query_sinks,
+            "/executable": self.query_executable,
+            "/hedging": self.query_hedging,
+            "/fetch_sync": self.query_fetch_sync,
+            "/pipeline": self.query_pipeline,
+        }
+
+    # =============================================================================
+    # Serve in a daemon thread, port 0 disables the server. A port that's
+    # taken (another puller on this host) only costs the endpoint, sampling
+    # goes on without it
+    # =============================================================================
+    def start(self):
+        if self.server is not None or not self.port:
+            return
+        try:
+            server = ThreadingHTTPServer((self.host, self.port), self.create_handler())
+        except OSError as e:
+            print(f"Query server not started on {self.host}:{self.port}: {e}")
+            return
+        self.server = server
+        self.server.daemon_threads = True
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        print(f"Query server listening on http://{self.host}:{self.port}")
+
+    # =============================================================================
+    # Stop serving
+    # =============================================================================
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    # =============================================================================
+    # Route request to query function, answer with json
+    # =============================================================================
+    def handle_request(self, path: str) -> tuple:
+        url = urlparse(path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if url.path not in self.routes:
+            return 404, {"error": f"Unknown endpoint {url.path}"}
+        try:
+            return 200, self.routes[url.path](params)
+        except KeyError as e:
+            return 400, {"error": f"Missing or unknown parameter: {e}"}
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            traceback.print_exc()
+            return 500, {"error": str(e)}
+
+    # =============================================================================
+    # Latest row of every exchange
+    # =============================================================================
+    def query_latest(self, params: dict) -> dict:
+        store = self.Caller.df_obj
+        latest = {}
+        for ex in store:
+            rows = self.convert_df_to_records(store.tail(ex, 1))
+            if rows:
+                latest[ex] = rows[0]
+        return latest
+
+    # =============================================================================
+    # All rows of one exchange between start and end (defaults: whole day)
+    # =============================================================================
+    def query_range(self, params: dict) -> list:
+        df = self.select_rows(params)
+        return self.convert_df_to_records(df)
+
+    # =============================================================================
+    # Resample one column of an exchange into OHLC bars
+    # =============================================================================
+    def query_bars(self, params: dict) -> list:
+        df = self.select_rows(params)
+        col = params.get("col", "mid")
+        series = df.set_index("timestamp")[col]
+        resampled = series.resample(params.get("rule", "1min"))
+        bars = resampled.ohlc()
+        bars["count"] = resampled.count()
+        return self.convert_df_to_records(bars.reset_index())
+
+    # =============================================================================
+    # Abs and pct mid difference of every pair using the latest rows
+    # =============================================================================
+    def query_spreads(self, params: dict) -> dict:
+        latest = self.query_latest(params)
+        spreads = {}
+        for pair in self.Caller.diff_pairs:
+            ex0, ex1 = pair.split("-")
+            if ex0 not in latest or ex1 not in latest:
+                continue
+            mid0, mid1 = latest[ex0]["mid"], latest[ex1]["mid"]
+            if mid0 is None or mid1 is None:
+                continue
+            abs_diff = abs(mid0 - mid1)
+            pct_diff = abs_diff / ((mid0 + mid1) / 2) * 100
+            spreads[pair] = {"abs": round(abs_diff, 3), "pct": round(pct_diff, 3)}
+        return spreads
+
+    # =============================================================================
+    # Top of book & VWAP spreads of the last tick per ordered pair (buy>sell)
+    # =============================================================================
+    def query_executable(self, params: dict) -> dict:
+        return self.Caller.ExecutableSpreads.format_latest()
+
+    # =============================================================================
+    # Queue depths, backpressure & failures of the output sinks
+    # =============================================================================
+    def query_sinks(self, params: dict) -> dict:
+        return self.Caller.Sinks.determine_metrics()
+
+    # =============================================================================
+    # Hedged requests & latency percentiles per venue
+    # =============================================================================
+    def query_hedging(self, params: dict) -> dict:
+        return self.Caller.GetBidAsks.Hedger.determine_stats()
+
+    # =============================================================================
+    # Skew between the earliest & latest send of a tick (FETCH_SYNC=barrier)
+    # =============================================================================
+    def query_fetch_sync(self, params: dict) -> dict:
+        return self.Caller.FetchBarrier.determine_stats()
+
+    # =============================================================================
+    # Queue depths, drops & lag of the store and analysis stages
+    # =============================================================================
+    def query_pipeline(self, params: dict) -> dict:
+        return self.Caller.Pipeline.determine_metrics()
+
+    # =============================================================================
+    # Profiler status, start a capture if ticks or mode are given
+    # =============================================================================
+    def query_profile(self, params: dict) -> dict:
+        profiler = self.Caller.Profiler
+        if "ticks" not in params and "mode" not in params:
+            return profiler.determine_status()
+        modes = params["mode"].split(",") if "mode" in params else None
+        return profiler.request(int(params.get("ticks", PROFILE_TICKS)), modes)
+
+    # =============================================================================
+    # Rows of `exchange` param, optionally restricted to [start, end)
+    # =============================================================================
+    def select_rows(self, params: dict) -> pd.DataFrame:
+        store = self.Caller.df_obj
+        exchange = params["exchange"]
+        if "start" not in params and "end" not in params:
+            return store[exchange]
+        start = params.get("start", "1970-01-01")
+        end = params.get("end", "2262-01-01")
+        return store.between(exchange, start, end)
+
+    # =============================================================================
+    # DataFrame to json-safe list of dicts (nan -> None, iso timestamps)
+    # =============================================================================
+    def convert_df_to_records(self, df: pd.DataFrame) -> list:
+        return json.loads(df.to_json(orient="records", date_format="iso"))
+
+    # =============================================================================
+    # Build handler class bound to this server instance
+    # =============================================================================
+    def create_handler(self):
+        query_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, payload = query_server.handle_request(self.path)
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # keep the console for the puller
+
+        return Handler
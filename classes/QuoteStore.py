@@ -0,0 +1,353 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import os, uuid, shutil, threading
+from collections import deque
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.constants import (
+    QUOTE_STORE_MAX_MB,
+    QUOTE_STORE_CHUNK_ROWS,
+    QUOTE_STORE_SPILL_DIR,
+    QUOTE_STORE_MODE,
+)
+
+BYTES_PER_MB = 1024 * 1024
+QUOTE_FIELDS = ["bid_price", "bid_size", "ask_price", "ask_size"]
+TICK_DTYPE = np.dtype(
+    [("timestamp", "datetime64[ns]"), ("interval", "float64"), ("presence", "uint64")]
+)
+MAX_DELTA_EXCHANGES = TICK_DTYPE["presence"].itemsize * 8  # one bit each
+
+
+# =============================================================================
+# Rows of a single exchange. Sealed chunks are immutable (in memory or memmap),
+# the hot chunk is preallocated and filled row by row.
+# CAUTION: `state` is swapped as ONE tuple so readers never see a torn update!
+# =============================================================================
+class ExchangeSeries:
+    def __init__(self, dtype: np.dtype, chunk_rows: int):
+        self.dtype = dtype
+        self.chunk_rows = chunk_rows
+        self.state = ((), np.zeros(chunk_rows, dtype=dtype), 0)
+
+    # =============================================================================
+    # Write row into hot chunk, seal the chunk once it is full
+    # =============================================================================
+    def append(self, values: tuple):
+        chunks, hot, n = self.state
+        hot[n] = values
+        n += 1
+        if n == self.chunk_rows:
+            self.state = (chunks + (hot,), np.zeros(self.chunk_rows, self.dtype), 0)
+            return True  # a new chunk was sealed
+        self.state = (chunks, hot, n)
+        return False
+
+    # =============================================================================
+    # Swap a sealed chunk for its spilled (memory-mapped) version
+    # =============================================================================
+    def replace_chunk(self, idx: int, chunk: np.ndarray):
+        chunks, hot, n = self.state
+        chunks = chunks[:idx] + (chunk,) + chunks[idx + 1 :]
+        self.state = (chunks, hot, n)
+
+    # =============================================================================
+    # Total amount of rows
+    # =============================================================================
+    def count_rows(self) -> int:
+        chunks, _, n = self.state
+        return sum(len(c) for c in chunks) + n
+
+    # =============================================================================
+    # All rows as one structured array (copy, safe to hold on to)
+    # =============================================================================
+    def to_array(self) -> np.ndarray:
+        chunks, hot, n = self.state
+        return np.concatenate(list(chunks) + [hot[:n]])
+
+    # =============================================================================
+    # Last n rows, only touches the chunks that are actually needed
+    # =============================================================================
+    def tail(self, rows: int) -> np.ndarray:
+        chunks, hot, n = self.state
+        parts, needed = [hot[max(n - rows, 0) : n]], rows - n
+        for chunk in reversed(chunks):
+            if needed <= 0:
+                break
+            parts.insert(0, chunk[max(len(chunk) - needed, 0) :])
+            needed -= len(chunk)
+        return np.concatenate(parts)
+
+    # =============================================================================
+    # Rows with start <= timestamp < end, timestamps are sorted per chunk
+    # =============================================================================
+    def between(self, start: np.datetime64, end: np.datetime64) -> np.ndarray:
+        chunks, hot, n = self.state
+        parts = []
+        for chunk in list(chunks) + [hot[:n]]:
+            if len(chunk) == 0 or chunk["timestamp"][-1] < start:
+                continue
+            if chunk["timestamp"][0] >= end:
+                break
+            lo, hi = np.searchsorted(chunk["timestamp"], [start, end])
+            parts.append(chunk[lo:hi])
+        return np.concatenate(parts) if parts else np.zeros(0, self.dtype)
+
+    # =============================================================================
+    # Last row with timestamp < ts (0 or 1 rows)
+    # =============================================================================
+    def last_before(self, ts: np.datetime64) -> np.ndarray:
+        chunks, hot, n = self.state
+        for chunk in [hot[:n]] + list(reversed(chunks)):
+            idx = np.searchsorted(chunk["timestamp"], ts)
+            if idx > 0:
+                return chunk[idx - 1 : idx]
+        return np.zeros(0, self.dtype)
+
+
+# =============================================================================
+# Intraday bid/ask store with a memory budget. Old chunks spill to disk.
+# Behaves like the old `df_obj` dict: df_obj[exchange] returns a DataFrame.
+# mode "delta": a row is only stored when an exchange's bid/ask price or size
+# changed. Every tick goes into a tick series (timestamp, interval, presence
+# bitmap: bit i = i-th exchange stored a row), and reads forward fill the
+# stored rows onto the tick grid, so readers still get one row per tick.
+# changes(exchange) & tick_grid() give the compact form. Those reads combine
+# two series, so they snapshot both under the lock ticks are appended with.
+# =============================================================================
+class QuoteStore(Mapping):
+    def __init__(
+        self,
+        max_mb: float = QUOTE_STORE_MAX_MB,
+        chunk_rows: int = QUOTE_STORE_CHUNK_ROWS,
+        spill_dir: str = QUOTE_STORE_SPILL_DIR,
+        mode: str = QUOTE_STORE_MODE,
+        exchanges: list = None,
+    ):
+        self.delta = mode == "delta"
+        self.lock = threading.Lock()
+        self.bits = {}  # exchange -> its presence bit
+        for exchange in exchanges or []:
+            self.register_exchange(exchange)
+        self.max_bytes = int(max_mb * BYTES_PER_MB)
+        self.chunk_rows = chunk_rows
+        self.spill_dir = os.path.join(spill_dir, uuid.uuid4().hex)
+        self.series = {}
+        self.dtype = None
+        self.in_memory = deque()  # sealed chunks still in RAM, oldest first
+        self.spilled_chunks = 0
+        self.ticks = ExchangeSeries(TICK_DTYPE, chunk_rows)  # delta, never spilled
+        self.last_quotes = {}  # exchange -> quote fields of the last stored row
+
+    # =============================================================================
+    # Append the rows of one tick, in delta mode only the changed ones. The
+    # tick goes in last, readers never see a tick without its rows.
+    # =============================================================================
+    def append_tick(self, bid_asks: dict, interval):
+        with self.lock:
+            presence = 0
+            for exchange, bid_ask in bid_asks.items():
+                if self.append(exchange, bid_ask):
+                    presence |= self.bits[exchange]
+            if self.delta:
+                ts = next(iter(bid_asks.values()))["timestamp"]
+                ts = np.datetime64(pd.Timestamp(ts).tz_localize(None), "ns")
+                self.ticks.append((ts, interval, presence))
+
+    # =============================================================================
+    # Give exchange the next presence bit, delta mode has room for 64
+    # =============================================================================
+    def register_exchange(self, exchange: str):
+        if exchange in self.bits:
+            return
+        if self.delta and len(self.bits) >= MAX_DELTA_EXCHANGES:
+            msg = f"Delta quote store holds at most {MAX_DELTA_EXCHANGES} exchanges"
+            raise ValueError(f"{msg}, can't add {exchange}")
+        self.bits[exchange] = 1 << len(self.bits)
+
+    # =============================================================================
+    # Append a new bid_ask row for exchange, spill if we're over budget.
+    # False if skipped (delta mode, quote unchanged)
+    # =============================================================================
+    def append(self, exchange: str, bid_ask: dict) -> bool:
+        if self.dtype is None:
+            self.dtype = self.create_dtype(bid_ask)
+        if exchange not in self.series:
+            self.register_exchange(exchange)
+            self.series[exchange] = ExchangeSeries(self.dtype, self.chunk_rows)
+        if self.delta and not self.check_if_changed(exchange, bid_ask):
+            return False
+        series = self.series[exchange]
+        if series.append(self.convert_bid_ask_to_values(bid_ask)):
+            chunks, _, _ = series.state
+            self.in_memory.append((exchange, len(chunks) - 1))
+            self.spill_chunks_if_over_budget()
+        return True
+
+    # =============================================================================
+    # Any quote field different from the last stored row (nan == nan)
+    # =============================================================================
+    def check_if_changed(self, exchange: str, bid_ask: dict) -> bool:
+        quotes = np.array([bid_ask.get(f, np.nan) for f in QUOTE_FIELDS], dtype=float)
+        last = self.last_quotes.get(exchange)
+        if last is not None and np.array_equal(quotes, last, equal_nan=True):
+            return False
+        self.last_quotes[exchange] = quotes
+        return True
+
+    # =============================================================================
+    # Last n rows of an exchange as a DataFrame
+    # =============================================================================
+    def tail(self, exchange: str, rows: int) -> pd.DataFrame:
+        if not self.delta:
+            return pd.DataFrame(self.series[exchange].tail(rows))
+        with self.lock:
+            grid = self.ticks.tail(rows)
+            # at most `rows` changes inside the grid, +1 carries in the state before
+            changes = self.series[exchange].tail(rows + 1)
+        return expand_changes(pd.DataFrame(changes), pd.DataFrame(grid))
+
+    # =============================================================================
+    # Rows of an exchange within [start, end) as a DataFrame
+    # =============================================================================
+    def between(self, exchange: str, start, end) -> pd.DataFrame:
+        start = np.datetime64(pd.Timestamp(start).tz_localize(None), "ns")
+        end = np.datetime64(pd.Timestamp(end).tz_localize(None), "ns")
+        if not self.delta:
+            return pd.DataFrame(self.series[exchange].between(start, end))
+        with self.lock:
+            grid = self.ticks.between(start, end)
+            if len(grid) == 0:
+                return pd.DataFrame(np.zeros(0, self.dtype))
+            series = self.series[exchange]
+            before = series.last_before(grid["timestamp"][0])
+            rows = np.concatenate([before, series.between(start, end)])
+        return expand_changes(pd.DataFrame(rows), pd.DataFrame(grid))
+
+    # =============================================================================
+    # Delta mode: the stored (changed) rows & the tick grid, as saved to S3
+    # =============================================================================
+    def changes(self, exchange: str) -> pd.DataFrame:
+        return pd.DataFrame(self.series[exchange].to_array())
+
+    def tick_grid(self) -> pd.DataFrame:
+        return pd.DataFrame(self.ticks.to_array())
+
+    # =============================================================================
+    # Amount of rows saved for exchange
+    # =============================================================================
+    def count_rows(self, exchange: str) -> int:
+        if self.delta:
+            return self.ticks.count_rows()
+        return self.series[exchange].count_rows()
+
+    def count_stored_rows(self, exchange: str) -> int:
+        return self.series[exchange].count_rows()
+
+    # =============================================================================
+    # Bytes currently held in RAM (hot chunks + sealed chunks not spilled yet)
+    # =============================================================================
+    def determine_memory_usage(self) -> int:
+        if self.dtype is None:
+            return 0
+        chunks = len(self.series) + len(self.in_memory)
+        tick_chunks = len(self.ticks.state[0]) + 1 if self.delta else 0
+        ticks = tick_chunks * self.chunk_rows * TICK_DTYPE.itemsize
+        return chunks * self.chunk_rows * self.dtype.itemsize + ticks
+
+    # =============================================================================
+    # Move the oldest sealed chunks to memory-mapped files until under budget
+    # =============================================================================
+    def spill_chunks_if_over_budget(self):
+        while self.in_memory and self.determine_memory_usage() > self.max_bytes:
+            exchange, idx = self.in_memory.popleft()
+            self.spill_chunk(exchange, idx)
+
+    # =============================================================================
+    # Write chunk to disk and swap in the read-only memmap
+    # =============================================================================
+    def spill_chunk(self, exchange: str, idx: int):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f"{exchange}-{idx}.npy")
+        series = self.series[exchange]
+        chunks, _, _ = series.state
+        np.save(path, chunks[idx])
+        series.replace_chunk(idx, np.load(path, mmap_mode="r"))
+        self.spilled_chunks += 1
+
+    # =============================================================================
+    # Delete spilled files. Store can't be used afterwards!
+    # =============================================================================
+    def close(self):
+        self.series = {}
+        self.in_memory.clear()
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    # =============================================================================
+    # Structured dtype from the first bid_ask dict: timestamp + float columns
+    # =============================================================================
+    def create_dtype(self, bid_ask: dict) -> np.dtype:
+        fields = [("timestamp", "datetime64[ns]")]
+        for key, val in bid_ask.items():
+            if key != "timestamp" and self.check_if_numeric(val):
+                fields.append((key, "float64"))
+        return np.dtype(fields)
+
+    # =============================================================================
+    # Order bid_ask values like the dtype, missing keys become nan
+    # =============================================================================
+    def convert_bid_ask_to_values(self, bid_ask: dict) -> tuple:
+        ts = np.datetime64(pd.Timestamp(bid_ask["timestamp"]).tz_localize(None), "ns")
+        vals = [bid_ask.get(name, np.nan) for name in self.dtype.names[1:]]
+        return (ts, *[np.nan if v is None else v for v in vals])
+
+    # =============================================================================
+    # Only numeric scalars go into the store
+    # =============================================================================
+    def check_if_numeric(self, val) -> bool:
+        return isinstance(val, (int, float, np.number)) and not isinstance(val, bool)
+
+    # =============================================================================
+    # Mapping interface, keeps `df_obj[exchange]` & `df_obj.items()` working
+    # =============================================================================
+    def __getitem__(self, exchange: str) -> pd.DataFrame:
+        if self.delta:
+            with self.lock:
+                changes = self.series[exchange].to_array()
+                grid = self.ticks.to_array()
+            return expand_changes(pd.DataFrame(changes), pd.DataFrame(grid))
+        return pd.DataFrame(self.series[exchange].to_array())
+
+    def __iter__(self):
+        return iter(list(self.series.keys()))
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+    def __repr__(self) -> str:
+        lines = []
+        for ex in self:
+            lines.append(f"{ex}: {self.count_rows(ex)} rows")
+            lines.append(str(self.tail(ex, 5)))
+        mb = round(self.determine_memory_usage() / BYTES_PER_MB, 2)
+        lines.append(f"In memory: {mb}MB, spilled chunks: {self.spilled_chunks}")
+        return "\n".join(lines)
+
+
+# =============================================================================
+# Stored rows forward filled onto the tick grid: one row per tick with the
+# tick's timestamp & interval and the last quote stored at or before it
+# =============================================================================
+def expand_changes(changes: pd.DataFrame, grid: pd.DataFrame) -> pd.DataFrame:
+    quotes = changes.drop(columns="interval", errors="ignore")
+    expanded = pd.merge_asof(grid[["timestamp", "interval"]], quotes, on="timestamp")
+    cols = list(changes.columns)
+    if "interval" not in cols:
+        cols.append("interval")  # changed rows saved without it
+    return expanded[cols]
@@ -0,0 +1,198 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import time, threading
+import datetime as dt
+from email.utils import parsedate_to_datetime
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.constants import (
+    RATE_LIMITS,
+    REQUEST_WEIGHTS,
+    RATE_LIMIT_MAX_WAIT,
+    RATE_LIMIT_SCALE,
+)
+
+
+# =============================================================================
+# Raised instead of sending a request that would break the venue's limit
+# =============================================================================
+class RateLimitExceeded(Exception):
+    pass
+
+
+# =============================================================================
+# Token bucket: `capacity` tokens, refilled continuously over `period` secs
+# =============================================================================
+class TokenBucket:
+    def __init__(self, capacity: float, period: float):
+        self.capacity = capacity
+        self.refill_per_sec = capacity / period
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    # =============================================================================
+    # Take `weight` tokens, wait at most max_wait secs for them
+    # =============================================================================
+    def acquire(self, weight: float, max_wait: float) -> bool:
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.refill(now)
+                if now >= self.blocked_until and self.tokens >= weight:
+                    self.tokens -= weight
+                    return True
+                wait = max(
+                    self.blocked_until - now,
+                    (weight - self.tokens) / self.refill_per_sec,
+                )
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def refill(self, now: float):
+        elapsed = now - self.updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_sec)
+        self.updated = now
+
+    # =============================================================================
+    # Venue told us how much it has counted, trust it over our own estimate
+    # =============================================================================
+    def correct_used(self, used: float):
+        with self.lock:
+            self.refill(time.monotonic())
+            self.tokens = min(self.tokens, self.capacity - used)
+
+    # =============================================================================
+    # 429/418: no tokens and no requests until retry_after passed
+    # =============================================================================
+    def block(self, retry_after: float):
+        with self.lock:
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+            self.blocked_until = max(self.blocked_until, self.updated + retry_after)
+
+    def determine_available(self) -> float:
+        with self.lock:
+            now = time.monotonic()
+            self.refill(now)
+            return 0.0 if now < self.blocked_until else self.tokens
+
+
+# =============================================================================
+# One bucket per exchange, seeded from the declared limits and corrected
+# with the response headers. Shared by everything in the process.
+# `scale`: limits are scaled (safety factor, shard share), so is the usage
+# the venue reports.
+# =============================================================================
+class RateLimiter:
+    def __init__(
+        self,
+        limits: dict = RATE_LIMITS,
+        weights: dict = REQUEST_WEIGHTS,
+        scale: float = RATE_LIMIT_SCALE,
+    ):
+        self.weights = weights
+        self.scale = scale
+        self.buckets = {ex: TokenBucket(*limit) for ex, limit in limits.items()}
+        self.stats = {ex: {"sent": 0, "throttled": 0, "429": 0} for ex in limits}
+
+    # =============================================================================
+    # Call before every request, raises if budget is gone
+    # =============================================================================
+    def acquire(
+        self, exchange: str, max_wait: float = RATE_LIMIT_MAX_WAIT, weight=None
+    ):
+        if exchange not in self.buckets:
+            return
+        weight = self.weights[exchange] if weight is None else weight
+        bucket = self.buckets[exchange]
+        acquired = bucket.acquire(weight, max_wait)
+        with bucket.lock:
+            self.stats[exchange]["sent" if acquired else "throttled"] += 1
+        if not acquired:
+            raise RateLimitExceeded(f"{exchange} rate limit budget exhausted")
+
+    # =============================================================================
+    # Read usage/ban info from the response
+    # =============================================================================
+    def update_from_response(self, exchange: str, res):
+        if exchange not in self.buckets:
+            return
+        bucket = self.buckets[exchange]
+        used = res.headers.get("X-MBX-USED-WEIGHT-1M") or res.headers.get(
+            "X-MBX-USED-WEIGHT"
+        )
+        if used is not None:
+            bucket.correct_used(float(used) * self.scale)
+        if res.status_code in [418, 429]:
+            with bucket.lock:
+                self.stats[exchange]["429"] += 1
+            bucket.block(parse_retry_after(res.headers.get("Retry-After")))
+
+    # =============================================================================
+    # Is there budget left for another try of this tick?
+    # =============================================================================
+    def can_retry(self, exchange: str) -> bool:
+        if exchange not in self.buckets:
+            return True
+        return self.buckets[exchange].determine_available() >= self.weights[exchange]
+
+    # =============================================================================
+    # Smallest interval at which `requests_per_tick` fit into the limit
+    # =============================================================================
+    def determine_min_interval(self, exchange: str, requests_per_tick: int) -> float:
+        if exchange not in self.buckets:
+            return 0.0
+        weight = self.weights[exchange] * requests_per_tick
+        return weight / self.buckets[exchange].refill_per_sec
+
+    # =============================================================================
+    # Retries per tick that fit into the budget on top of the normal requests
+    # =============================================================================
+    def determine_retry_budget(self, exchange, interval, requests_per_tick) -> int:
+        if exchange not in self.buckets:
+            return -1  # unknown venue, no limit
+        bucket, weight = self.buckets[exchange], self.weights[exchange]
+        spare = bucket.refill_per_sec * interval - weight * requests_per_tick
+        return max(int(spare // weight), 0)
+
+
+# =============================================================================
+# Retry-After is secs or an HTTP date, 60 secs if missing or unreadable
+# =============================================================================
+def parse_retry_after(value, default: float = 60) -> float:
+    if value is None:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=dt.timezone.utc)
+    now = dt.datetime.now(dt.timezone.utc)
+    return max((retry_at - now).total_seconds(), 0.0)
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+# =============================================================================
+# Process wide instance, all pullers share the same IP budget
+# =============================================================================
+def get_rate_limiter() -> RateLimiter:
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if not _rate_limiter:
+            _rate_limiter = RateLimiter()
+    return _rate_limiter
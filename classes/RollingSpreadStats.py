@@ -0,0 +1,145 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+from bisect import bisect_left, insort
+import numpy as np
+
+STD_EPSILON = 1e-9  # std floor where no better one (tick size) is known
+
+
+# =============================================================================
+# Rolling mean/variance of the spread of ALL pairs at once (numpy arrays of
+# shape (pairs,)). Exponentially weighted + fixed window, O(1) per tick.
+# NaN spreads (failed fetch, loose orderbook) don't update a pair.
+# Window sums are kept as deviations from a per pair reference value (rebased
+# to the window mean every `window` ticks), so the variance doesn't cancel
+# out on spreads that are large compared to their movement.
+# percentiles=True also keeps every pair's window sorted, percentile ranks are
+# a binary search instead of comparing against the whole window.
+# =============================================================================
+class RollingSpreadStats:
+    def __init__(
+        self,
+        pairs: list,
+        window: int,
+        halflife: float,
+        min_periods: int,
+        percentiles: bool = False,
+    ):
+        self.pairs = pairs
+        self.window = window
+        self.alpha = 1 - 0.5 ** (1 / halflife)  # ewm decay per tick
+        self.min_periods = min_periods
+        n = len(pairs)
+
+        self.ew_mean = np.full(n, np.nan)
+        self.ew_var = np.zeros(n)
+        self.ew_count = np.zeros(n, dtype=np.int64)
+
+        self.ring = np.full((window, n), np.nan)
+        self.pos = 0
+        self.win_ref = np.full(n, np.nan)  # sums are of x - win_ref
+        self.win_sum = np.zeros(n)
+        self.win_sumsq = np.zeros(n)
+        self.win_count = np.zeros(n, dtype=np.int64)
+        self.updates = 0
+        self.sorted = [[] for _ in pairs] if percentiles else None
+
+    # =============================================================================
+    # Add one tick of spreads
+    # =============================================================================
+    def update(self, x: np.ndarray):
+        valid = ~np.isnan(x)
+        self.update_ewm(x, valid)
+        self.update_window(x, valid)
+        self.updates += 1
+        if self.updates % self.window == 0:
+            self.recompute_window_sums()  # keep float drift of running sums in check
+
+    # =============================================================================
+    # Exponentially weighted mean and variance (West's incremental form)
+    # =============================================================================
+    def update_ewm(self, x: np.ndarray, valid: np.ndarray):
+        first = valid & np.isnan(self.ew_mean)
+        self.ew_mean[first] = x[first]
+        upd = valid & ~first
+        delta = x[upd] - self.ew_mean[upd]
+        self.ew_mean[upd] += self.alpha * delta
+        self.ew_var[upd] = (1 - self.alpha) * (self.ew_var[upd] + self.alpha * delta**2)
+        self.ew_count += valid
+
+    # =============================================================================
+    # Fixed window: swap oldest value out of the running sums, new value in
+    # =============================================================================
+    def update_window(self, x: np.ndarray, valid: np.ndarray):
+        old = self.ring[self.pos].copy()  # the row gets overwritten below
+        old_valid = ~np.isnan(old)
+        old_dev = old[old_valid] - self.win_ref[old_valid]
+        self.win_sum[old_valid] -= old_dev
+        self.win_sumsq[old_valid] -= old_dev**2
+        self.win_count -= old_valid
+
+        first = valid & np.isnan(self.win_ref)
+        self.win_ref[first] = x[first]
+        dev = x[valid] - self.win_ref[valid]
+        self.win_sum[valid] += dev
+        self.win_sumsq[valid] += dev**2
+        self.win_count += valid
+        self.ring[self.pos] = x
+        self.pos = (self.pos + 1) % self.window
+        if self.sorted is not None:
+            self.update_sorted(old, old_valid, x, valid)
+
+    def update_sorted(self, old, old_valid, x, valid):
+        for i in np.flatnonzero(old_valid):
+            values = self.sorted[i]
+            del values[bisect_left(values, old[i])]
+        for i in np.flatnonzero(valid):
+            insort(self.sorted[i], x[i])
+
+    # =============================================================================
+    # Rebase the references to the window means & sum the ring up again
+    # =============================================================================
+    def recompute_window_sums(self):
+        self.win_count = (~np.isnan(self.ring)).sum(axis=0)
+        filled = self.win_count > 0
+        sums = np.nansum(self.ring[:, filled], axis=0)
+        self.win_ref[filled] = sums / self.win_count[filled]
+        dev = self.ring - self.win_ref
+        self.win_sum = np.nansum(dev, axis=0)
+        self.win_sumsq = np.nansum(dev**2, axis=0)
+
+    # =============================================================================
+    # z-scores of x against the current stats (call BEFORE update with x).
+    # The std is floored at `std_floor` (e.g. one tick, per pair): a window
+    # that barely moved doesn't turn a one tick change into a huge z. Flat
+    # windows (zero variance) have no distribution yet and count as not ready
+    # =============================================================================
+    def compute_zscores(self, x: np.ndarray, std_floor=None) -> dict:
+        floor = STD_EPSILON if std_floor is None else np.fmax(std_floor, STD_EPSILON)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # var starts at 0, correct for the missing weight of early ticks
+            ew_var = self.ew_var / (1 - (1 - self.alpha) ** (self.ew_count - 1))
+            ew_z = (x - self.ew_mean) / np.fmax(np.sqrt(ew_var), floor)
+            n = self.win_count
+            win_dev = self.win_sum / n
+            win_mean = self.win_ref + win_dev
+            win_var = (self.win_sumsq - n * win_dev**2) / (n - 1)
+            win_z = (x - win_mean) / np.fmax(np.sqrt(np.maximum(win_var, 0)), floor)
+        not_ready = self.win_count < self.min_periods
+        ew_z[not_ready | ~(ew_var > 0)] = np.nan
+        win_z[not_ready | ~(win_var > 0)] = np.nan
+        return {"ew": ew_z, "window": win_z, "win_mean": win_mean}
+
+    # =============================================================================
+    # Percentile rank (0-100) of x within each pair's window: values below x
+    # by binary search in the sorted window
+    # =============================================================================
+    def compute_percentiles(self, x: np.ndarray) -> np.ndarray:
+        if self.sorted is None:
+            raise Exception("RollingSpreadStats created without percentiles=True")
+        pct = np.full(len(x), np.nan)
+        ready = (self.win_count >= self.min_periods) & ~np.isnan(x)
+        for i in np.flatnonzero(ready):
+            pct[i] = bisect_left(self.sorted[i], x[i]) / self.win_count[i] * 100
+        return pct
@@ -2,7 +2,6 @@
 # IMPORTS
 # =============================================================================
 import sys, os
-from io import StringIO
 import pandas as pd
 
 
@@ -11,30 +10,41 @@ import pandas as pd
 # =============================================================================
 sys.path.append(os.path.abspath("./utils"))
 from utils.jprint import jprint
-from utils.constants import BUCKET_NAME, S3
+from utils.s3_paths import create_changes_key, create_ticks_key
 
 # =============================================================================
-# Save raw exchange specific data to S3
+# Save raw exchange specific data to S3 (and the other configured sinks)
 # =============================================================================
 class SaveRawData:
     def __init__(self, Caller):
         self.Caller = Caller
 
     # =============================================================================
-    # Save the updated df to S3
+    # Save the updated df to S3. Delta store: only the changed rows per exchange
+    # (changes keys, the raw keys stay empty) + the tick grid,
+    # HistoricalLoader.load_raw fills them back onto the grid
     # =============================================================================
-    def save_raw_bid_ask_data_to_s3(self) -> None:
-        for exchange, df in self.Caller.df_obj.items():
+    def save_raw_bid_ask_data_to_s3(self):
+        store = self.Caller.df_obj
+        if store.delta:
+            return self.save_changes_n_tick_grid(store)
+        jobs = []
+        for exchange, df in store.items():
             df = self.prepare_df_for_s3(df)
             path = self.update_cur_s3_filepath(self.Caller.S3_BASE_PATHS[exchange])
-            csv_buffer = StringIO()
-            df.to_csv(csv_buffer)
-            response = S3.put_object(
-                Bucket=BUCKET_NAME, Key=path, Body=csv_buffer.getvalue()
-            )
-            print(
-                f"{path} saved with status code: {response['ResponseMetadata']['HTTPStatusCode']}"
-            )
+            jobs.append((path, df))
+        self.Caller.Sinks.submit_dfs(jobs)  # written in the background
+
+    def save_changes_n_tick_grid(self, store):
+        market, today = self.Caller.market, self.Caller.today
+        jobs = []
+        for exchange in store:
+            df = self.prepare_df_for_s3(store.changes(exchange))
+            df = df.drop(columns="interval", errors="ignore")  # the grid has it
+            jobs.append((create_changes_key(exchange, market, today), df))
+        grid = store.tick_grid().set_index("timestamp")
+        jobs.append((create_ticks_key(market, today), grid))
+        self.Caller.Sinks.submit_dfs(jobs)
 
     # =============================================================================
     # Preare the final df_obj to be save to S3
@@ -42,7 +52,8 @@ class SaveRawData:
     def prepare_df_for_s3(self, df) -> dict:
         df = df.set_index("timestamp")
         df.index = pd.to_datetime(df.index).tz_localize(None)
-        df = df[["bid_price", "ask_price", "bid_size", "ask_size", "mid"]]
+        cols = ["bid_price", "ask_price", "bid_size", "ask_size", "mid", "interval"]
+        df = df[[c for c in cols if c in df.columns]]
         return df
 
     # =============================================================================
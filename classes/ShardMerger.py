@@ -0,0 +1,194 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import time, threading, traceback
+from io import BytesIO
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.constants import SHARD_COUNT, SHARD_INDEX, SHARD_WAIT
+from utils.s3_paths import (
+    create_raw_key,
+    create_raw_shard_key,
+    create_sketch_shard_key,
+)
+from utils.discord_hook import ping_private_discord
+
+
+# =============================================================================
+# Phase shifted scale-out: SHARD_COUNT instances sample the same grid, each
+# SHARD_INDEX / SHARD_COUNT of the floor interval later than the previous
+# one, so together they sample every floor / SHARD_COUNT secs while each
+# stays within its own rate limits. The offset is based on the floor (the
+# same on every shard) rather than the current adaptive interval: ladder
+# rungs are multiples of the floor, so each shard stays on its own slot
+# whatever rung it's on.
+# At EOD every instance saves its day as a shard. Shard 0 collects the others
+# from the sinks, merges them per exchange (ordered, one row per grid slot)
+# and their spread sketches, and saves + diffs the merged day instead of its
+# own. Waiting & merging run on a background thread, shard 0 keeps sampling
+# the new day meanwhile.
+# =============================================================================
+class ShardMerger:
+    POLL_SECS = 2
+
+    def __init__(
+        self,
+        Caller,
+        count: int = SHARD_COUNT,
+        index: int = SHARD_INDEX,
+        wait: float = SHARD_WAIT,
+    ):
+        if not 0 <= index < count:
+            raise ValueError(f"SHARD_INDEX {index} out of range for {count} shards")
+        self.Caller = Caller
+        self.count = count
+        self.index = index
+        self.wait = wait
+        self.enabled = count > 1
+        self.last_merge = None
+        self.merging = None  # thread of the running merge
+        if self.enabled:
+            print(f"Running as shard {index} of {count}.")
+
+    # =============================================================================
+    # Secs after the interval boundary this instance samples at
+    # =============================================================================
+    def determine_phase_offset(self) -> float:
+        return self.index * self.determine_slot_secs()
+
+    def determine_slot_secs(self) -> float:
+        return min(self.Caller.Scheduler.ladder) / self.count
+
+    # =============================================================================
+    # Save this instance's day as a shard, shard 0 merges all and diffs in the
+    # background. The dfs & the day's sketches/stats are taken here, before
+    # reset_for_new_day replaces them.
+    # =============================================================================
+    def save_shard_n_merge(self, today: str):
+        save_raw = self.Caller.SaveRawData
+        dfs = {
+            ex: save_raw.prepare_df_for_s3(df) for ex, df in self.Caller.df_obj.items()
+        }
+        jobs = []
+        for exchange, df in dfs.items():
+            key = self.create_shard_key(exchange, today, self.index)
+            jobs.append((key, df))
+        self.Caller.Sinks.submit_dfs(jobs)
+        sketches = self.Caller.SpreadSketches
+        sketches.save_sidecar(today, self.create_sketch_shard_key(today, self.index))
+        if self.index != 0:
+            return
+        if self.merging is not None and self.merging.is_alive():
+            print(f"{self.Caller.market}: previous shard merge still running.")
+        day = (sketches.snapshot_day(), self.Caller.ExecutableSpreads.day_stats)
+        self.merging = threading.Thread(
+            target=self.merge_day,
+            args=(dfs, today, *day),
+            name=f"{self.Caller.market}-shard-merge",
+            daemon=True,
+        )
+        self.merging.start()
+
+    # =============================================================================
+    # Wait for the other shards, save + diff the merged day (merge thread)
+    # =============================================================================
+    def merge_day(self, dfs: dict, today: str, sketches, executable_stats):
+        try:
+            others = self.wait_for_shards(list(dfs), today)
+            merged = self.merge_shards(dfs, others)
+            jobs = [
+                (create_raw_key(ex, self.Caller.market, today), df)
+                for ex, df in merged.items()
+            ]
+            self.Caller.Sinks.submit_dfs(jobs)
+            for df in others["sketches"]:
+                sketches.merge_sidecar(df)
+            sketches.save_sidecar(today)
+            df_obj = {ex: df.reset_index() for ex, df in merged.items()}
+            self.Caller.EodDiff.determine_eod_diff_n_create_summary(
+                df_obj, today, sketches, executable_stats
+            )
+        except Exception as e:
+            traceback.print_exc()
+            print(f"ShardMerger failed execution with error message: {e}")
+
+    # =============================================================================
+    # Block until the running merge (if any) finished, False on timeout
+    # =============================================================================
+    def wait_for_merge(self, timeout: float = None) -> bool:
+        if self.merging is None:
+            return True
+        self.merging.join(timeout)
+        return not self.merging.is_alive()
+
+    # =============================================================================
+    # The other shards' dfs per exchange (+ "sketches") as they show up in the
+    # sinks, whatever arrived after SHARD_WAIT secs
+    # =============================================================================
+    def wait_for_shards(self, exchanges: list, today: str) -> dict:
+        missing = {}
+        for i in range(1, self.count):
+            for exchange in exchanges:
+                missing[self.create_shard_key(exchange, today, i)] = exchange
+            missing[self.create_sketch_shard_key(today, i)] = "sketches"
+        found = {name: [] for name in exchanges + ["sketches"]}
+        deadline = time.monotonic() + self.wait
+        while missing:
+            for key, name in list(missing.items()):
+                body = self.Caller.Sinks.read(key)
+                if body is not None:
+                    found[name].append(self.parse_shard(body, name))
+                    del missing[key]
+            if not missing or time.monotonic() > deadline:
+                break
+            time.sleep(self.POLL_SECS)
+        if missing:
+            msg = (
+                f"{self.Caller.market} {today}: merging without shards {list(missing)}"
+            )
+            print(msg)
+            ping_private_discord(msg)
+        return found
+
+    # =============================================================================
+    # Own dfs + the other shards', ordered, one row per grid slot
+    # =============================================================================
+    def merge_shards(self, dfs: dict, others: dict) -> dict:
+        merged, stats = {}, {"shards": {}, "rows": {}, "duplicates": {}}
+        for exchange, df in dfs.items():
+            frames = [df] + others[exchange]
+            df = pd.concat(frames).sort_index(kind="stable")
+            keep = self.determine_first_per_slot(df.index)
+            merged[exchange] = df[keep]
+            stats["shards"][exchange] = len(frames)
+            stats["rows"][exchange] = int(keep.sum())
+            stats["duplicates"][exchange] = int((~keep).sum())
+        self.last_merge = stats
+        print(f"Merged shards of {self.Caller.market}: {stats}")
+        return merged
+
+    # =============================================================================
+    # Every shard samples on its own slot of the floor_interval / count grid,
+    # rows landing on the same slot (restarts, misconfigured shards) are dups
+    # =============================================================================
+    def determine_first_per_slot(self, index: pd.DatetimeIndex) -> np.ndarray:
+        slot_secs = self.determine_slot_secs()
+        secs = index.values.astype("datetime64[ns]").astype(np.int64) / 1e9
+        slots = np.round(secs / slot_secs).astype(np.int64)
+        return ~pd.Series(slots).duplicated().values
+
+    def parse_shard(self, body: bytes, name: str) -> pd.DataFrame:
+        if name == "sketches":
+            return pd.read_csv(BytesIO(body))
+        return pd.read_csv(BytesIO(body), index_col="timestamp", parse_dates=True)
+
+    def create_shard_key(self, exchange: str, today: str, index: int) -> str:
+        market = self.Caller.market
+        return create_raw_shard_key(exchange, market, today, index, self.count)
+
+    def create_sketch_shard_key(self, today: str, index: int) -> str:
+        return create_sketch_shard_key(self.Caller.market, today, index, self.count)
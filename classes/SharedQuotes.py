@@ -0,0 +1,221 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import os, re, time, atexit
+import datetime as dt
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.constants import SHM_PUBLISH, SHM_PREFIX
+
+# =============================================================================
+# SEGMENT LAYOUT (native endian, every array 8 byte aligned)
+#   0    header    HEADER_DTYPE, padded to HEADER_BYTES
+#   64   names     n_exchanges x NAME_BYTES ascii, nul padded
+#   ..   quotes    n_exchanges x QUOTE_FIELDS float64
+#   ..   spreads   n_exchanges x n_exchanges float64, signed pct mid diff
+#                  (row - col) / avg mid * 100, nan if a quote is missing
+# `seq` is a seqlock: odd while the writer is inside a tick. A reader copies
+# what it needs between two reads of `seq` and retries unless both are the
+# same even number.
+# =============================================================================
+MAGIC = 0x51425241  # "ARBQ"
+LAYOUT_VERSION = 1
+HEADER_BYTES = 64
+NAME_BYTES = 16
+QUOTE_FIELDS = ["bid_price", "bid_size", "ask_price", "ask_size", "mid"]
+HEADER_DTYPE = np.dtype(
+    [
+        ("magic", "u4"),
+        ("version", "u2"),
+        ("n_exchanges", "u2"),
+        ("seq", "u8"),
+        ("tick_ts", "f8"),  # unix secs of the tick the quotes belong to
+        ("ticks", "u8"),  # ticks published since the segment was created
+        ("pid", "u4"),  # writer
+    ]
+)
+
+
+# =============================================================================
+# Publishes the latest quotes of one puller (market) into shared memory
+# named SHM_PREFIX + market, e.g. /dev/shm/arbq_BTC_USD
+# =============================================================================
+class SharedQuotePublisher:
+    def __init__(self, Caller, mode: str = SHM_PUBLISH, prefix: str = SHM_PREFIX):
+        self.Caller = Caller
+        self.enabled = mode == "on"
+        self.name = determine_segment_name(Caller.market, prefix)
+        self.shm = None
+        if not self.enabled:
+            return
+        n = len(Caller.exchanges)
+        self.shm = self.create_segment(determine_segment_size(n))
+        self.header, self.names, self.quotes, self.spreads = map_segment(
+            self.shm.buf, n
+        )
+        self.names[:] = [ex.encode()[:NAME_BYTES] for ex in Caller.exchanges]
+        self.quotes[:] = np.nan
+        self.spreads[:] = np.nan
+        header = self.header[0]
+        header["version"], header["n_exchanges"] = LAYOUT_VERSION, n
+        header["seq"], header["ticks"], header["pid"] = 0, 0, os.getpid()
+        header["tick_ts"] = np.nan
+        header["magic"] = MAGIC  # last, readers check it to see the layout is set
+        atexit.register(self.close)
+        print(f"Publishing {Caller.market} quotes to shared memory {self.name}")
+
+    # =============================================================================
+    # Write this tick's quotes & spreads inside the seqlock
+    # =============================================================================
+    def publish(self, bid_asks: dict):
+        if self.shm is None:
+            return
+        quotes = np.array(
+            [[bid_asks[ex][f] for f in QUOTE_FIELDS] for ex in self.Caller.exchanges],
+            dtype=float,
+        )
+        mids = quotes[:, -1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            spreads = (
+                (mids[:, None] - mids[None, :])
+                / ((mids[:, None] + mids[None, :]) / 2)
+                * 100
+            )
+        timestamp = next(iter(bid_asks.values()))["timestamp"]
+        header = self.header[0]
+        header["seq"] += 1  # odd: write in progress
+        self.quotes[:] = quotes
+        self.spreads[:] = spreads
+        header["tick_ts"] = timestamp.replace(tzinfo=dt.timezone.utc).timestamp()
+        header["ticks"] += 1
+        header["seq"] += 1  # even: consistent again
+
+    # =============================================================================
+    # A segment left behind by a crashed puller is replaced. One whose writer
+    # is still alive (same market running twice, old process not gone yet)
+    # is not: taking it over would freeze what its readers see.
+    # =============================================================================
+    def create_segment(self, size: int):
+        try:
+            return shared_memory.SharedMemory(self.name, create=True, size=size)
+        except FileExistsError:
+            pass
+        existing = shared_memory.SharedMemory(self.name)
+        try:
+            resource_tracker.unregister(existing._name, "shared_memory")
+        except Exception:
+            pass
+        header = np.ndarray((1,), HEADER_DTYPE, existing.buf)[0]
+        magic, pid = int(header["magic"]), int(header["pid"])
+        del header  # release the buffer before closing
+        existing.close()
+        if magic != MAGIC:
+            raise RuntimeError(
+                f"Shared memory segment {self.name} exists but isn't ours (or is being set up), remove /dev/shm/{self.name} if it's stale"
+            )
+        if check_if_pid_alive(pid):
+            raise RuntimeError(
+                f"Shared memory segment {self.name} is published by running pid {pid}, set another SHM_PREFIX or SHM_PUBLISH=off"
+            )
+        print(f"Replacing shared memory segment {self.name} of dead pid {pid}")
+        shared_memory.SharedMemory(self.name).unlink()
+        return shared_memory.SharedMemory(self.name, create=True, size=size)
+
+    def close(self):
+        if self.shm is None:
+            return
+        self.header = self.names = self.quotes = self.spreads = None
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+
+# =============================================================================
+# Signal 0 only checks the pid exists, no permission = someone else's process
+# =============================================================================
+def check_if_pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# =============================================================================
+# Reader for other processes on the host. Attaching maps the segment once,
+# after that a read is plain memory loads + a copy of a few hundred bytes.
+# =============================================================================
+class SharedQuoteReader:
+    def __init__(self, market: str, prefix: str = SHM_PREFIX):
+        self.name = determine_segment_name(market, prefix)
+        self.shm = shared_memory.SharedMemory(self.name)
+        try:  # don't let this process' tracker unlink the writer's segment
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        except Exception:
+            pass
+        header = np.ndarray((1,), HEADER_DTYPE, self.shm.buf)
+        if header[0]["magic"] != MAGIC or header[0]["version"] != LAYOUT_VERSION:
+            self.shm.close()
+            raise ValueError(f"{self.name} isn't a version {LAYOUT_VERSION} segment")
+        n = int(header[0]["n_exchanges"])
+        self.header, names, self.quotes, self.spreads = map_segment(self.shm.buf, n)
+        self.exchanges = [name.decode() for name in names]
+
+    # =============================================================================
+    # Consistent snapshot: {"seq", "tick_ts", "ticks", "exchanges", "quotes"
+    # (exchanges x QUOTE_FIELDS), "spreads" (exchanges x exchanges)}
+    # =============================================================================
+    def read(self, timeout: float = 0.1) -> dict:
+        deadline = time.monotonic() + timeout
+        while True:
+            seq = int(self.header[0]["seq"])
+            if seq % 2 == 0:
+                header = self.header[0].copy()
+                quotes, spreads = self.quotes.copy(), self.spreads.copy()
+                if int(self.header[0]["seq"]) == seq:
+                    return {
+                        "seq": seq,
+                        "tick_ts": float(header["tick_ts"]),
+                        "ticks": int(header["ticks"]),
+                        "exchanges": self.exchanges,
+                        "quotes": quotes,
+                        "spreads": spreads,
+                    }
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"No consistent snapshot of {self.name}")
+
+    def close(self):
+        self.header = self.quotes = self.spreads = None
+        self.shm.close()
+
+
+# =============================================================================
+# Layout helpers shared by writer & reader
+# =============================================================================
+def determine_segment_name(market: str, prefix: str) -> str:
+    return prefix + re.sub(r"[^A-Za-z0-9]", "_", market)
+
+
+def determine_segment_size(n_exchanges: int) -> int:
+    n = n_exchanges
+    return HEADER_BYTES + n * NAME_BYTES + (n * len(QUOTE_FIELDS) + n * n) * 8
+
+
+def map_segment(buf, n_exchanges: int) -> tuple:
+    n = n_exchanges
+    header = np.ndarray((1,), HEADER_DTYPE, buf)
+    offset = HEADER_BYTES
+    names = np.ndarray((n,), f"S{NAME_BYTES}", buf, offset)
+    offset += n * NAME_BYTES
+    quotes = np.ndarray((n, len(QUOTE_FIELDS)), "f8", buf, offset)
+    offset += quotes.nbytes
+    spreads = np.ndarray((n, n), "f8", buf, offset)
+    return header, names, quotes, spreads
@@ -0,0 +1,230 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import time, queue, atexit, threading
+from collections import deque
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.constants import (
+    S3,
+    BUCKET_NAME,
+    SINKS,
+    SINK_LOCAL_DIR,
+    SINK_QUEUE_PATH,
+    SINK_QUEUE_SIZE,
+    SINK_SUBMIT_TIMEOUT,
+    UPLOAD_WORKERS,
+    UPLOAD_COMPRESSION,
+    UPLOAD_RETRIES,
+)
+from utils.compression import determine_encoding
+from utils.sinks import Payload, create_sinks
+
+
+# =============================================================================
+# Fans every submitted df out to all sinks (S3, local files, local queue)
+# without blocking the caller: each sink has a bounded queue drained by its
+# own background worker threads. A full queue blocks the submitter for at
+# most SINK_SUBMIT_TIMEOUT secs, then the job is dropped for that sink.
+# Backpressure shows in the metrics (queue depth, blocked secs, drops).
+# =============================================================================
+class SinkPipeline:
+    def __init__(
+        self,
+        sinks: list,
+        queue_size: int = SINK_QUEUE_SIZE,
+        encoding: str = UPLOAD_COMPRESSION,
+        retries: int = UPLOAD_RETRIES,
+        submit_timeout: float = SINK_SUBMIT_TIMEOUT,
+    ):
+        self.sinks = sinks
+        self.encoding = determine_encoding(encoding)
+        self.retries = retries
+        self.submit_timeout = submit_timeout
+        self.queues = {s.name: queue.Queue(maxsize=queue_size) for s in sinks}
+        self.lock = threading.Lock()
+        self.metrics = {s.name: self.create_metrics() for s in sinks}
+        self.failed = []  # keys that never made it into a sink
+        self.reports = deque(maxlen=1000)  # one per object & sink, last ones
+        for sink in sinks:
+            for i in range(sink.workers):
+                thread = threading.Thread(
+                    target=self.run_worker,
+                    args=(sink,),
+                    name=f"sink-{sink.name}-{i}",
+                    daemon=True,
+                )
+                thread.start()
+        atexit.register(self.flush)
+
+    # =============================================================================
+    # jobs: [(key, df), ...], returns as soon as they're queued
+    # =============================================================================
+    def submit_dfs(self, jobs: list):
+        for key, df in jobs:
+            self.submit_df(key, df)
+
+    def submit_df(self, key: str, df):
+        payload = Payload(key, df, self.encoding)
+        for sink in self.sinks:
+            metrics = self.metrics[sink.name]
+            started = time.monotonic()
+            try:
+                self.queues[sink.name].put(payload, timeout=self.submit_timeout)
+                dropped = False
+            except queue.Full:
+                dropped = True
+            with self.lock:
+                metrics["blocked_secs"] += time.monotonic() - started
+                metrics["dropped" if dropped else "submitted"] += 1
+                depth = self.queues[sink.name].qsize()
+                metrics["max_depth"] = max(metrics["max_depth"], depth)
+            if dropped:
+                report = self.create_report(sink, payload, time.monotonic())
+                self.record_failure(sink, report, "queue full")
+
+    # =============================================================================
+    # Write jobs of one sink, retry with backoff
+    # =============================================================================
+    def run_worker(self, sink):
+        q = self.queues[sink.name]
+        while True:
+            payload = q.get()
+            try:
+                self.write_with_retries(sink, payload)
+            finally:
+                q.task_done()
+
+    def write_with_retries(self, sink, payload: Payload):
+        metrics = self.metrics[sink.name]
+        report = self.create_report(sink, payload, time.monotonic())
+        for attempt in range(1, self.retries + 2):
+            report["attempts"] = attempt
+            try:
+                sink.write(payload)
+                break
+            except Exception as e:
+                error = str(e)
+                if attempt > self.retries:
+                    return self.record_failure(sink, report, error)
+                with self.lock:
+                    metrics["retries"] += 1
+                time.sleep(min(2**attempt * 0.1, 5))
+        self.finish_report(report, payload, None)
+        with self.lock:
+            metrics["written"] += 1
+            metrics["bytes"] += report["bytes"]
+            metrics["write_secs"] += report["seconds"]
+        ratio = round(report["bytes"] / max(report["raw_bytes"], 1) * 100, 1)
+        print(
+            f"{payload.key} saved to {sink.name} ({payload.encoding}, {ratio}% of {report['raw_bytes']} bytes, {attempt} attempt(s), {report['seconds']}s)"
+        )
+
+    def record_failure(self, sink, report: dict, error: str):
+        self.finish_report(report, None, error)
+        with self.lock:
+            self.metrics[sink.name]["failed"] += 1
+            self.metrics[sink.name]["last_error"] = error
+            self.failed.append((sink.name, report["key"]))
+        print(f"FAILED saving {report['key']} to {sink.name}: {error}")
+
+    # =============================================================================
+    # Per object & sink: key, ok, attempts, bytes, md5, secs, error
+    # =============================================================================
+    def create_report(self, sink, payload: Payload, started: float) -> dict:
+        return {
+            "sink": sink.name,
+            "key": payload.key,
+            "ok": False,
+            "attempts": 0,
+            "encoding": payload.encoding,
+            "started": started,
+        }
+
+    def finish_report(self, report: dict, payload, error):
+        report["ok"] = error is None
+        report["error"] = error
+        if payload is not None:
+            report["raw_bytes"] = payload.raw_bytes
+            report["bytes"] = len(payload.body)
+            report["md5"] = payload.md5.hexdigest()
+        report["seconds"] = round(time.monotonic() - report.pop("started"), 3)
+        with self.lock:
+            self.reports.append(report)
+
+    # =============================================================================
+    # Reports of the last objects, optionally only those of one key
+    # =============================================================================
+    def determine_reports(self, key: str = None) -> list:
+        with self.lock:
+            reports = list(self.reports)
+        return [r for r in reports if key is None or r["key"] == key]
+
+    # =============================================================================
+    # Wait until every queued job is written (or failed), False on timeout
+    # =============================================================================
+    def flush(self, timeout: float = 120) -> bool:
+        deadline = time.monotonic() + timeout
+        for q in self.queues.values():
+            while q.unfinished_tasks:
+                if time.monotonic() > deadline:
+                    return False
+                time.sleep(0.05)
+        return True
+
+    # =============================================================================
+    # Body of key from the first sink that has it, e.g. written by another
+    # instance. None if no sink has it (yet).
+    # =============================================================================
+    def read(self, key: str):
+        for sink in self.sinks:
+            body = sink.read(key)
+            if body is not None:
+                return body
+        return None
+
+    # =============================================================================
+    # Metrics of all sinks incl. current queue depth
+    # =============================================================================
+    def determine_metrics(self) -> dict:
+        with self.lock:
+            metrics = {name: dict(m) for name, m in self.metrics.items()}
+        for name, m in metrics.items():
+            m["depth"] = self.queues[name].qsize()
+            m["blocked_secs"] = round(m["blocked_secs"], 3)
+            m["write_secs"] = round(m["write_secs"], 3)
+        return metrics
+
+    def create_metrics(self) -> dict:
+        return {
+            "submitted": 0,
+            "written": 0,
+            "failed": 0,
+            "dropped": 0,
+            "retries": 0,
+            "bytes": 0,
+            "max_depth": 0,
+            "blocked_secs": 0.0,
+            "write_secs": 0.0,
+            "last_error": None,
+        }
+
+
+_sink_pipeline = None
+_sink_pipeline_lock = threading.Lock()
+
+
+# =============================================================================
+# Process wide instance built from SINKS, shared by all pullers
+# =============================================================================
+def get_sink_pipeline(s3=S3) -> SinkPipeline:
+    global _sink_pipeline
+    with _sink_pipeline_lock:
+        if not _sink_pipeline:
+            sinks = create_sinks(
+                SINKS, s3, BUCKET_NAME, SINK_LOCAL_DIR, SINK_QUEUE_PATH, UPLOAD_WORKERS
+            )
+            _sink_pipeline = SinkPipeline(sinks)
+    return _sink_pipeline
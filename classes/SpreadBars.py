@@ -0,0 +1,103 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import time, traceback
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.constants import BAR_RESOLUTIONS
+from utils.s3_paths import create_bars_key
+
+BAR_COLS = ["open", "high", "low", "close", "count"]
+AGGS = {"open": "first", "high": "max", "low": "min", "close": "last", "count": "count"}
+ROLLUPS = {**AGGS, "count": "sum"}  # coarser bars from finer bars
+
+
+# =============================================================================
+# Pre-aggregated bars so charts & multi-week queries don't resample full
+# days: at EOD the exchange mids and pair spreads (abs mid diff, same as the
+# Difference csvs) go side by side into one frame, get grouped once into the
+# finest bars, and the coarser resolutions are rolled up from those bars.
+# One long format object per resolution: timestamp, kind, name, OHLC, count.
+# =============================================================================
+class SpreadBars:
+    def __init__(self, Caller, resolutions: list = BAR_RESOLUTIONS):
+        self.Caller = Caller
+        self.resolutions = resolutions
+        self.last_secs = None
+
+    # =============================================================================
+    # Create & save the day's bars, failures don't stop the rest of the EOD
+    # =============================================================================
+    def determine_n_save(self, df_obj, merged_obj: dict, today: str):
+        try:
+            started = time.perf_counter()
+            wide, kinds = self.create_wide_df(df_obj, merged_obj)
+            bars = create_bars(wide, kinds, self.resolutions)
+            self.last_secs = time.perf_counter() - started
+            print(f"Bars of {self.Caller.market} in {self.last_secs:.2f}s")
+            date = today.split(" ")[0]
+            jobs = []
+            for resolution, df in bars.items():
+                key = create_bars_key(self.Caller.market, date, resolution)
+                jobs.append((key, df))
+            self.Caller.Sinks.submit_dfs(jobs)
+            return bars
+        except Exception as e:
+            traceback.print_exc()
+            print(f"SpreadBars failed execution with error message: {e}")
+            return None
+
+    # =============================================================================
+    # timestamp x [exchange mids.., pair spreads..], kinds: "mid"/"spread" per col
+    # =============================================================================
+    def create_wide_df(self, df_obj, merged_obj: dict) -> tuple:
+        cols, kinds = {}, []
+        for ex in self.Caller.exchanges:
+            df = df_obj[ex]
+            index = pd.DatetimeIndex(pd.to_datetime(df["timestamp"]))
+            cols[ex] = pd.Series(df["mid"].values, index=index)
+            kinds.append("mid")
+        for pair, df in merged_obj.items():
+            cols[pair] = df[f"{pair}_mid"]
+            kinds.append("spread")
+        cols = {name: s[~s.index.duplicated()] for name, s in cols.items()}
+        return pd.concat(cols, axis=1).sort_index(), kinds
+
+
+# =============================================================================
+# {resolution: long df} from a wide df: one groupby over the rows for the
+# finest resolution, the others rolled up from its bars
+# =============================================================================
+def create_bars(wide: pd.DataFrame, kinds: list, resolutions: list) -> dict:
+    grouped = wide.groupby(wide.index.floor(resolutions[0]))
+    stats = {col: grouped.agg(AGGS[col]) for col in BAR_COLS}
+    bars = {resolutions[0]: flatten_bars(stats, kinds)}
+    for resolution in resolutions[1:]:
+        rolled = {}
+        for col, df in stats.items():
+            grouped = df.groupby(df.index.floor(resolution))
+            rolled[col] = grouped.agg(ROLLUPS[col])
+        bars[resolution] = flatten_bars(rolled, kinds)
+    return bars
+
+
+# =============================================================================
+# bars x series frames per stat -> one row per bar & series that has data
+# =============================================================================
+def flatten_bars(stats: dict, kinds: list) -> pd.DataFrame:
+    index, names = stats["open"].index, stats["open"].columns
+    df = pd.DataFrame(
+        {
+            "timestamp": np.repeat(index.values, len(names)),
+            "kind": np.tile(kinds, len(index)),
+            "name": np.tile(names.values, len(index)),
+        }
+    )
+    for col in BAR_COLS:
+        df[col] = stats[col].values.ravel()
+    df["count"] = df["count"].astype(np.int64)
+    return df[df["count"] > 0].set_index("timestamp")
@@ -0,0 +1,116 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import copy, json
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.constants import SKETCH_ALPHA, SKETCH_QUANTILES
+from utils.s3_paths import create_sketch_key
+from classes.QuantileSketch import DDSketch
+
+METRICS = ["abs", "pct"]
+
+
+# =============================================================================
+# Day distribution of every pair's mid diff, same values as the EOD diffs:
+#   abs: |mid0 - mid1|, pct: abs / avg mid * 100
+# One DDSketch per pair & metric, updated every tick (weighted by the tick's
+# interval like the EOD means), saved at EOD as a sidecar csv with one row
+# per pair & metric: quantiles for reading + the sketch as json for merging
+# days into weeks & months (HistoricalLoader.load_spread_sketches).
+# =============================================================================
+class SpreadSketches:
+    def __init__(self, Caller, alpha: float = SKETCH_ALPHA):
+        self.Caller = Caller
+        self.alpha = alpha
+        exchanges, pairs = Caller.exchanges, Caller.diff_pairs
+        self.idx0 = np.array([exchanges.index(p.split("-")[0]) for p in pairs])
+        self.idx1 = np.array([exchanges.index(p.split("-")[1]) for p in pairs])
+        self.reset_day()
+
+    # =============================================================================
+    # Add this tick's diffs weighted by its interval, failed quotes are skipped
+    # =============================================================================
+    def update(self, bid_asks: dict, weight: float):
+        mids = np.array(
+            [bid_asks[ex]["mid"] for ex in self.Caller.exchanges], dtype=float
+        )
+        m0, m1 = mids[self.idx0], mids[self.idx1]
+        with np.errstate(invalid="ignore"):
+            abs_diff = np.abs(m0 - m1)
+            pct_diff = abs_diff / ((m0 + m1) / 2) * 100
+        for i, pair in enumerate(self.Caller.diff_pairs):
+            self.sketches[(pair, "abs")].add(abs_diff[i], weight)
+            self.sketches[(pair, "pct")].add(pct_diff[i], weight)
+
+    def reset_day(self):
+        self.sketches = {
+            (pair, metric): DDSketch(self.alpha)
+            for pair in self.Caller.diff_pairs
+            for metric in METRICS
+        }
+
+    # =============================================================================
+    # The day's sketches as they are now, unaffected by reset_day (for EODs
+    # that finish in the background while the next day is already sampled)
+    # =============================================================================
+    def snapshot_day(self) -> "SpreadSketches":
+        return copy.copy(self)
+
+    # =============================================================================
+    # {q: value} of SKETCH_QUANTILES for a pair & metric
+    # =============================================================================
+    def determine_quantiles(self, pair: str, metric: str) -> dict:
+        sketch = self.sketches[(pair, metric)]
+        return dict(zip(SKETCH_QUANTILES, sketch.quantiles(SKETCH_QUANTILES)))
+
+    # =============================================================================
+    # Sidecar: pair, metric, count, p50.., sketch (json)
+    # =============================================================================
+    def create_sidecar_df(self) -> pd.DataFrame:
+        return create_sidecar_df(self.sketches)
+
+    def save_sidecar(self, today: str, key: str = None):
+        key = key or create_sketch_key(self.Caller.market, today)
+        self.Caller.Sinks.submit_df(key, self.create_sidecar_df())
+
+    # =============================================================================
+    # Fold the sketches of another sidecar (e.g. another shard) into these
+    # =============================================================================
+    def merge_sidecar(self, df: pd.DataFrame):
+        for key, sketch in parse_sidecar_df(df).items():
+            if key in self.sketches:
+                self.sketches[key].merge(sketch)
+
+
+# =============================================================================
+# {(pair, metric): DDSketch} <-> sidecar df
+# =============================================================================
+def create_sidecar_df(sketches: dict) -> pd.DataFrame:
+    rows = []
+    for (pair, metric), sketch in sketches.items():
+        row = {"pair": pair, "metric": metric, "count": sketch.count}
+        for q, val in zip(SKETCH_QUANTILES, sketch.quantiles(SKETCH_QUANTILES)):
+            row[format_quantile(q)] = val
+        row["sketch"] = json.dumps(sketch.to_dict())
+        rows.append(row)
+    return pd.DataFrame(rows).set_index("pair")
+
+
+def parse_sidecar_df(df: pd.DataFrame) -> dict:
+    df = df.reset_index()
+    return {
+        (row["pair"], row["metric"]): DDSketch.from_dict(json.loads(row["sketch"]))
+        for _, row in df.iterrows()
+    }
+
+
+# =============================================================================
+# 0.5 -> "p50", 0.999 -> "p99.9"
+# =============================================================================
+def format_quantile(q: float) -> str:
+    return f"p{q * 100:g}"
@@ -0,0 +1,194 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import time, queue, threading, traceback
+from collections import deque
+import numpy as np
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.constants import PIPELINE_MODE, PIPELINE_QUEUE_SIZE
+
+
+# =============================================================================
+# Everything after the fetch runs on stage workers behind bounded queues, so
+# the tick thread only fetches and schedules and its cadence doesn't depend
+# on how heavy the analyses get. Stages are chained, each tick goes through
+# them in order:
+#   store:   quote store + shared memory. Lossless: a full queue blocks the
+#            tick thread (backpressure, shows as blocked secs).
+#   analyze: frozen check, executable spreads, sketches, alerts. A full queue
+#            drops the oldest waiting tick, the analyses catch up to the latest.
+# Lag = secs from the end of a tick's fetch until a stage finished it.
+# PIPELINE_MODE=inline runs the stages on the tick thread, one after another.
+# =============================================================================
+class TickPipeline:
+    def __init__(
+        self, Caller, mode: str = PIPELINE_MODE, queue_size: int = PIPELINE_QUEUE_SIZE
+    ):
+        self.Caller = Caller
+        self.staged = mode == "staged"
+        analyze = Stage(f"{Caller.market}-analyze", self.analyze, "drop_oldest")
+        store = Stage(f"{Caller.market}-store", self.store, "block", analyze)
+        self.stages = {"store": store, "analyze": analyze}
+        if self.staged:
+            for stage in self.stages.values():
+                stage.start(queue_size)
+
+    # =============================================================================
+    # Hand a fetched tick to the first stage
+    # =============================================================================
+    def submit(self, bid_asks: dict, interval):
+        tick = {"bid_asks": bid_asks, "interval": interval}
+        tick["fetched"] = time.monotonic()
+        self.stages["store"].submit(tick)
+
+    # =============================================================================
+    # Stage bodies
+    # =============================================================================
+    def store(self, tick: dict):
+        Caller = self.Caller
+        with Caller.Profiler.stage("store"):
+            Caller.update_df_obj_with_new_bid_ask_data(
+                tick["bid_asks"], tick["interval"]
+            )
+        with Caller.Profiler.stage("publish"):
+            Caller.SharedQuotes.publish(tick["bid_asks"])
+
+    def analyze(self, tick: dict):
+        Caller, bid_asks = self.Caller, tick["bid_asks"]
+        with Caller.Profiler.stage("frozen"):
+            Caller.FrozenOrderbook.check_all_orderbooks_if_frozen()
+        with Caller.Profiler.stage("executable"):
+            Caller.ExecutableSpreads.update(bid_asks)
+        with Caller.Profiler.stage("sketches"):
+            Caller.SpreadSketches.update(bid_asks, tick["interval"])
+        with Caller.Profiler.stage("alerts"):
+            Caller.Discord.determine_exchange_diff_and_alert_discord(bid_asks)
+
+    # =============================================================================
+    # Wait until every submitted tick went through all stages (EOD needs the
+    # whole day stored & analyzed), False on timeout
+    # =============================================================================
+    def drain(self, timeout: float = 60) -> bool:
+        deadline = time.monotonic() + timeout
+        while any(s.check_if_busy() for s in self.stages.values()):
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def determine_metrics(self) -> dict:
+        metrics = {n: s.determine_metrics() for n, s in self.stages.items()}
+        return {"staged": self.staged, "stages": metrics}
+
+
+# =============================================================================
+# One worker thread + bounded queue, passes finished ticks on to `next_stage`.
+# Not started (inline): submit runs the stage right away.
+# =============================================================================
+class Stage:
+    def __init__(self, name: str, run, policy: str, next_stage=None):
+        self.name = name
+        self.run = run
+        self.policy = policy  # "block" or "drop_oldest" when the queue is full
+        self.next_stage = next_stage
+        self.queue = None
+        self.lock = threading.Lock()
+        self.lags = deque(maxlen=1000)  # secs, last ticks
+        self.metrics = {
+            "submitted": 0,
+            "processed": 0,
+            "dropped": 0,
+            "errors": 0,
+            "max_depth": 0,
+            "blocked_secs": 0.0,
+            "busy_secs": 0.0,
+        }
+
+    def start(self, queue_size: int):
+        self.queue = queue.Queue(maxsize=queue_size)
+        thread = threading.Thread(target=self.run_worker, name=self.name, daemon=True)
+        thread.start()
+
+    # =============================================================================
+    # Queue the tick: block while full, or make room by dropping the oldest
+    # =============================================================================
+    def submit(self, tick: dict):
+        with self.lock:
+            self.metrics["submitted"] += 1
+        if self.queue is None:
+            return self.process(tick)
+        if self.policy == "block":
+            started = time.monotonic()
+            self.queue.put(tick)
+            with self.lock:
+                self.metrics["blocked_secs"] += time.monotonic() - started
+        else:
+            self.put_dropping_oldest(tick)
+        with self.lock:
+            depth = self.queue.qsize()
+            self.metrics["max_depth"] = max(self.metrics["max_depth"], depth)
+
+    def put_dropping_oldest(self, tick: dict):
+        while True:
+            try:
+                return self.queue.put_nowait(tick)
+            except queue.Full:
+                pass
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                with self.lock:
+                    self.metrics["dropped"] += 1
+            except queue.Empty:
+                pass  # the worker just took one
+
+    def run_worker(self):
+        while True:
+            tick = self.queue.get()
+            try:
+                self.process(tick)
+            finally:
+                self.queue.task_done()
+
+    # =============================================================================
+    # Run the stage (errors don't stop the pipeline), then pass the tick on
+    # =============================================================================
+    def process(self, tick: dict):
+        started = time.monotonic()
+        try:
+            self.run(tick)
+        except Exception as e:
+            traceback.print_exc()
+            print(f"Stage {self.name} failed with error message: {e}")
+            with self.lock:
+                self.metrics["errors"] += 1
+        finished = time.monotonic()
+        with self.lock:
+            self.metrics["processed"] += 1
+            self.metrics["busy_secs"] += finished - started
+            self.lags.append(finished - tick["fetched"])
+        if self.next_stage is not None:
+            self.next_stage.submit(tick)
+
+    def check_if_busy(self) -> bool:
+        return self.queue is not None and self.queue.unfinished_tasks > 0
+
+    # =============================================================================
+    # Counters, current depth & lag percentiles in ms
+    # =============================================================================
+    def determine_metrics(self) -> dict:
+        with self.lock:
+            metrics = dict(self.metrics)
+            lags = np.array(self.lags) * 1000
+        metrics["depth"] = self.queue.qsize() if self.queue is not None else 0
+        metrics["blocked_secs"] = round(metrics["blocked_secs"], 3)
+        metrics["busy_secs"] = round(metrics["busy_secs"], 3)
+        for q in [50, 99]:
+            metrics[f"lag_p{q}_ms"] = (
+                round(float(np.percentile(lags, q)), 3) if len(lags) else None
+            )
+        metrics["lag_max_ms"] = round(float(lags.max()), 3) if len(lags) else None
+        return metrics
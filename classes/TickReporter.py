@@ -0,0 +1,145 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import signal, time, threading
+import numpy as np
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.jprint import jprint
+from utils.time_helpers import (
+    determine_cur_utc_timestamp_as_str,
+    determine_time_scale,
+)
+from utils.constants import REPORT_LEVEL, REPORT_EVERY_N_TICKS, REPORT_MAX_LINES_PER_MIN
+
+LEVELS = {"quiet": 0, "info": 1, "debug": 2}
+_reporters = []
+
+
+# =============================================================================
+# `kill -USR1 <pid>` -> every puller dumps its full data on the next tick
+# =============================================================================
+def request_full_dump(signum=None, frame=None):
+    for reporter in _reporters:
+        reporter.dump_requested = True
+
+
+# =============================================================================
+# One compact line per tick instead of printing every df each tick.
+#   quiet: only ticks with overruns or failed quotes
+#   info:  + every REPORT_EVERY_N_TICKS-th tick
+#   debug: + every tick
+# Lines are capped at REPORT_MAX_LINES_PER_MIN.
+# =============================================================================
+class TickReporter:
+    def __init__(self, Caller, level: str = REPORT_LEVEL):
+        self.Caller = Caller
+        self.level = LEVELS[level]
+        self.every_n = max(REPORT_EVERY_N_TICKS, 1)
+        self.max_lines = REPORT_MAX_LINES_PER_MIN
+        self.tick = 0
+        self.overruns = 0
+        self.tick_started = None
+        self.line_times = []
+        self.suppressed = 0
+        self.dump_requested = False
+        _reporters.append(self)
+        self.register_signal_handler()
+
+    # =============================================================================
+    # Mark the start of a tick
+    # =============================================================================
+    def start_tick(self):
+        self.tick_started = time.perf_counter()
+
+    # =============================================================================
+    # Report finished tick, dump everything if someone asked for it
+    # =============================================================================
+    def end_tick(self, bid_asks: dict, latencies: dict):
+        # a fetch barrier's lead (waiting for the grid point) isn't tick time
+        started = max(self.tick_started, self.Caller.FetchBarrier.released)
+        duration = time.perf_counter() - started
+        interval = self.Caller.Scheduler.interval / determine_time_scale()
+        overrun = duration > interval
+        self.overruns += overrun
+        self.tick += 1
+
+        failed = [ex for ex, b in bid_asks.items() if np.isnan(b["mid"])]
+        important = overrun or len(failed) > 0
+        sampled = self.tick % self.every_n == 0
+        if self.check_if_should_report(important, sampled):
+            line = self.format_tick_line(bid_asks, latencies, duration, overrun)
+            self.emit(line)
+        if self.dump_requested:
+            self.dump_requested = False
+            self.dump_full_state()
+
+    # =============================================================================
+    # Decide by level, then by rate limit
+    # =============================================================================
+    def check_if_should_report(self, important: bool, sampled: bool) -> bool:
+        if self.level >= LEVELS["debug"]:
+            return True
+        if important:
+            return True
+        return self.level >= LEVELS["info"] and sampled
+
+    # =============================================================================
+    # Print line unless we're over the lines per minute cap
+    # =============================================================================
+    def emit(self, line: str):
+        now = time.monotonic()
+        self.line_times = [t for t in self.line_times if now - t < 60]
+        if len(self.line_times) >= self.max_lines:
+            self.suppressed += 1
+            return
+        if self.suppressed:
+            line += f" (+{self.suppressed} suppressed)"
+            self.suppressed = 0
+        self.line_times.append(now)
+        print(line)
+
+    # =============================================================================
+    # ts market tick dur | EX bid/ask lat | PAIR spread%
+    # =============================================================================
+    def format_tick_line(self, bid_asks, latencies, duration, overrun) -> str:
+        parts = [
+            f"{determine_cur_utc_timestamp_as_str()} {self.Caller.market}",
+            f"tick={self.tick} dur={duration:.3f}s/{self.Caller.Scheduler.interval}s",
+        ]
+        skew = self.Caller.FetchBarrier.determine_last_skew()
+        if skew is not None:
+            parts.append(f"skew={skew * 1000:.1f}ms")
+        if overrun:
+            parts.append(f"OVERRUN({self.overruns})")
+        for ex, b in bid_asks.items():
+            lat = latencies.get(ex)
+            lat = f"{lat * 1000:.0f}ms" if lat is not None else "-"
+            parts.append(f"| {ex} {b['bid_price']}/{b['ask_price']} {lat}")
+        for pair in self.Caller.diff_pairs:
+            ex0, ex1 = pair.split("-")
+            mid0, mid1 = bid_asks[ex0]["mid"], bid_asks[ex1]["mid"]
+            pct = abs(mid0 - mid1) / ((mid0 + mid1) / 2) * 100
+            parts.append(f"| {pair} {pct:.3f}%")
+        return " ".join(parts)
+
+    # =============================================================================
+    # What used to be printed every tick
+    # =============================================================================
+    def dump_full_state(self):
+        print("=========================================\n")
+        jprint(self.Caller.df_obj)
+        thresholds = getattr(self.Caller.Discord, "thresholds", None)
+        if thresholds is not None:
+            jprint("Threshs: ", thresholds)
+
+    # =============================================================================
+    # Signals can only be registered from the main thread
+    # =============================================================================
+    def register_signal_handler(self):
+        if not hasattr(signal, "SIGUSR1"):
+            return  # windows
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, request_full_dump)
@@ -0,0 +1,356 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import re, json, time, random, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+OKX_FUTURES_REGEX = re.compile(r".*-\d{6}$")  # e.g. BTC-USD-230331
+VENUE_PREFIXES = {
+    "dydx": "DYDX",
+    "okx": "OKX",
+    "binance_us": "BINANCE_US",
+    "binance_global": "BINANCE_GLOBAL",
+    "coinbase": "COINBASE",
+}
+
+
+# =============================================================================
+# Same instrument type split as BatchFetcher.determine_group
+# =============================================================================
+def check_okx_group(symbol: str, group: str) -> bool:
+    if symbol.endswith("-SWAP"):
+        return group == "SWAP"
+    if OKX_FUTURES_REGEX.match(symbol):
+        return group == "FUTURES"
+    return group == "SPOT"
+
+
+# =============================================================================
+# Local stand-in for the venues' REST APIs, in the formats GetBidAsks and
+# BatchFetcher parse. Every venue lives under its own path prefix:
+#   /dydx/v3/orderbook/{m}
+#   /okx/api/v5/market/books?instId={m}, /okx/api/v5/market/tickers?instType=
+#   /binance_us/api/v3/depth?symbol={m}, /binance_us/api/v3/ticker/bookTicker
+#   /binance_global/api/v3/depth?symbol={m}, .../ticker/bookTicker
+#   /coinbase/products/{m}/book
+#   instruments: /dydx/v3/markets, /okx/api/v5/public/instruments,
+#   /binance_*/api/v3/exchangeInfo, /coinbase/products (tick size 0.01)
+#   POST /discord (swallows alerts)
+# Prices random walk per base asset (first 3 letters of the symbol), each
+# venue quotes around it with its own offset.
+#   latency:     secs added to every response (+- jitter)
+#   slow_rate:   share of responses that take slow_latency secs instead
+#   error_rate:  share of requests answered with a 500
+#   loose_rate:  share of books with a spread wider than GetBidAsks accepts
+#   frozen:      venues whose books never change
+# =============================================================================
+class MockExchangeServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 0.0,
+        error_rate: float = 0.0,
+        loose_rate: float = 0.0,
+        frozen: list = None,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.loose_rate = loose_rate
+        self.frozen = set(frozen or [])
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.prices = {}  # base asset -> (updated, price)
+        self.frozen_books = {}  # (venue, symbol) -> book
+        self.symbols = {v: set() for v in VENUE_PREFIXES.values()}
+        self.stats = {"requests": 0, "errors": 0, "loose": 0, "discord": 0}
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the venues
+
+            def do_GET(self):
+                server.handle_request(self)
+
+            def do_POST(self):
+                server.handle_discord(self)
+
+            def log_message(self, *args):
+                pass  # one line per request drowns the soak output
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+        self.thread = None
+
+    # =============================================================================
+    # Serve in a background thread
+    # =============================================================================
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"Mock exchanges listening on {self.determine_base_url()}")
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def determine_base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    # =============================================================================
+    # Env vars that point utils/constants.py at this server
+    # =============================================================================
+    def create_env(self) -> dict:
+        base = self.determine_base_url()
+        return {
+            "DYDX_BASEURL": f"{base}/dydx/v3",
+            "OKX_BASEURL": f"{base}/okx/",
+            "BINANCE_US_BASEURL": f"{base}/binance_us/api/v3/depth?",
+            "BINANCE_US_API_URL": f"{base}/binance_us/api/v3",
+            "BINANCE_GLOBAL_BASEURL": f"{base}/binance_global/api/v3",
+            "COINBASE_BASEURL": f"{base}/coinbase/products/",
+            "DISCORD_URL": f"{base}/discord",
+            "DISCORD_PERSONAL": f"{base}/discord",
+            "HEDGE_HOSTS_BINANCE_GLOBAL": f"http://localhost:{self.port}",
+            "HEDGE_HOSTS_OKX": f"http://localhost:{self.port}",
+        }
+
+    # =============================================================================
+    # Bulk endpoints only know symbols that were registered or asked for before
+    # =============================================================================
+    def register_symbols(self, exchanges_obj: dict):
+        with self.lock:
+            for venue, symbol in exchanges_obj.items():
+                self.symbols[venue].add(symbol)
+
+    def list_symbols(self, venue: str) -> list:
+        with self.lock:
+            return sorted(self.symbols[venue])
+
+    # =============================================================================
+    # Route request, then simulate latency and errors
+    # =============================================================================
+    def handle_request(self, handler):
+        url = urlparse(handler.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/")
+        venue = VENUE_PREFIXES.get(parts[0])
+        with self.lock:
+            self.stats["requests"] += 1
+            failed = self.random.random() < self.error_rate
+            delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+            if self.random.random() < self.slow_rate:
+                delay = self.slow_latency
+        time.sleep(max(delay, 0.0))
+        if venue is None:
+            return self.send_json(handler, 404, {"msg": f"Unknown path {url.path}"})
+        if failed:
+            with self.lock:
+                self.stats["errors"] += 1
+            return self.send_json(handler, 500, {"msg": "Mock internal error"})
+        try:
+            body = self.create_response(venue, "/".join(parts[1:]), query)
+        except KeyError as e:
+            return self.send_json(handler, 400, {"msg": f"Missing parameter {e}"})
+        if body is None:
+            return self.send_json(handler, 404, {"msg": f"Unknown path {url.path}"})
+        self.send_json(handler, 200, body)
+
+    # =============================================================================
+    # Venue specific response bodies
+    # =============================================================================
+    def create_response(self, venue: str, path: str, query: dict):
+        binance = venue in ["BINANCE_US", "BINANCE_GLOBAL"]
+        if venue == "DYDX" and path.startswith("v3/orderbook/"):
+            book = self.create_book(venue, path.split("/")[-1])
+            return {
+                side: [{"price": p, "size": s} for p, s in book[side]]
+                for side in ["asks", "bids"]
+            }
+        if venue == "OKX" and path == "api/v5/market/books":
+            book = self.create_book(venue, query["instId"])
+            return {
+                "code": "0",
+                "data": [
+                    {
+                        "asks": [[p, s, "0", "1"] for p, s in book["asks"]],
+                        "bids": [[p, s, "0", "1"] for p, s in book["bids"]],
+                        "ts": str(int(time.time() * 1000)),
+                    }
+                ],
+            }
+        if venue == "OKX" and path == "api/v5/market/tickers":
+            group = query["instType"]
+            symbols = [s for s in self.list_symbols(venue) if check_okx_group(s, group)]
+            return {"code": "0", "data": [self.create_okx_ticker(s) for s in symbols]}
+        if binance and path == "api/v3/depth":
+            book = self.create_book(venue, query["symbol"])
+            return {"lastUpdateId": int(time.time() * 1000), **book}
+        if binance and path == "api/v3/ticker/bookTicker":
+            return [self.create_binance_ticker(venue, s) for s in self.list_symbols(venue)]
+        if path in ["v3/markets", "api/v5/public/instruments", "api/v3/exchangeInfo"]:
+            return self.create_instruments(venue, query)
+        if venue == "COINBASE" and path == "products":
+            return self.create_instruments(venue, query)
+        if venue == "COINBASE" and re.match(r"products/[^/]+/book$", path):
+            book = self.create_book(venue, path.split("/")[1])
+            return {
+                side: [[p, s, 1] for p, s in book[side][:1]] for side in ["asks", "bids"]
+            }
+        return None
+
+    # =============================================================================
+    # Instrument lists of all symbols seen so far, in the venue's format
+    # =============================================================================
+    def create_instruments(self, venue: str, query: dict):
+        symbols = self.list_symbols(venue)
+        assets = {s: (s[:3], s[3:].strip("-").split("-")[0]) for s in symbols}
+        tick, lot = "0.01", "0.001"
+        if venue == "DYDX":
+            markets = {
+                s: {"tickSize": tick, "stepSize": lot, "baseAsset": b, "quoteAsset": q}
+                for s, (b, q) in assets.items()
+            }
+            return {"markets": markets}
+        if venue == "OKX":
+            group = query.get("instType", "SPOT")
+            data = [
+                {"instId": s, "tickSz": tick, "lotSz": lot, "baseCcy": b, "quoteCcy": q}
+                for s, (b, q) in assets.items()
+                if check_okx_group(s, group)
+            ]
+            return {"code": "0", "data": data}
+        if venue == "COINBASE":
+            return [
+                {
+                    "id": s,
+                    "quote_increment": tick,
+                    "base_increment": lot,
+                    "base_currency": b,
+                    "quote_currency": q,
+                }
+                for s, (b, q) in assets.items()
+            ]
+        filters = [
+            {"filterType": "PRICE_FILTER", "tickSize": tick},
+            {"filterType": "LOT_SIZE", "stepSize": lot},
+        ]
+        return {
+            "symbols": [
+                {"symbol": s, "baseAsset": b, "quoteAsset": q, "filters": filters}
+                for s, (b, q) in assets.items()
+            ]
+        }
+
+    def create_okx_ticker(self, symbol: str) -> dict:
+        book = self.create_book("OKX", symbol)
+        (ask_px, ask_sz), (bid_px, bid_sz) = book["asks"][0], book["bids"][0]
+        return {
+            "instId": symbol,
+            "askPx": ask_px,
+            "askSz": ask_sz,
+            "bidPx": bid_px,
+            "bidSz": bid_sz,
+        }
+
+    def create_binance_ticker(self, venue: str, symbol: str) -> dict:
+        book = self.create_book(venue, symbol)
+        (ask_px, ask_sz), (bid_px, bid_sz) = book["asks"][0], book["bids"][0]
+        return {
+            "symbol": symbol,
+            "bidPrice": bid_px,
+            "bidQty": bid_sz,
+            "askPrice": ask_px,
+            "askQty": ask_sz,
+        }
+
+    # =============================================================================
+    # 5 levels a side around the venue's mid, prices & sizes as strings
+    # =============================================================================
+    def create_book(self, venue: str, symbol: str) -> dict:
+        with self.lock:
+            self.symbols[venue].add(symbol)
+            key = (venue, symbol)
+            if venue in self.frozen and key in self.frozen_books:
+                return self.frozen_books[key]
+            mid = self.determine_price(symbol[:3]) * self.determine_offset(venue)
+            loose = self.random.random() < self.loose_rate
+            half_spread = mid * (0.001 if loose else 0.00005)
+            sizes = [round(self.random.uniform(0.1, 5), 3) for _ in range(10)]
+            self.stats["loose"] += loose
+        book = {
+            "asks": [
+                [str(round(mid + half_spread * (1 + i), 6)), str(sizes[i])]
+                for i in range(5)
+            ],
+            "bids": [
+                [str(round(mid - half_spread * (1 + i), 6)), str(sizes[5 + i])]
+                for i in range(5)
+            ],
+        }
+        if venue in self.frozen:
+            with self.lock:
+                self.frozen_books.setdefault(key, book)
+        return book
+
+    # =============================================================================
+    # Random walk, one step per 100ms of wall time since the last request
+    # =============================================================================
+    def determine_price(self, asset: str) -> float:
+        now = time.monotonic()
+        updated, price = self.prices.get(asset, (now, 100.0 + len(self.prices) * 50))
+        steps = min(int((now - updated) / 0.1), 1000)
+        for _ in range(steps):
+            price *= 1 + self.random.gauss(0, 0.0002)
+        if steps:
+            updated = now
+        self.prices[asset] = (updated, price)
+        return price
+
+    # =============================================================================
+    # Fixed small premium/discount per venue so pairs have nonzero spreads
+    # =============================================================================
+    def determine_offset(self, venue: str) -> float:
+        return 1 + (list(VENUE_PREFIXES.values()).index(venue) - 2) * 0.0002
+
+    # =============================================================================
+    # Discord webhook sink
+    # =============================================================================
+    def handle_discord(self, handler):
+        length = int(handler.headers.get("Content-Length", 0))
+        handler.rfile.read(length)
+        with self.lock:
+            self.stats["discord"] += 1
+        handler.send_response(204)
+        handler.end_headers()
+
+    def send_json(self, handler, status: int, body):
+        payload = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+
+if __name__ == "__main__":
+    # python -m soak.mock_exchange_server 8800
+    import sys
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8800
+    server = MockExchangeServer(port=port)
+    server.start()
+    for k, v in server.create_env().items():
+        print(f"export {k}={v}")
+    while True:
+        time.sleep(60)
@@ -0,0 +1,376 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import os, sys, json, time, tempfile, threading, subprocess
+import datetime as dt
+import numpy as np
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from soak.mock_exchange_server import MockExchangeServer
+
+EXCHANGES = ["DYDX", "BINANCE_GLOBAL", "OKX", "BINANCE_US", "COINBASE"]
+ASSETS = ["BTC", "ETH", "SOL", "ADA", "XRP", "DOT", "LTC", "BCH"]
+RESULT_PREFIX = "SOAK_RESULT "
+
+DEFAULT_CONFIG = {
+    "exchanges": [2, 3, 5],  # scenarios: every n_exchanges x n_markets combo
+    "markets": [1, 2, 4],
+    "interval": 5,  # simulated secs
+    "hours": 2,  # simulated hours per scenario
+    "hours_before_midnight": 1,  # EOD fires this far into the run
+    "scale": 120,  # simulated secs per real sec
+    "latency": 0.005,  # real secs per mock response
+    "jitter": 0.002,
+    "slow_rate": 0.0,  # share of mock responses that take slow_latency
+    "slow_latency": 0.25,
+    "hedge": False,
+    "shards": 1,  # phase shifted instances per scenario, shard 0 merges at EOD
+    "error_rate": 0.01,
+    "loose_rate": 0.01,
+    "frozen": ["BINANCE_US"],
+    "fetch_mode": "single",
+    "fetch_sync": "off",  # "barrier": send all venues together on the grid
+    "pipeline": "staged",  # "inline": store & analyses on the tick thread
+    "analysis_delay": 0.0,  # real secs added to every tick's analyses
+    "store_mode": "full",  # "delta": store & save changed quotes only
+    "alert_mode": "static",
+    "answers": {
+        "frozen_window": 20,
+        "thresh_base": 0.5,
+        "thresh_incr": 0.1,
+    },
+}
+
+
+# =============================================================================
+# Run every scenario in its own process against one mock server.
+# Budgets are real time: a tick has interval / scale real secs, so `scale`
+# sets the load (scale 120 @ 5s = a tick every ~42ms). Rate limits and batch
+# ages are scaled along with the clock, mock latency & retry sleeps are not.
+# =============================================================================
+def run_soak(config: dict) -> list:
+    workdir = tempfile.mkdtemp(prefix="soak_")
+    server = MockExchangeServer(
+        latency=config["latency"],
+        jitter=config["jitter"],
+        slow_rate=config["slow_rate"],
+        slow_latency=config["slow_latency"],
+        error_rate=config["error_rate"],
+        loose_rate=config["loose_rate"],
+        frozen=config["frozen"],
+    )
+    server.start()
+    results = []
+    try:
+        for n_exchanges in config["exchanges"]:
+            for n_markets in config["markets"]:
+                markets = create_markets(n_exchanges, n_markets)
+                for exchanges_obj in markets.values():
+                    server.register_symbols(exchanges_obj)
+                result = run_scenario_in_subprocess(config, markets, server, workdir)
+                print_result(result)
+                results.append(result)
+    finally:
+        server.stop()
+        print(f"Mock server stats: {server.stats}")
+        print(f"Scenario logs in {workdir}")
+    print_summary(results)
+    return results
+
+
+# =============================================================================
+# Fresh interpreter per scenario: constants are read from env at import and
+# memory numbers aren't polluted by the previous scenario. With shards > 1
+# one interpreter per shard, sharing the sink folder and the simulated clock;
+# the result is shard 0's (which merges).
+# =============================================================================
+def run_scenario_in_subprocess(config, markets, server, workdir) -> dict:
+    name = f"{len(next(iter(markets.values())))}ex_{len(markets)}mk"
+    scenario_dir = os.path.join(workdir, name)
+    os.makedirs(scenario_dir, exist_ok=True)
+    clock_real = time.time() + 5  # all shards start the sim clock together
+    scenario = {
+        **config,
+        "name": name,
+        "markets": markets,
+        "workdir": scenario_dir,
+        "clock_real": clock_real,
+    }
+    scale = config["scale"]
+    env = {
+        **os.environ,
+        **server.create_env(),
+        "QUERY_SERVER_PORT": "0",
+        "REPORT_LEVEL": "quiet",
+        "FETCH_MODE": config["fetch_mode"],
+        "FETCH_SYNC": config["fetch_sync"],
+        "PIPELINE_MODE": config["pipeline"],
+        "QUOTE_STORE_MODE": config["store_mode"],
+        "FETCH_SYNC_LEAD": str(0.01 * scale),  # 10ms real
+        "ALERT_MODE": config["alert_mode"],
+        "HEDGE_MODE": "on" if config["hedge"] else "off",
+        "QUOTE_STORE_SPILL_DIR": os.path.join(scenario_dir, "spill"),
+        "INSTRUMENT_CACHE_PATH": os.path.join(scenario_dir, "instruments.json"),
+        "SINKS": "local",
+        "SINK_LOCAL_DIR": os.path.join(scenario_dir, "data"),
+        "RATE_LIMIT_SAFETY": str(0.8 * scale),
+        "RATE_LIMIT_MAX_WAIT": str(0.5 / scale),
+        "BATCH_MAX_AGE": str(1.0 / scale),
+        "SHARD_COUNT": str(config["shards"]),
+        "SHARD_WAIT": "30",
+    }
+    real_secs = config["hours"] * 3600 / scale
+    procs, log_paths = [], []
+    for i in range(config["shards"]):
+        log_path = os.path.join(
+            scenario_dir, "puller.log" if i == 0 else f"puller_shard{i}.log"
+        )
+        shard_env = {
+            **env,
+            "SHARD_INDEX": str(i),
+            "SHM_PUBLISH": "on",
+            "SHM_PREFIX": f"soak{os.getpid()}_{i}_",
+        }
+        print(f"Running {name} for {round(real_secs)}s, log: {log_path}")
+        with open(log_path, "w") as log:
+            procs.append(
+                subprocess.Popen(
+                    [
+                        sys.executable,
+                        "-m",
+                        "soak.soak_test",
+                        "--scenario",
+                        json.dumps(scenario),
+                    ],
+                    env=shard_env,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                )
+            )
+        log_paths.append(log_path)
+    for proc in procs:
+        try:
+            proc.wait(timeout=real_secs * 3 + 120)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    with open(log_paths[0]) as log:
+        for line in log:
+            if line.startswith(RESULT_PREFIX):
+                return json.loads(line[len(RESULT_PREFIX) :])
+    code = procs[0].returncode
+    return {"name": name, "error": f"exit code {code}, see {log_paths[0]}"}
+
+
+# =============================================================================
+# {"BTC-USD": {"DYDX": "BTC-USD", "BINANCE_GLOBAL": "BTCUSDT", ...}, ...}
+# =============================================================================
+def create_markets(n_exchanges: int, n_markets: int) -> dict:
+    symbol_formats = {
+        "DYDX": "{}-USD",
+        "BINANCE_GLOBAL": "{}USDT",
+        "OKX": "{}-USDT",
+        "BINANCE_US": "{}USD",
+        "COINBASE": "{}-USD",
+    }
+    markets = {}
+    for asset in ASSETS[:n_markets]:
+        markets[f"{asset}-USD"] = {
+            ex: symbol_formats[ex].format(asset) for ex in EXCHANGES[:n_exchanges]
+        }
+    return markets
+
+
+# =============================================================================
+#
+# CHILD PROCESS
+#
+# =============================================================================
+
+
+# =============================================================================
+# Run all markets headless on a simulated clock, return the measurements
+# =============================================================================
+def run_scenario(scenario: dict) -> dict:
+    from utils.time_helpers import set_simulated_clock
+    import ArbDataPuller as ADP
+
+    scale, interval = scenario["scale"], scenario["interval"]
+    midnight = dt.datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = midnight - dt.timedelta(hours=scenario["hours_before_midnight"])
+    set_simulated_clock(start, scale, scenario.get("clock_real"))
+
+    config = {"interval": interval, **scenario["answers"]}
+    pullers = []
+    for market, exchanges_obj in scenario["markets"].items():
+        pullers.append(ADP.ArbDataPuller(market, exchanges_obj, config=config))
+    tick_secs, eod_secs = [], []
+    for puller in pullers:
+        wrap_with_timer(puller, "get_bid_ask_and_process_df_and_test_diff", tick_secs)
+        wrap_with_timer(puller, "handle_midnight_event", eod_secs)
+        if scenario["analysis_delay"]:
+            slow_down(puller.ExecutableSpreads, "update", scenario["analysis_delay"])
+
+    time.sleep(max(scenario.get("clock_real", 0) - time.time(), 0))
+    memory = MemorySampler()
+    memory.start()
+    started = time.monotonic()
+    threads = []
+    for puller in pullers:
+        thread = threading.Thread(target=puller.main, name=puller.market, daemon=True)
+        thread.start()
+        threads.append(thread)
+    time.sleep(scenario["hours"] * 3600 / scale)
+    for puller in pullers:
+        puller.running = False
+    for thread in threads:
+        thread.join(timeout=interval / scale + 30)
+    elapsed = time.monotonic() - started
+    memory.stop()
+    pullers[0].Shards.wait_for_merge(pullers[0].Shards.wait + 60)
+    pullers[0].Sinks.flush()
+    sinks = pullers[0].Sinks.determine_metrics()["local"]
+    hedging = pullers[0].GetBidAsks.Hedger.determine_stats().values()
+    barrier = pullers[0].FetchBarrier.determine_stats()
+    analyze = pullers[0].Pipeline.determine_metrics()["stages"]["analyze"]
+    requests = sum(h["requests"] for h in hedging)
+    hedged = sum(h["hedged"] for h in hedging)
+
+    ticks = sum(p.TickReporter.tick for p in pullers)
+    expected = len(pullers) * scenario["hours"] * 3600 / interval
+    return {
+        "name": scenario["name"],
+        "exchanges": len(pullers[0].exchanges),
+        "markets": len(pullers),
+        "real_secs": round(elapsed, 1),
+        "ticks": ticks,
+        "ticks_per_sec": round(ticks / elapsed, 2),
+        "tick_ratio": round(ticks / expected, 3),  # 1 = kept up with interval
+        "overruns": sum(p.TickReporter.overruns for p in pullers),
+        "tick_p50_ms": percentile_ms(tick_secs, 50),
+        "tick_p99_ms": percentile_ms(tick_secs, 99),
+        "budget_ms": round(interval / scale * 1000, 1),
+        "rss_start_mb": memory.start_mb,
+        "rss_peak_mb": memory.peak_mb,
+        "rss_growth_mb": round(memory.end_mb - memory.start_mb, 1),
+        "eod_runs": len(eod_secs),
+        "eod_secs": round(max(eod_secs), 2) if eod_secs else None,
+        "objects_written": sinks["written"],
+        "sink_blocked_secs": sinks["blocked_secs"],
+        "hedge_rate": round(hedged / max(requests, 1), 4),
+        "hedge_win_rate": round(
+            sum(h["hedge_wins"] for h in hedging) / max(hedged, 1), 4
+        ),
+        "skew_p50_ms": barrier["skew_p50_ms"],
+        "skew_p99_ms": barrier["skew_p99_ms"],
+        "analysis_dropped": analyze["dropped"],
+        "analysis_lag_p99_ms": analyze["lag_p99_ms"],
+        "merged_rows": pullers[0].Shards.last_merge
+        and pullers[0].Shards.last_merge["rows"],
+        "stuck_threads": sum(t.is_alive() for t in threads),
+    }
+
+
+# =============================================================================
+# Make every call of obj.method take `secs` longer (heavier analyses)
+# =============================================================================
+def slow_down(obj, method: str, secs: float):
+    original = getattr(obj, method)
+
+    def slowed(*args, **kwargs):
+        time.sleep(secs)
+        return original(*args, **kwargs)
+
+    setattr(obj, method, slowed)
+
+
+# =============================================================================
+# Time every call of a puller method into `durations`
+# =============================================================================
+def wrap_with_timer(puller, method: str, durations: list):
+    original = getattr(puller, method)
+
+    def timed(*args, **kwargs):
+        started = time.monotonic()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            durations.append(time.monotonic() - started)
+
+    setattr(puller, method, timed)
+
+
+def percentile_ms(secs: list, q: float):
+    if not secs:
+        return None
+    return round(float(np.percentile(secs, q)) * 1000, 1)
+
+
+# =============================================================================
+# RSS of this process from /proc, sampled every half second (linux only)
+# =============================================================================
+class MemorySampler:
+    def __init__(self, every: float = 0.5):
+        self.every = every
+        self.page_mb = os.sysconf("SC_PAGE_SIZE") / 1024**2
+        self.start_mb = self.peak_mb = self.end_mb = self.read_rss_mb()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.end_mb = self.read_rss_mb()
+
+    def run(self):
+        while not self.stopped.wait(self.every):
+            self.peak_mb = max(self.peak_mb, self.read_rss_mb())
+
+    def read_rss_mb(self) -> float:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * self.page_mb, 1)
+
+
+# =============================================================================
+# Print
+# =============================================================================
+def print_result(result: dict):
+    print(json.dumps(result))
+
+
+def print_summary(results: list):
+    cols = [
+        "name",
+        "ticks_per_sec",
+        "tick_ratio",
+        "overruns",
+        "tick_p99_ms",
+        "budget_ms",
+        "rss_growth_mb",
+        "rss_peak_mb",
+        "eod_secs",
+    ]
+    print(" | ".join(cols))
+    for r in results:
+        if "error" in r:
+            print(f"{r['name']} | ERROR: {r['error']}")
+        else:
+            print(" | ".join(str(r[c]) for c in cols))
+
+
+if __name__ == "__main__":
+    # python -m soak.soak_test
+    # python -m soak.soak_test '{"exchanges": [2, 5], "markets": [1, 8], "scale": 60}'
+    if len(sys.argv) > 2 and sys.argv[1] == "--scenario":
+        result = run_scenario(json.loads(sys.argv[2]))
+        print(RESULT_PREFIX + json.dumps(result), flush=True)
+        os._exit(0)  # don't wait for daemon threads stuck in a request
+    config = {
+        **DEFAULT_CONFIG,
+        **(json.loads(sys.argv[1]) if len(sys.argv) > 1 else {}),
+    }
+    run_soak(config)
@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+import pytest
+
+from classes.BatchFetcher import BatchFetcher
+
+BINANCE_TICKERS = [
+    {
+        "symbol": "BTCUSDT",
+        "bidPrice": "42000.10",
+        "bidQty": "1.5",
+        "askPrice": "42000.20",
+        "askQty": "0.3",
+    },
+    {
+        "symbol": "ETHUSDT",
+        "bidPrice": "2200.00",
+        "bidQty": "10",
+        "askPrice": "2200.01",
+        "askQty": "4",
+    },
+]
+OKX_TICKERS = [
+    {
+        "instId": "BTC-USDT",
+        "bidPx": "42000",
+        "bidSz": "2",
+        "askPx": "42001",
+        "askSz": "1",
+    },
+    {"instId": "XYZ-USDT", "bidPx": "", "bidSz": "0", "askPx": "", "askSz": "0"},
+]
+
+
+class FakeBatchFetcher(BatchFetcher):
+    def __init__(self, max_age: float = 60):
+        super().__init__(max_age)
+        self.urls = []
+
+    def http_get(self, exchange: str, url: str):
+        self.urls.append(url)
+        if exchange == "OKX":
+            return SimpleNamespace(json=lambda: {"data": OKX_TICKERS})
+        return SimpleNamespace(json=lambda: BINANCE_TICKERS)
+
+
+def test_parse_binance_book_tickers():
+    books = BatchFetcher().parse_binance_book_tickers(BINANCE_TICKERS)
+    assert books["BTCUSDT"] == {
+        "asks": [["42000.20", "0.3"]],
+        "bids": [["42000.10", "1.5"]],
+    }
+    assert set(books) == {"BTCUSDT", "ETHUSDT"}
+
+
+def test_parse_okx_tickers_skips_instruments_without_quotes():
+    books = BatchFetcher().parse_okx_tickers(OKX_TICKERS)
+    assert books == {"BTC-USDT": {"asks": [["42001", "1"]], "bids": [["42000", "2"]]}}
+
+
+def test_okx_groups():
+    fetcher = BatchFetcher()
+    assert fetcher.determine_group("OKX", "BTC-USDT-SWAP") == "SWAP"
+    assert fetcher.determine_group("OKX", "BTC-USD-230331") == "FUTURES"
+    assert fetcher.determine_group("OKX", "BTC-USDT") == "SPOT"
+    assert fetcher.determine_group("BINANCE_GLOBAL", "BTCUSDT") == "ALL"
+
+
+def test_markets_share_one_bulk_call():
+    fetcher = FakeBatchFetcher()
+    btc = fetcher.get_book("BINANCE_GLOBAL", "BTCUSDT")
+    eth = fetcher.get_book("BINANCE_GLOBAL", "ETHUSDT")
+    assert btc["bids"] == [["42000.10", "1.5"]]
+    assert eth["asks"] == [["2200.01", "4"]]
+    assert len(fetcher.urls) == 1
+    assert fetcher.urls[0].endswith("/ticker/bookTicker")
+    assert fetcher.stats["BINANCE_GLOBAL"]["served"] == 2
+    fetcher.invalidate("BINANCE_GLOBAL")
+    fetcher.get_book("BINANCE_GLOBAL", "BTCUSDT")
+    assert len(fetcher.urls) == 2
+
+
+def test_stale_response_is_refetched_and_missing_symbols_raise():
+    fetcher = FakeBatchFetcher(max_age=0)
+    fetcher.get_book("OKX", "BTC-USDT")
+    fetcher.get_book("OKX", "BTC-USDT")
+    assert len(fetcher.urls) == 2
+    assert fetcher.urls[0].endswith("instType=SPOT")
+    with pytest.raises(Exception, match="no book for XYZ-USDT"):
+        fetcher.get_book("OKX", "XYZ-USDT")
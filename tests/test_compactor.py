@@ -0,0 +1,107 @@
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from classes.Compactor import Compactor, CompactedQuery
+from classes.HistoricalLoader import HistoricalLoader
+from utils.local_s3 import LocalS3
+from utils.s3_paths import create_compacted_key, create_diff_key, create_raw_key
+
+MARKET, MONTH = "BTC-USD", "2024-01"
+EXCHANGES, PAIR = ["KRAKEN", "COINBASE"], "KRAKEN-COINBASE"
+DATES = ["2024-01-02", "2024-01-03", "2024-01-04"]
+SPREADS = {"2024-01-02": 0.1, "2024-01-03": 0.5, "2024-01-04": 3.0}  # abs, mid ~100
+
+
+def put_csv(s3, key: str, df: pd.DataFrame):
+    s3.put_object(Bucket="arb", Key=key, Body=df.to_csv().encode())
+
+
+@pytest.fixture
+def s3(tmp_path):
+    s3 = LocalS3(str(tmp_path / "s3"))
+    for d, date in enumerate(DATES):
+        index = pd.date_range(date, periods=4, freq="6h", name="timestamp")
+        mids = {}
+        for i, ex in enumerate(EXCHANGES):
+            mids[ex] = 100.0 + d + i * SPREADS[date] + pd.Series(range(4)).values
+            df = pd.DataFrame(
+                {"bid_price": mids[ex] - 1, "ask_price": mids[ex] + 1, "mid": mids[ex]},
+                index=index,
+            )
+            put_csv(s3, create_raw_key(ex, MARKET, date), df)
+        diff = pd.DataFrame(
+            {
+                "KRAKEN_mid": mids["KRAKEN"],
+                "COINBASE_mid": mids["COINBASE"],
+                f"{PAIR}_mid": abs(mids["KRAKEN"] - mids["COINBASE"]),
+            },
+            index=index,
+        )
+        diff.iloc[-1, -1] = SPREADS[date] * 2  # one wider spread per day
+        put_csv(s3, create_diff_key(PAIR, MARKET, date), diff)
+    return s3
+
+
+def create_loader(s3, tmp_path) -> HistoricalLoader:
+    return HistoricalLoader(
+        s3=s3, bucket="arb", cache_dir=str(tmp_path / "cache"), parse_workers=1
+    )
+
+
+def test_month_compacts_to_one_row_group_per_day(s3, tmp_path):
+    loader = create_loader(s3, tmp_path)
+    index = Compactor(s3, "arb", loader).compact_month(EXCHANGES, MARKET, MONTH)
+    raw_key = create_compacted_key("raw", MARKET, "KRAKEN", MONTH)
+    diff_key = create_compacted_key("diff", MARKET, PAIR, MONTH)
+    assert set(index["files"]) == {
+        raw_key,
+        create_compacted_key("raw", MARKET, "COINBASE", MONTH),
+        diff_key,
+    }
+    path = loader.fetch_to_cache(raw_key)
+    assert pq.ParquetFile(path).num_row_groups == 3
+    raw = index["files"][raw_key]["row_groups"]
+    assert [rg["date"] for rg in raw] == DATES
+    assert raw[1]["rows"] == 4
+    assert raw[1]["ts_min"] == "2024-01-03T00:00:00"
+    assert raw[1]["ts_max"] == "2024-01-03T18:00:00"
+    assert (raw[1]["mid_min"], raw[1]["mid_max"]) == (101.0, 104.0)
+    diff = index["files"][diff_key]["row_groups"]
+    assert diff[2]["spread_abs_max"] == 6.0
+    assert diff[2]["spread_pct_max"] == pytest.approx(
+        6.0 / 106.5 * 100, abs=1e-3
+    )  # vs mean mid
+    assert diff[0]["spread_pct_max"] < 0.5
+
+    # re-compacting replaces the entries instead of adding to them
+    again = Compactor(s3, "arb", loader).compact_month(EXCHANGES, MARKET, MONTH)
+    assert again["files"] == index["files"]
+
+
+def test_query_prunes_and_reads_only_matching_rows(s3, tmp_path):
+    loader = create_loader(s3, tmp_path)
+    Compactor(s3, "arb", loader).compact_month(EXCHANGES, MARKET, MONTH)
+    query = CompactedQuery(MARKET, s3=s3, bucket="arb", loader=loader)
+    raw_key = create_compacted_key("raw", MARKET, "KRAKEN", MONTH)
+    diff_key = create_compacted_key("diff", MARKET, PAIR, MONTH)
+
+    assert query.prune("raw", "KRAKEN", "2024-01-03", "2024-01-03 23:59") == {
+        raw_key: [1]
+    }
+    assert query.prune("raw", "KRAKEN", "2024-01-03 12:00", "2024-01-04 03:00") == {
+        raw_key: [1, 2]
+    }
+    assert query.prune("raw", "KRAKEN", "2024-02-01") == {}
+    assert query.prune("diff", PAIR, min_spread_pct=0.5) == {diff_key: [1, 2]}
+    assert query.find_days_spread_exceeded(PAIR, 2.0) == ["2024-01-04"]
+
+    df = query.read("raw", "KRAKEN", "2024-01-03 06:00", "2024-01-04 06:00")
+    assert df["timestamp"].tolist() == list(
+        pd.date_range("2024-01-03 06:00", "2024-01-04 06:00", freq="6h")
+    )
+    assert df["mid"].tolist() == [102.0, 103.0, 104.0, 102.0, 103.0]
+
+    df = query.read("diff", PAIR, min_spread_pct=0.5)
+    assert (df[f"{PAIR}_pct"] > 0.5).all()
+    assert df[f"{PAIR}_mid"].tolist() == [1.0, 3.0, 3.0, 3.0, 6.0]
@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+
+from classes.ExecutableSpreads import ExecutableSpreads, compute_vwaps
+
+
+def create_book(asks: list, bids: list) -> np.ndarray:
+    # [ask_px, ask_sz, bid_px, bid_sz] x levels
+    return np.array(
+        [
+            [px for px, _ in asks],
+            [sz for _, sz in asks],
+            [px for px, _ in bids],
+            [sz for _, sz in bids],
+        ]
+    )
+
+
+def test_vwap_inside_across_and_beyond_the_book():
+    prices = np.array([[100.0, 101.0, np.nan]])  # third level not fetched
+    sizes = np.array([[1.0, 2.0, 0.0]])
+    targets = np.array([50.0, 100.0, 200.0, 302.0, 1000.0])
+    vwaps = compute_vwaps(prices, sizes, targets)[0]
+    assert vwaps[0] == pytest.approx(100.0)  # inside the first level
+    assert vwaps[1] == pytest.approx(100.0)  # exactly the first level
+    assert vwaps[2] == pytest.approx(200 / (1 + 100 / 101))  # spans two levels
+    assert vwaps[3] == pytest.approx(302 / 3)  # the whole book
+    assert np.isnan(vwaps[4])  # deeper than the book
+
+
+def test_spreads_per_ordered_pair():
+    Caller = SimpleNamespace(exchanges=["KRAKEN", "COINBASE"])
+    spreads = ExecutableSpreads(Caller, sizes=[50, 200, 1000], levels=2)
+    bid_asks = {
+        "KRAKEN": {"book": create_book([(100, 1), (101, 2)], [(99, 1), (98, 2)])},
+        "COINBASE": {"book": create_book([(102, 1), (103, 2)], [(101, 1), (100, 2)])},
+    }
+    latest = spreads.update(bid_asks)
+    assert spreads.pairs == ["KRAKEN>COINBASE", "COINBASE>KRAKEN"]
+    ref = (99.5 + 101.5) / 2
+    # buy KRAKEN at its ask, sell COINBASE at its bid
+    assert latest["top"][0] == pytest.approx((101 - 100) / ref * 100)
+    assert latest["top"][1] == pytest.approx((99 - 102) / ref * 100)
+    assert latest["vwap"][0, 0] == pytest.approx((101 - 100) / ref * 100)
+    buy = 200 / (1 + 100 / 101)  # KRAKEN asks
+    sell = 200 / (1 + 99 / 100)  # COINBASE bids
+    assert latest["vwap"][0, 1] == pytest.approx((sell - buy) / ref * 100)
+    assert np.isnan(latest["vwap"][:, 2]).all()  # 1000 is deeper than both books
+    formatted = spreads.format_latest()
+    assert formatted["KRAKEN>COINBASE"]["1000"] is None
+    assert formatted["COINBASE>KRAKEN"]["top"] < 0
+    assert spreads.day_stats["top_positive"].tolist() == [1, 0]
+
+
+def test_missing_book_gives_nan():
+    Caller = SimpleNamespace(exchanges=["KRAKEN", "COINBASE"])
+    spreads = ExecutableSpreads(Caller, sizes=[50], levels=2)
+    book = create_book([(100, 1), (101, 2)], [(99, 1), (98, 2)])
+    latest = spreads.update({"KRAKEN": {"book": book}, "COINBASE": {}})
+    assert np.isnan(latest["top"]).all()
+    assert np.isnan(latest["vwap"]).all()
@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+import pytest
+
+import classes.FetchBarrier as FB
+
+
+@pytest.fixture
+def barrier():
+    Caller = SimpleNamespace(exchanges=["KRAKEN"], market="BTC-USD")
+    return FB.FetchBarrier(Caller, mode="barrier", lead=0.2)
+
+
+@pytest.mark.parametrize(
+    "now, release",
+    [
+        (99.8, 100.0),  # woke up a lead early
+        (99.95, 100.0),  # woke up a little late, still ahead of the grid point
+        (100.3, 100.0),  # late wake: its own grid point, not the next one
+        (101.5, 100.0),
+        (102.9, 105.0),
+    ],
+)
+def test_release_epoch_is_the_grid_point_the_tick_woke_up_for(
+    barrier, monkeypatch, now, release
+):
+    monkeypatch.setattr(FB, "determine_cur_epoch", lambda: now)
+    assert barrier.determine_release_epoch(5, 0) == release
+
+
+def test_release_epoch_keeps_the_phase_offset(barrier, monkeypatch):
+    monkeypatch.setattr(FB, "determine_cur_epoch", lambda: 102.3)
+    assert barrier.determine_release_epoch(5, 2.5) == 102.5
+
+
+def test_late_release_is_counted(barrier, monkeypatch):
+    monkeypatch.setattr(FB, "determine_cur_epoch", lambda: 100.3)
+    barrier.barrier = None
+    barrier.enabled = False  # no fetch threads to wait for
+    barrier.release_at(barrier.determine_release_epoch(5, 0))
+    assert barrier.stats["late_releases"] == 1
+
+
+def test_barrier_wait_is_popped_once():
+    FB.pop_barrier_wait()
+    FB._local.waited = 0.25
+    assert FB.pop_barrier_wait() == 0.25
+    assert FB.pop_barrier_wait() == 0.0
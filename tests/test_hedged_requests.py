@@ -0,0 +1,91 @@
+import time
+from types import SimpleNamespace
+from urllib.parse import urlparse
+import pytest
+import requests
+
+from classes.HedgedRequests import HedgedRequests
+from utils.constants import HEDGE_MIN_SAMPLES
+
+EXCHANGE = "TESTEX"  # no rate limit bucket
+PRIMARY, ALTERNATE = "http://primary.test", "http://alternate.test"
+
+
+class FakeSession(requests.Session):
+    def __init__(self, behaviour: dict):
+        super().__init__()
+        self.behaviour = behaviour  # host -> (secs, status or exception)
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        host = urlparse(request.url).netloc
+        self.sent.append(request.url)
+        secs, outcome = self.behaviour[host]
+        time.sleep(secs)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SimpleNamespace(
+            ok=200 <= outcome < 300, status_code=outcome, url=request.url, headers={}
+        )
+
+
+def create_hedger(primary: tuple, alternate: tuple) -> tuple:
+    hedger = HedgedRequests(mode="on", hosts={EXCHANGE: [ALTERNATE]})
+    hedger.setup_exchange(EXCHANGE)
+    hedger.latencies[EXCHANGE].extend([0.02] * HEDGE_MIN_SAMPLES)  # hedge at 20ms
+    session = FakeSession({"primary.test": primary, "alternate.test": alternate})
+    hedger.sessions[EXCHANGE] = session
+    return hedger, session
+
+
+def get(hedger):
+    return hedger.get(EXCHANGE, f"{PRIMARY}/depth?symbol=BTCUSD", weight=1)
+
+
+def test_fast_primary_isnt_hedged():
+    hedger, session = create_hedger((0, 200), (0, 200))
+    assert get(hedger).url.startswith(PRIMARY)
+    assert session.sent == [f"{PRIMARY}/depth?symbol=BTCUSD"]
+    stats = hedger.determine_stats()[EXCHANGE]
+    assert (stats["requests"], stats["hedged"], stats["hedge_wins"]) == (1, 0, 0)
+
+
+def test_slow_primary_loses_to_the_hedge():
+    hedger, session = create_hedger((0.5, 200), (0, 200))
+    res = get(hedger)
+    assert res.url == f"{ALTERNATE}/depth?symbol=BTCUSD"  # same path & query
+    stats = hedger.determine_stats()[EXCHANGE]
+    assert (stats["requests"], stats["hedged"], stats["hedge_wins"]) == (1, 1, 1)
+    assert stats["hedge_rate"] == 1.0
+    assert stats["win_rate"] == 1.0
+
+
+def test_failed_primary_falls_to_the_alternate():
+    error = requests.ConnectionError("reset")
+    hedger, _ = create_hedger((0.05, error), (0.1, 200))
+    assert get(hedger).url.startswith(ALTERNATE)
+    hedger, _ = create_hedger((0.05, 500), (0.1, 200))  # non 2xx doesn't win
+    assert get(hedger).url.startswith(ALTERNATE)
+    assert hedger.determine_stats()[EXCHANGE]["hedge_wins"] == 1
+
+
+def test_both_failing_raises_or_returns_the_bad_answer():
+    hedger, _ = create_hedger(
+        (0.05, requests.ConnectionError("primary")),
+        (0, requests.Timeout("alternate")),
+    )
+    with pytest.raises(requests.RequestException):
+        get(hedger)
+    assert hedger.determine_stats()[EXCHANGE]["hedge_wins"] == 0
+    hedger, _ = create_hedger((0.05, 503), (0, requests.Timeout("alternate")))
+    assert get(hedger).status_code == 503  # a bad answer beats no answer
+
+
+def test_hedges_stay_within_budget():
+    hedger, session = create_hedger((0.05, 200), (0, 200))
+    for _ in range(20):
+        get(hedger)
+    stats = hedger.determine_stats()[EXCHANGE]
+    assert stats["requests"] == 20
+    assert 1 <= stats["hedged"] <= 2  # HEDGE_MAX_RATE of the recent requests
+    assert len(session.sent) == 20 + stats["hedged"]
@@ -0,0 +1,151 @@
+import itertools, os
+from types import SimpleNamespace
+import pandas as pd
+import pytest
+
+import utils.disk_cache as disk_cache
+from classes.HistoricalLoader import HistoricalLoader
+from classes.QuoteStore import QuoteStore
+from classes.SaveRawData import SaveRawData
+from utils.compression import compress
+from utils.disk_cache import DiskCache
+from utils.local_s3 import LocalS3
+from utils.s3_paths import create_changes_key, create_raw_key
+
+MARKET, EXCHANGES = "BTC-USD", ["KRAKEN", "COINBASE"]
+DATES = ["2024-01-02", "2024-01-03"]
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    ticks = itertools.count(1_700_000_000)  # every access is a second later
+    monkeypatch.setattr(disk_cache.time, "time", lambda: next(ticks))
+
+
+def put_raw_day(s3, exchange: str, date: str, mid: float, encoding: str = "none"):
+    index = pd.date_range(date, periods=3, freq="5s", name="timestamp")
+    df = pd.DataFrame(
+        {"bid_price": mid - 1, "ask_price": mid + 1, "mid": mid}, index=index
+    )
+    body = compress(df.to_csv().encode(), encoding)
+    kwargs = {"ContentEncoding": encoding} if encoding != "none" else {}
+    s3.put_object(
+        Bucket="arb", Key=create_raw_key(exchange, MARKET, date), Body=body, **kwargs
+    )
+
+
+def create_loader(s3, cache_dir) -> HistoricalLoader:
+    return HistoricalLoader(
+        s3=s3, bucket="arb", cache_dir=str(cache_dir), parse_workers=1
+    )
+
+
+def test_cache_hit_needs_a_matching_etag(tmp_path):
+    cache = DiskCache(str(tmp_path), max_mb=1)
+    path = cache.put("a.csv", b"abc", '"etag1"')
+    assert cache.get("a.csv", '"etag1"') == path
+    assert cache.get("a.csv", '"etag2"') is None
+    assert cache.get("b.csv", '"etag1"') is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = DiskCache(str(tmp_path), max_mb=3 / 1024)  # 3 kB
+    for key in ["a", "b", "c"]:
+        cache.put(key, b"x" * 1024, key)
+    assert cache.get("a", "a") is not None  # b is the least recently used now
+    cache.put("d", b"x" * 1024, "d")
+    assert sorted(cache.index) == ["a", "c", "d"]
+    assert not os.path.exists(cache.determine_path("b"))
+    cache.put("big", b"x" * 4096, "big")  # larger than the cache: kept alone
+    assert list(cache.index) == ["big"]
+
+
+def test_index_survives_restarts(tmp_path):
+    DiskCache(str(tmp_path), max_mb=1).put("a.csv", b"abc", "e")
+    assert DiskCache(str(tmp_path), max_mb=1).get("a.csv", "e") is not None
+
+
+def test_loader_revalidates_cached_objects_by_etag(tmp_path):
+    s3 = LocalS3(str(tmp_path / "s3"))
+    for date in DATES:
+        for i, ex in enumerate(EXCHANGES):
+            put_raw_day(s3, ex, date, 100 + i, encoding="gzip" if i else "none")
+    loader = create_loader(s3, tmp_path / "cache")
+    first = loader.load_raw(EXCHANGES, MARKET, DATES[0], DATES[-1])
+    assert len(first) == 12 and loader.stats["downloads"] == 4
+    assert first["timestamp"].is_monotonic_increasing
+    assert set(first.loc[first["exchange"] == "COINBASE", "mid"]) == {101}
+
+    loader = create_loader(s3, tmp_path / "cache")
+    gets = s3.calls["get_object"]
+    second = loader.load_raw(EXCHANGES, MARKET, DATES[0], DATES[-1])
+    pd.testing.assert_frame_equal(first, second)
+    assert loader.stats["cache_hits"] == 4 and s3.calls["get_object"] == gets
+
+    put_raw_day(s3, "KRAKEN", DATES[1], 200)  # rewritten object, new ETag
+    third = loader.load_raw(EXCHANGES, MARKET, DATES[0], DATES[-1])
+    assert loader.stats["downloads"] == 1 and loader.stats["cache_hits"] == 7
+    day = third["timestamp"].dt.strftime("%Y-%m-%d") == DATES[1]
+    assert set(third.loc[day & (third["exchange"] == "KRAKEN"), "mid"]) == {200}
+
+
+def test_loader_reports_missing_days(tmp_path):
+    s3 = LocalS3(str(tmp_path / "s3"))
+    put_raw_day(s3, "KRAKEN", DATES[0], 100)
+    loader = create_loader(s3, tmp_path / "cache")
+    df = loader.load_raw(["KRAKEN"], MARKET, DATES[0], DATES[-1])
+    assert len(df) == 3
+    missing = [k for k in loader.stats["missing"] if not k.startswith("Ticks/")]
+    assert missing == [create_raw_key("KRAKEN", MARKET, DATES[1])]
+
+
+class CsvSinks:
+    def __init__(self, s3):
+        self.s3 = s3
+
+    def submit_dfs(self, jobs: list):
+        for key, df in jobs:
+            self.s3.put_object(Bucket="arb", Key=key, Body=df.to_csv().encode())
+
+
+def test_delta_days_get_their_own_keys_and_load_expanded(tmp_path):
+    s3 = LocalS3(str(tmp_path / "s3"))
+    put_raw_day(s3, "KRAKEN", DATES[0], 100)  # full resolution day
+    store = QuoteStore(spill_dir=str(tmp_path / "spill"), mode="delta")
+    start = pd.Timestamp(DATES[1])
+    for i in range(6):
+        mid = 100.0 + i // 3  # changes every 3rd tick
+        bid_ask = {"timestamp": start + pd.Timedelta(seconds=5 * i), "mid": mid}
+        bid_ask.update({"bid_price": mid - 1, "ask_price": mid + 1, "interval": 5.0})
+        store.append_tick({"KRAKEN": bid_ask}, 5.0)
+    Caller = SimpleNamespace(
+        df_obj=store, market=MARKET, today=DATES[1], Sinks=CsvSinks(s3)
+    )
+    SaveRawData(Caller).save_raw_bid_ask_data_to_s3()
+    loader = create_loader(s3, tmp_path / "cache")
+    assert loader.fetch_to_cache(create_raw_key("KRAKEN", MARKET, DATES[1])) is None
+    assert loader.fetch_to_cache(create_changes_key("KRAKEN", MARKET, DATES[1]))
+
+    df = loader.load_raw(["KRAKEN"], MARKET, DATES[0], DATES[1])
+    day = df[df["timestamp"] >= start]
+    assert len(df) == 3 + 6
+    assert day["mid"].tolist() == [100.0] * 3 + [101.0] * 3
+    assert (day["interval"] == 5.0).all()  # from the grid
+
+
+def test_hits_write_the_index_once_per_load(tmp_path, monkeypatch):
+    s3 = LocalS3(str(tmp_path / "s3"))
+    for date in DATES:
+        for ex in EXCHANGES:
+            put_raw_day(s3, ex, date, 100)
+    create_loader(s3, tmp_path / "cache").load_raw(EXCHANGES, MARKET, *DATES)
+    loader = create_loader(s3, tmp_path / "cache")
+    saves = []
+    save_index = loader.cache.save_index
+    monkeypatch.setattr(loader.cache, "save_index", lambda: saves.append(save_index()))
+    loader.load_raw(EXCHANGES, MARKET, *DATES)
+    assert loader.stats["cache_hits"] == 4
+    assert len(saves) == 1  # the flush after the fetches, not one per hit
+    accessed = DiskCache(str(tmp_path / "cache"), max_mb=1).index
+    key = create_raw_key("KRAKEN", MARKET, DATES[0])
+    assert accessed[key]["last_access"] == loader.cache.index[key]["last_access"]
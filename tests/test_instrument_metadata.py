@@ -0,0 +1,95 @@
+import threading
+from types import SimpleNamespace
+import pytest
+
+import classes.InstrumentMetadata as IM
+from classes.RateLimiter import RateLimiter, RateLimitExceeded
+
+DYDX_MARKETS = {
+    "markets": {
+        "BTC-USD": {
+            "tickSize": "1",
+            "stepSize": "0.0001",
+            "baseAsset": "BTC",
+            "quoteAsset": "USD",
+        }
+    }
+}
+
+
+def create_response(status: int = 200, body=None, headers=None):
+    res = SimpleNamespace(status_code=status, headers=headers or {})
+    res.json = lambda: body
+    res.raise_for_status = lambda: None
+    return res
+
+
+@pytest.fixture
+def metadata(tmp_path):
+    metadata = IM.InstrumentMetadata(path=str(tmp_path / "instruments.json"))
+    metadata.RateLimiter = RateLimiter({"DYDX": (10, 10)}, {"DYDX": 1})
+    return metadata
+
+
+def test_refresh_takes_the_endpoint_weight_from_the_rate_limiter(metadata, monkeypatch):
+    monkeypatch.setattr(IM, "INSTRUMENT_REQUEST_WEIGHTS", {"DYDX": 4})
+    monkeypatch.setattr(
+        IM.requests, "get", lambda url, timeout: create_response(body=DYDX_MARKETS)
+    )
+    metadata.refresh_if_stale(["DYDX"])
+    assert metadata.get_tick_size("DYDX", "BTC-USD") == 1.0
+    assert metadata.RateLimiter.stats["DYDX"]["sent"] == 1
+    assert metadata.RateLimiter.buckets["DYDX"].determine_available() < 7
+
+
+def test_rate_limited_refresh_keeps_the_cached_entries(metadata, monkeypatch):
+    monkeypatch.setattr(
+        IM.requests, "get", lambda url, timeout: create_response(body=DYDX_MARKETS)
+    )
+    metadata.refresh_if_stale(["DYDX"])
+    metadata.venues["DYDX"]["loaded_at"] = 0  # stale
+    monkeypatch.setattr(
+        IM.requests, "get", lambda url, timeout: create_response(429, headers={})
+    )
+    with pytest.raises(RateLimitExceeded):
+        metadata.http_get("DYDX", "http://dydx/markets")
+    metadata.refresh_if_stale(["DYDX"])  # blocked by Retry-After, not sent
+    assert metadata.get_tick_size("DYDX", "BTC-USD") == 1.0
+    assert metadata.RateLimiter.stats["DYDX"]["429"] == 1
+    assert metadata.RateLimiter.stats["DYDX"]["throttled"] == 1
+
+
+def test_background_refresh_doesnt_block_the_caller(metadata, monkeypatch):
+    release = threading.Event()
+
+    def slow_get(url, timeout):
+        release.wait(5)
+        return create_response(body=DYDX_MARKETS)
+
+    monkeypatch.setattr(IM.requests, "get", slow_get)
+    metadata.refresh_in_background(["DYDX"])
+    metadata.refresh_in_background(["DYDX"])  # one refresh at a time
+    assert metadata.get("DYDX", "BTC-USD") is None
+    release.set()
+    metadata.refreshing.join(5)
+    assert metadata.get_tick_size("DYDX", "BTC-USD") == 1.0
+
+
+def test_building_a_puller_doesnt_wait_for_the_network(metadata, monkeypatch):
+    import classes.GetBidAsks as GBA
+
+    release, called = threading.Event(), threading.Event()
+
+    def slow_get(url, timeout):
+        called.set()
+        release.wait(5)
+        return create_response(body=DYDX_MARKETS)
+
+    monkeypatch.setattr(IM.requests, "get", slow_get)
+    monkeypatch.setattr(GBA, "get_instrument_metadata", lambda: metadata)
+    GBA.GetBidAsks(SimpleNamespace(exchanges=["DYDX"]))  # returns right away
+    assert called.wait(5)  # the refresh runs in the background
+    assert metadata.get_tick_size("DYDX", "BTC-USD") is None
+    release.set()
+    metadata.refreshing.join(5)
+    assert metadata.get_tick_size("DYDX", "BTC-USD") == 1.0
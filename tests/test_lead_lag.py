@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+
+from classes.LeadLag import LeadLag, compute_cross_correlations
+
+EXCHANGES = ["KRAKEN", "COINBASE", "BITSTAMP"]
+PAIRS = ["KRAKEN-COINBASE", "KRAKEN-BITSTAMP", "COINBASE-BITSTAMP"]
+STEP = 5.0
+
+
+def test_planted_lag_is_recovered_with_its_sign():
+    rng = np.random.default_rng(3)
+    source = rng.normal(size=2010)
+    x = np.column_stack([source[10:], source[:-10]])  # column 1 is 10 steps late
+    lags, corrs = compute_cross_correlations(x, np.array([0, 1]), np.array([1, 0]), 30)
+    assert lags[np.argmax(corrs[0])] == 10  # 0 leads 1
+    assert lags[np.argmax(corrs[1])] == -10  # same pair, other way round
+    assert corrs[0].max() > 0.99
+    assert abs(corrs[0][lags == 0][0]) < 0.1
+
+
+def create_caller(mids: dict) -> SimpleNamespace:
+    start = pd.Timestamp("2024-01-02")
+    df_obj = {}
+    for ex, ex_mids in mids.items():
+        ts = [start + pd.Timedelta(seconds=STEP * i) for i in range(len(ex_mids))]
+        df_obj[ex] = pd.DataFrame({"timestamp": ts, "mid": ex_mids})
+    shards = SimpleNamespace(determine_slot_secs=lambda: STEP)
+    caller = SimpleNamespace(
+        market="BTC-USD", exchanges=EXCHANGES, diff_pairs=PAIRS, Shards=shards
+    )
+    return caller, df_obj
+
+
+def test_leader_follows_the_lag_sign_and_flat_series_have_none():
+    rng = np.random.default_rng(4)
+    walk = 100 * np.exp(np.cumsum(rng.normal(0, 1e-3, 1000)))
+    mids = {
+        "KRAKEN": walk[:-3],  # COINBASE is 3 steps behind KRAKEN
+        "COINBASE": np.concatenate([np.full(3, walk[0]), walk[:-6]]),
+        "BITSTAMP": np.full(997, 100.0),  # flat, no returns
+    }
+    caller, df_obj = create_caller(mids)
+    df = LeadLag(caller, max_lag=60).determine_lead_lag(df_obj)
+    assert df.loc["KRAKEN-COINBASE", "leader"] == "KRAKEN"
+    assert df.loc["KRAKEN-COINBASE", "lag_secs"] == 3 * STEP
+    assert df.loc["KRAKEN-COINBASE", "corr"] > 0.99
+    for pair in ["KRAKEN-BITSTAMP", "COINBASE-BITSTAMP"]:
+        assert pd.isna(df.loc[pair, "leader"])  # None in the rows
+        assert pd.isna(df.loc[pair, "lag_secs"])
+        assert np.isnan(df.loc[pair, "corr_at_0"])
+
+
+def test_follower_first_in_the_pair_leads_the_other_way():
+    rng = np.random.default_rng(5)
+    walk = 100 * np.exp(np.cumsum(rng.normal(0, 1e-3, 1000)))
+    mids = {
+        "KRAKEN": np.concatenate([np.full(2, walk[0]), walk[:-4]]),
+        "COINBASE": walk[:-2],  # KRAKEN is 2 steps behind: COINBASE leads
+        "BITSTAMP": walk[:-2],
+    }
+    caller, df_obj = create_caller(mids)
+    df = LeadLag(caller, max_lag=60).determine_lead_lag(df_obj)
+    assert df.loc["KRAKEN-COINBASE", "leader"] == "COINBASE"
+    assert df.loc["KRAKEN-COINBASE", "lag_secs"] == -2 * STEP
+    assert df.loc["COINBASE-BITSTAMP", "leader"] == "none"  # identical series
+    assert df.loc["COINBASE-BITSTAMP", "lag_secs"] == 0
@@ -0,0 +1,56 @@
+import json, queue, pstats, threading
+from types import SimpleNamespace
+
+from classes.Profiler import Profiler
+
+
+def work_on_tick_thread():
+    return sum(range(1000))
+
+
+def work_on_pipeline_thread():
+    return sorted(range(1000), reverse=True)
+
+
+def test_cprofile_covers_worker_threads(tmp_path):
+    Caller = SimpleNamespace(market="BTC-USD", Scheduler=SimpleNamespace(interval=5))
+    profiler = Profiler(Caller, out_dir=str(tmp_path))
+    profiler.request(ticks=2, modes=["cprofile"])
+
+    ticks, done = queue.Queue(), queue.Queue()
+
+    def worker():  # long lived like the pipeline stages
+        while ticks.get():
+            with profiler.stage("analyze"):
+                work_on_pipeline_thread()
+            done.put(True)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    for _ in range(2):
+        profiler.start_tick()
+        work_on_tick_thread()
+        ticks.put(True)
+        done.get()
+        profiler.end_tick()
+    ticks.put(False)
+    thread.join()
+
+    prof = next(f for f in profiler.last_files if f.endswith(".prof"))
+    functions = {name for _, _, name in pstats.Stats(prof).stats}
+    assert {"work_on_tick_thread", "work_on_pipeline_thread"} <= functions
+    summary = next(f for f in profiler.last_files if f.endswith(".stages.json"))
+    with open(summary) as f:
+        summary = json.load(f)
+    assert summary["cprofile_threads"] == 2  # tick thread + worker
+    assert summary["cprofile_skipped"] == 0
+    assert summary["stages"]["analyze"]["count"] == 2
+
+
+def test_stage_outside_capture_starts_no_profile(tmp_path):
+    Caller = SimpleNamespace(market="BTC-USD", Scheduler=SimpleNamespace(interval=5))
+    profiler = Profiler(Caller, out_dir=str(tmp_path))
+    with profiler.stage("fetch"):
+        pass
+    assert profiler.capture is None
+    assert profiler.determine_status()["stages"]["fetch"]["count"] == 1
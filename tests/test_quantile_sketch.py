@@ -0,0 +1,105 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+from classes.HistoricalLoader import HistoricalLoader
+from classes.QuantileSketch import DDSketch
+from classes.SpreadSketches import create_sidecar_df
+from utils.local_s3 import LocalS3
+from utils.s3_paths import create_sketch_key
+
+QS = [0.01, 0.1, 0.5, 0.9, 0.99, 0.999]
+
+
+def assert_within_alpha(sketch: DDSketch, values: np.ndarray, alpha: float):
+    values = np.sort(values)
+    for q in QS:
+        exact = values[int(q * len(values))]  # the sketch's rank: q * count
+        assert abs(sketch.quantile(q) - exact) <= alpha * exact * 1.0001
+
+
+def test_relative_error_holds_after_merge():
+    rng = np.random.default_rng(1)
+    days = [rng.lognormal(-3, 1.5, 20_000) for _ in range(3)]
+    merged = DDSketch(alpha=0.01)
+    for values in days:
+        daily = DDSketch(alpha=0.01)
+        daily.add(values)
+        assert_within_alpha(daily, values, 0.01)
+        merged.merge(daily)
+    values = np.concatenate(days)
+    assert_within_alpha(merged, values, 0.01)
+    assert merged.count == len(values)
+    assert merged.min == values.min() and merged.max == values.max()
+    assert merged.mean() == pytest.approx(values.mean())
+
+
+def test_weighted_add_counts_like_repeats():
+    weighted, repeated = DDSketch(), DDSketch()
+    weighted.add([1.0, 2.0], weight=3)
+    weighted.add(10.0, weight=6)
+    repeated.add([1.0, 2.0] * 3 + [10.0] * 6)
+    assert weighted.count == repeated.count == 12
+    assert weighted.bins == repeated.bins
+    assert weighted.quantiles(QS) == repeated.quantiles(QS)
+    assert weighted.mean() == pytest.approx(repeated.mean())
+
+
+def test_zeros_nans_and_negatives():
+    sketch = DDSketch()
+    sketch.add([0.0, 0.0, np.nan, 5.0])
+    assert sketch.count == 3
+    assert sketch.quantile(0.5) == 0.0
+    with pytest.raises(ValueError):
+        sketch.add(-1.0)
+    assert DDSketch().quantile(0.5) is None
+
+
+def test_dict_round_trip():
+    sketch = DDSketch(alpha=0.02, max_bins=64)
+    sketch.add(np.linspace(0, 3, 500), weight=2)
+    restored = DDSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+    assert restored.bins == sketch.bins
+    assert (restored.zero, restored.count, restored.sum) == (
+        sketch.zero,
+        sketch.count,
+        sketch.sum,
+    )
+    assert (restored.min, restored.max) == (sketch.min, sketch.max)
+    assert restored.quantiles(QS) == sketch.quantiles(QS)
+    empty = DDSketch.from_dict(DDSketch().to_dict())
+    assert empty.count == 0 and empty.quantile(0.5) is None
+
+
+def test_collapsing_keeps_the_upper_quantiles():
+    values = np.logspace(-6, 3, 5000)
+    sketch = DDSketch(alpha=0.01, max_bins=100)
+    sketch.add(values)
+    assert len(sketch.bins) <= 100
+    for q in [0.99, 0.999]:
+        exact = values[int(q * len(values))]
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact * 1.0001
+
+
+def test_loader_merges_daily_sidecars(tmp_path):
+    s3 = LocalS3(str(tmp_path / "s3"))
+    rng = np.random.default_rng(2)
+    days = {"2024-01-02": rng.random(1000), "2024-01-03": rng.random(1000) + 1}
+    for date, values in days.items():
+        sketch = DDSketch()
+        sketch.add(values)
+        df = create_sidecar_df({("KRAKEN-COINBASE", "pct"): sketch})
+        key = create_sketch_key("BTC-USD", date)
+        s3.put_object(Bucket="arb", Key=key, Body=df.to_csv().encode())
+    loader = HistoricalLoader(
+        s3=s3, bucket="arb", cache_dir=str(tmp_path / "cache"), parse_workers=1
+    )
+    sketches = loader.load_spread_sketches("BTC-USD", *days)
+    merged = sketches[("KRAKEN-COINBASE", "pct")]
+    values = np.concatenate(list(days.values()))
+    assert merged.count == 2000
+    assert_within_alpha(merged, values, 0.01)
+    quantiles = loader.load_spread_quantiles("BTC-USD", *days)
+    assert quantiles.loc["KRAKEN-COINBASE", "count"] == 2000
+    assert "sketch" not in quantiles.columns
@@ -0,0 +1,82 @@
+import json, socket, urllib.request
+from types import SimpleNamespace
+import pandas as pd
+
+from classes.QueryServer import QueryServer
+from classes.QuoteStore import QuoteStore
+
+EXCHANGES = ["KRAKEN", "COINBASE"]
+START = pd.Timestamp("2024-01-02")
+
+
+def create_caller(tmp_path) -> SimpleNamespace:
+    store = QuoteStore(spill_dir=str(tmp_path), mode="full")
+    for i in range(10):
+        bid_asks = {}
+        for n, ex in enumerate(EXCHANGES):
+            mid = 100.0 + i + n
+            bid_asks[ex] = {
+                "timestamp": START + pd.Timedelta(seconds=5 * i),
+                "bid_price": mid - 0.5,
+                "ask_price": mid + 0.5,
+                "bid_size": 1.0,
+                "ask_size": 1.0,
+                "mid": mid,
+            }
+        store.append_tick(bid_asks, 5.0)
+    return SimpleNamespace(df_obj=store, diff_pairs=["KRAKEN-COINBASE"])
+
+
+def find_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_latest_and_range(tmp_path):
+    server = QueryServer(create_caller(tmp_path), port=0)
+    status, latest = server.handle_request("/latest")
+    assert status == 200
+    assert latest["KRAKEN"]["mid"] == 109.0
+    assert latest["COINBASE"]["mid"] == 110.0
+
+    start, end = START + pd.Timedelta(seconds=10), START + pd.Timedelta(seconds=25)
+    status, rows = server.handle_request(
+        f"/range?exchange=KRAKEN&start={start.isoformat()}&end={end.isoformat()}"
+    )
+    assert status == 200
+    assert [row["mid"] for row in rows] == [102.0, 103.0, 104.0]  # end excluded
+    status, rows = server.handle_request("/range?exchange=COINBASE")
+    assert len(rows) == 10
+
+
+def test_bad_requests(tmp_path):
+    server = QueryServer(create_caller(tmp_path), port=0)
+    status, payload = server.handle_request("/range")
+    assert status == 400
+    assert "exchange" in payload["error"]
+    assert server.handle_request("/nope")[0] == 404
+
+
+def test_serves_over_http(tmp_path):
+    server = QueryServer(create_caller(tmp_path), port=find_free_port())
+    server.start()
+    try:
+        url = f"http://127.0.0.1:{server.port}/spreads"
+        with urllib.request.urlopen(url, timeout=5) as res:
+            spreads = json.loads(res.read())
+        assert spreads["KRAKEN-COINBASE"]["abs"] == 1.0
+    finally:
+        server.stop()
+
+
+def test_taken_port_leaves_puller_running(tmp_path):
+    caller = create_caller(tmp_path)
+    first = QueryServer(caller, port=find_free_port())
+    first.start()
+    try:
+        second = QueryServer(caller, port=first.port)
+        second.start()  # must not raise
+        assert second.server is None
+    finally:
+        first.stop()
@@ -0,0 +1,77 @@
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+
+from classes.QuoteStore import MAX_DELTA_EXCHANGES, QuoteStore
+
+EXCHANGES = ["KRAKEN", "COINBASE", "BITSTAMP"]
+
+
+def create_tick(i: int) -> dict:
+    ts = pd.Timestamp("2024-01-02") + pd.Timedelta(seconds=i)
+    bid_asks = {}
+    for n, ex in enumerate(EXCHANGES):
+        mid = 100.0 + (i // (n + 1))  # exchange n changes every n+1 ticks
+        bid_asks[ex] = {
+            "timestamp": ts,
+            "bid_price": mid - 0.5,
+            "ask_price": mid + 0.5,
+            "bid_size": 1.0,
+            "ask_size": 1.0,
+            "mid": mid,
+        }
+    return bid_asks
+
+
+def fill(store: QuoteStore, ticks: int, start: int = 0) -> QuoteStore:
+    for i in range(start, start + ticks):
+        store.append_tick(create_tick(i), 1.0)
+    return store
+
+
+def test_delta_reads_match_full_store(tmp_path):
+    full = fill(QuoteStore(spill_dir=str(tmp_path), mode="full"), 50)
+    delta = fill(QuoteStore(spill_dir=str(tmp_path), mode="delta"), 50)
+    for ex in EXCHANGES:
+        assert delta.count_stored_rows(ex) <= full.count_stored_rows(ex)
+        expected = full.tail(ex, 10).reset_index(drop=True)
+        got = delta.tail(ex, 10).reset_index(drop=True)
+        pd.testing.assert_frame_equal(got[expected.columns], expected)
+        pd.testing.assert_frame_equal(delta[ex][expected.columns], full[ex])
+
+
+def test_presence_bits_follow_construction_order(tmp_path):
+    store = QuoteStore(spill_dir=str(tmp_path), mode="delta", exchanges=EXCHANGES)
+    assert store.bits == {"KRAKEN": 1, "COINBASE": 2, "BITSTAMP": 4}
+    fill(store, 4)
+    presence = store.tick_grid()["presence"].tolist()
+    # tick 0 stores all, then KRAKEN every tick, COINBASE every 2nd, BITSTAMP every 3rd
+    assert presence == [7, 1, 3, 5]
+
+
+def test_delta_store_rejects_too_many_exchanges(tmp_path):
+    many = [f"EX{i}" for i in range(MAX_DELTA_EXCHANGES + 1)]
+    with pytest.raises(ValueError):
+        QuoteStore(spill_dir=str(tmp_path), mode="delta", exchanges=many)
+    QuoteStore(spill_dir=str(tmp_path), mode="full", exchanges=many)
+    store = QuoteStore(spill_dir=str(tmp_path), mode="delta", exchanges=many[:-1])
+    assert store.bits[many[-2]] == 1 << 63
+
+
+def test_delta_tail_consistent_while_appending(tmp_path):
+    store = fill(QuoteStore(spill_dir=str(tmp_path), mode="delta"), 5)
+    done, failures = threading.Event(), []
+
+    def read():
+        while not done.is_set():
+            df = store.tail("BITSTAMP", 5)
+            if df["mid"].isna().any() or len(df) != 5:
+                failures.append(df)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    fill(store, 300, start=5)
+    done.set()
+    reader.join()
+    assert not failures
@@ -0,0 +1,70 @@
+import datetime as dt
+import threading
+from email.utils import format_datetime
+from types import SimpleNamespace
+import pytest
+
+import classes.RateLimiter as RL
+from classes.RateLimiter import RateLimiter, RateLimitExceeded, parse_retry_after
+
+
+def create_response(status: int = 200, headers=None):
+    return SimpleNamespace(status_code=status, headers=headers or {})
+
+
+def test_retry_after_in_secs_or_as_http_date():
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after(None) == 60
+    assert parse_retry_after("soon") == 60
+    later = dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=90)
+    assert 85 < parse_retry_after(format_datetime(later, usegmt=True)) <= 90
+    earlier = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=90)
+    assert parse_retry_after(format_datetime(earlier, usegmt=True)) == 0
+
+
+def test_429_with_http_date_blocks_the_venue():
+    limiter = RateLimiter({"BINANCE_GLOBAL": (100, 60)}, {"BINANCE_GLOBAL": 1})
+    later = dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=30)
+    headers = {"Retry-After": format_datetime(later, usegmt=True)}
+    limiter.update_from_response("BINANCE_GLOBAL", create_response(429, headers))
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire("BINANCE_GLOBAL", max_wait=1)
+    assert limiter.stats["BINANCE_GLOBAL"] == {"sent": 0, "throttled": 1, "429": 1}
+
+
+def test_reported_usage_is_scaled_like_the_capacity():
+    # declared 6000, we use 80% of it: 4800 tokens
+    limiter = RateLimiter({"BINANCE_GLOBAL": (4800, 60)}, {"BINANCE_GLOBAL": 1}, 0.8)
+    headers = {"X-MBX-USED-WEIGHT-1M": "3000"}  # half of the venue's limit used
+    limiter.update_from_response("BINANCE_GLOBAL", create_response(200, headers))
+    available = limiter.buckets["BINANCE_GLOBAL"].determine_available()
+    assert available == pytest.approx(2400, abs=5)  # half of ours left
+
+
+def test_stats_add_up_under_concurrent_acquires():
+    limiter = RateLimiter({"OKX": (1000, 1)}, {"OKX": 1})
+
+    def acquire_many():
+        for _ in range(100):
+            limiter.acquire("OKX", max_wait=5)
+
+    threads = [threading.Thread(target=acquire_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert limiter.stats["OKX"]["sent"] == 800
+
+
+def test_one_process_wide_instance(monkeypatch):
+    monkeypatch.setattr(RL, "_rate_limiter", None)
+    instances = []
+    threads = [
+        threading.Thread(target=lambda: instances.append(RL.get_rate_limiter()))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(i) for i in instances}) == 1
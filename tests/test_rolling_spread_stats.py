@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from classes.RollingSpreadStats import RollingSpreadStats
+
+WINDOW, MIN_PERIODS = 50, 10
+
+
+def create_stats(n_pairs: int = 2) -> RollingSpreadStats:
+    pairs = [f"A-B{i}" for i in range(n_pairs)]
+    return RollingSpreadStats(pairs, WINDOW, 20, MIN_PERIODS, percentiles=True)
+
+
+def create_spreads(ticks: int, offset: float = 0.0, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    x = offset + rng.normal(0, 0.01, (ticks, 2))
+    x[rng.random((ticks, 2)) < 0.1] = np.nan  # failed fetches
+    return x
+
+
+def test_window_stats_match_pandas_on_large_offsets():
+    x = create_spreads(500, offset=1e6)  # std 1e-8 of the value
+    stats = create_stats()
+    for row in x[:-1]:
+        stats.update(row)
+    z = stats.compute_zscores(x[-1])
+    window = pd.DataFrame(x[-WINDOW - 1 : -1])
+    mean, std = window.mean().values, window.std().values
+    np.testing.assert_allclose(z["win_mean"], mean, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(z["window"], (x[-1] - mean) / std, rtol=1e-5)
+
+
+def test_percentiles_match_a_full_window_compare():
+    x = create_spreads(300)
+    stats = create_stats()
+    for row in x:
+        with np.errstate(invalid="ignore"):
+            expected = (stats.ring < row).sum(axis=0) / stats.win_count * 100
+        pct = stats.compute_percentiles(row)
+        ready = (stats.win_count >= MIN_PERIODS) & ~np.isnan(row)
+        np.testing.assert_allclose(pct[ready], expected[ready])
+        assert np.isnan(pct[~ready]).all()
+        stats.update(row)
+
+
+def test_flat_window_is_not_ready_and_std_is_floored():
+    stats = create_stats()
+    for _ in range(WINDOW):
+        stats.update(np.array([0.1, 0.1]))
+    z = stats.compute_zscores(np.array([0.2, 0.2]))
+    assert np.isnan(z["window"]).all() and np.isnan(z["ew"]).all()
+
+    stats.update(np.array([0.1 + 1e-12, 0.1 + 1e-12]))  # barely moved
+    z = stats.compute_zscores(np.array([0.2, 0.2]), std_floor=np.array([0.01, np.nan]))
+    assert abs(z["window"][0]) < 11  # at most 0.1 / one tick of 0.01
+    assert abs(z["window"][1]) > 1e6  # no tick size known: epsilon floor only
@@ -0,0 +1,44 @@
+import datetime as dt
+from types import SimpleNamespace
+import pandas as pd
+
+from classes.AdaptiveScheduler import AdaptiveScheduler
+from classes.EodDiff import EodDiff
+
+START = dt.datetime(2024, 1, 2)
+
+
+def at(secs: float) -> dt.datetime:
+    return START + dt.timedelta(seconds=secs)
+
+
+def create_scheduler() -> AdaptiveScheduler:
+    Caller = SimpleNamespace(interval=5, exchanges=[], diff_pairs=[])
+    return AdaptiveScheduler(Caller, mode="adaptive")
+
+
+def test_row_weight_is_the_time_slept_before_it():
+    scheduler = create_scheduler()
+    scheduler.interval = 5
+    assert scheduler.determine_slept_interval(at(0)) == 5  # first tick
+    assert scheduler.determine_slept_interval(at(5)) == 5
+    scheduler.interval = 20  # ladder stepped up: next grid point of 20s is 20
+    assert scheduler.determine_slept_interval(at(20)) == 15
+    assert scheduler.determine_slept_interval(at(40)) == 20
+    scheduler.interval = 5  # stepped down
+    assert scheduler.determine_slept_interval(at(45)) == 5
+    assert scheduler.determine_slept_interval(at(55)) == 10  # missed a tick
+
+
+def test_outages_are_capped_at_the_slowest_rung():
+    scheduler = create_scheduler()
+    scheduler.determine_slept_interval(at(0))
+    assert scheduler.determine_slept_interval(at(3600)) == max(scheduler.ladder)
+
+
+def test_eod_summary_reports_the_effective_interval():
+    eod = EodDiff(SimpleNamespace(interval=5))
+    index = pd.to_datetime([at(0), at(5), at(10), at(30), at(50)])
+    df = pd.DataFrame({"x": range(5)}, index=index)
+    assert eod.compute_mean_interval(df) == 12.5
+    assert eod.compute_mean_interval(df.iloc[:1]) == 5
@@ -0,0 +1,113 @@
+import threading, time
+from io import BytesIO
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+
+from classes.SaveRawData import SaveRawData
+from classes.ShardMerger import ShardMerger
+from classes.SinkPipeline import SinkPipeline
+from classes.SpreadSketches import SpreadSketches
+from utils.local_s3 import LocalS3
+from utils.s3_paths import create_raw_key
+from utils.sinks import S3Sink
+
+MARKET, TODAY = "BTC-USD", "2024-01-02"
+EXCHANGES = ["KRAKEN", "COINBASE"]
+FLOOR, COUNT = 5, 2
+
+
+class RecordingEodDiff:
+    def __init__(self):
+        self.calls = []
+
+    def determine_eod_diff_n_create_summary(self, df_obj, today, *args):
+        self.calls.append((df_obj, today, args))
+
+
+def create_day(secs: list) -> pd.DataFrame:
+    start = pd.Timestamp(f"{TODAY} 00:00:00")
+    mids = 100 + np.arange(len(secs), dtype=float)
+    return pd.DataFrame(
+        {
+            "timestamp": [start + pd.Timedelta(seconds=s) for s in secs],
+            "bid_price": mids - 0.5,
+            "ask_price": mids + 0.5,
+            "bid_size": 1.0,
+            "ask_size": 1.0,
+            "mid": mids,
+            "interval": float(FLOOR),
+        }
+    )
+
+
+def create_shard(s3, index: int, secs: list) -> ShardMerger:
+    Caller = SimpleNamespace(
+        market=MARKET,
+        exchanges=EXCHANGES,
+        diff_pairs=["KRAKEN-COINBASE"],
+        Scheduler=SimpleNamespace(ladder=[FLOOR, 2 * FLOOR]),
+        Sinks=SinkPipeline([S3Sink(s3, "arb", 2)], encoding="gzip"),
+        ExecutableSpreads=SimpleNamespace(day_stats={"ticks": 0}),
+        EodDiff=RecordingEodDiff(),
+        df_obj={ex: create_day(secs) for ex in EXCHANGES},
+    )
+    Caller.SaveRawData = SaveRawData(Caller)
+    Caller.SpreadSketches = SpreadSketches(Caller)
+    Caller.Shards = ShardMerger(Caller, count=COUNT, index=index, wait=10)
+    Caller.Shards.POLL_SECS = 0.05
+    return Caller.Shards
+
+
+def test_phase_offset_is_based_on_the_floor_interval():
+    s3 = SimpleNamespace()
+    shard = create_shard(s3, 1, [])
+    assert shard.determine_phase_offset() == FLOOR / COUNT
+    shard.Caller.Scheduler.ladder = [FLOOR, 2 * FLOOR, 4 * FLOOR]
+    assert shard.determine_phase_offset() == FLOOR / COUNT
+
+
+def test_two_shards_merge_into_an_ordered_deduplicated_day(tmp_path):
+    s3 = LocalS3(str(tmp_path))
+    own = [0, 5, 10, 15, 20, 30]  # adaptive: skipped 25 on a slower rung
+    other = [27.5, 2.5, 7.5, 10.1, 12.5, 17.5]  # 10.1: same slot as 10
+    shard0 = create_shard(s3, 0, own)
+    shard1 = create_shard(s3, 1, other)
+
+    shard0.save_shard_n_merge(TODAY)
+    assert shard0.merging.is_alive()  # waits for shard 1 in the background
+    time.sleep(0.2)
+    shard1.save_shard_n_merge(TODAY)
+    assert shard1.merging is None
+    assert shard0.wait_for_merge(timeout=10)
+    shard0.Caller.Sinks.flush()
+
+    for exchange in EXCHANGES:
+        key = create_raw_key(exchange, MARKET, TODAY)
+        body = shard0.Caller.Sinks.read(key)
+        df = pd.read_csv(BytesIO(body), index_col="timestamp", parse_dates=True)
+        secs = (df.index - pd.Timestamp(f"{TODAY} 00:00:00")).total_seconds()
+        expected = [0, 2.5, 5, 7.5, 10, 12.5, 15, 17.5, 20, 27.5, 30]
+        assert list(secs) == expected
+        assert df.index.is_monotonic_increasing and df.index.is_unique
+        assert df.loc[df.index[4], "mid"] == 102  # shard 0's row of the dup slot
+    assert shard0.last_merge["duplicates"] == {ex: 1 for ex in EXCHANGES}
+    ((df_obj, today, _),) = shard0.Caller.EodDiff.calls
+    assert today == TODAY and len(df_obj["KRAKEN"]) == 11
+    assert shard1.Caller.EodDiff.calls == []
+
+
+def test_merge_thread_keeps_the_day_when_the_caller_resets(tmp_path):
+    s3 = LocalS3(str(tmp_path))
+    shard0 = create_shard(s3, 0, [0, 5])
+    shard1 = create_shard(s3, 1, [2.5])
+    day_stats = shard0.Caller.ExecutableSpreads.day_stats
+    shard0.save_shard_n_merge(TODAY)
+    shard0.Caller.SpreadSketches.reset_day()  # next day started meanwhile
+    shard0.Caller.ExecutableSpreads.day_stats = {"ticks": 0}
+    shard1.save_shard_n_merge(TODAY)
+    assert shard0.wait_for_merge(timeout=10)
+    ((df_obj, _, (sketches, stats)),) = shard0.Caller.EodDiff.calls
+    assert stats is day_stats
+    assert sketches.sketches is not shard0.Caller.SpreadSketches.sketches
+    assert len(df_obj["COINBASE"]) == 3
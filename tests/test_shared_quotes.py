@@ -0,0 +1,105 @@
+import datetime as dt
+import os, subprocess, sys, threading
+from types import SimpleNamespace
+import numpy as np
+import pytest
+
+from classes.SharedQuotes import (
+    QUOTE_FIELDS,
+    SharedQuotePublisher,
+    SharedQuoteReader,
+)
+
+EXCHANGES = ["KRAKEN", "COINBASE", "BITSTAMP"]
+START = dt.datetime(2024, 1, 2)
+
+
+@pytest.fixture
+def prefix():
+    return f"arbqtest{os.getpid()}_"
+
+
+def create_bid_asks(tick: int) -> dict:
+    bid_asks = {}
+    for i, ex in enumerate(EXCHANGES):
+        bid_ask = {f: tick * 10.0 + i + 1 for f in QUOTE_FIELDS}
+        bid_ask["timestamp"] = START + dt.timedelta(seconds=tick)
+        bid_asks[ex] = bid_ask
+    return bid_asks
+
+
+def create_publisher(prefix: str) -> SharedQuotePublisher:
+    Caller = SimpleNamespace(market="BTC-USD", exchanges=EXCHANGES)
+    return SharedQuotePublisher(Caller, mode="on", prefix=prefix)
+
+
+def test_readers_never_see_a_torn_tick(prefix):
+    publisher = create_publisher(prefix)
+    reader = SharedQuoteReader("BTC-USD", prefix=prefix)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads as often as possible
+    try:
+        done, reads = threading.Event(), []
+
+        def read():
+            while not done.is_set():
+                reads.append(reader.read(timeout=5))
+
+        threads = [threading.Thread(target=read) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for tick in range(1, 3001):
+            publisher.publish(create_bid_asks(tick))
+        done.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    start = START.replace(tzinfo=dt.timezone.utc).timestamp()
+    published = [snap for snap in reads if snap["ticks"] > 0]
+    assert published
+    for snap in published:
+        tick = snap["ticks"]
+        mids = tick * 10.0 + np.arange(1, len(EXCHANGES) + 1)
+        expected = np.repeat(mids[:, None], len(QUOTE_FIELDS), axis=1)
+        np.testing.assert_array_equal(snap["quotes"], expected)
+        spreads = (mids[:, None] - mids[None, :]) / ((mids[:, None] + mids) / 2) * 100
+        np.testing.assert_allclose(snap["spreads"], spreads)
+        assert snap["tick_ts"] == start + tick
+        assert snap["seq"] == 2 * tick
+    reader.close()
+    publisher.close()
+
+
+def test_live_segment_is_not_taken_over(prefix):
+    publisher = create_publisher(prefix)
+    try:
+        with pytest.raises(RuntimeError, match="running pid"):
+            create_publisher(prefix)
+        publisher.publish(create_bid_asks(1))  # the first one keeps publishing
+        reader = SharedQuoteReader("BTC-USD", prefix=prefix)
+        assert reader.read()["ticks"] == 1
+        reader.close()
+    finally:
+        publisher.close()
+
+
+def test_segment_of_a_dead_pid_is_replaced(prefix):
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    crashed = create_publisher(prefix)
+    crashed.publish(create_bid_asks(5))
+    crashed.header[0]["pid"] = dead.pid
+    crashed.header = crashed.names = crashed.quotes = crashed.spreads = None
+    crashed.shm.close()  # gone without unlinking, like a crash
+    crashed.shm = None
+
+    publisher = create_publisher(prefix)
+    try:
+        reader = SharedQuoteReader("BTC-USD", prefix=prefix)
+        snap = reader.read()
+        assert snap["ticks"] == 0  # a fresh segment
+        assert np.isnan(snap["quotes"]).all()
+        reader.close()
+    finally:
+        publisher.close()
@@ -0,0 +1,108 @@
+import time
+from io import BytesIO
+import pandas as pd
+import pytest
+
+from classes.SinkPipeline import SinkPipeline
+from utils.local_s3 import LocalS3
+from utils.sinks import S3Sink
+
+
+def create_df(i: int) -> pd.DataFrame:
+    index = pd.date_range("2024-01-02", periods=50, freq="5s", name="timestamp")
+    return pd.DataFrame({"mid": range(i, i + 50)}, index=index)
+
+
+def read_df(body: bytes) -> pd.DataFrame:
+    return pd.read_csv(BytesIO(body), index_col="timestamp", parse_dates=True)
+
+
+# =============================================================================
+# LocalS3 whose puts take a while and get answered wrong on request
+# =============================================================================
+class FlakyS3(LocalS3):
+    def __init__(self, root: str, delay: float = 0, bad_etags: int = 0):
+        super().__init__(root)
+        self.delay = delay
+        self.bad_etags = bad_etags  # first n puts answer with a wrong ETag
+        self.corrupt = 0  # first n puts send a body that doesn't match its md5
+        self.running, self.max_running = 0, 0
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            corrupt = self.corrupt > 0
+            self.corrupt -= corrupt
+            bad_etag = self.bad_etags > 0
+            self.bad_etags -= bad_etag
+        try:
+            time.sleep(self.delay)
+            body = Body + b"x" if corrupt else Body
+            res = super().put_object(Bucket, Key, body, **kwargs)
+        finally:
+            with self.lock:
+                self.running -= 1
+        if bad_etag:
+            res["ETag"] = '"' + "0" * 32 + '"'
+        return res
+
+
+def create_pipeline(s3, workers=4, retries=2, encoding="gzip") -> SinkPipeline:
+    return SinkPipeline(
+        [S3Sink(s3, "arb", workers)], encoding=encoding, retries=retries
+    )
+
+
+@pytest.mark.parametrize("encoding", ["none", "gzip"])
+def test_uploads_run_concurrently_and_read_back(tmp_path, encoding):
+    s3 = FlakyS3(str(tmp_path), delay=0.05)
+    sinks = create_pipeline(s3, encoding=encoding)
+    jobs = [(f"Raw/obj{i}.csv", create_df(i)) for i in range(16)]
+    sinks.submit_dfs(jobs)
+    assert sinks.flush(timeout=10)
+    assert s3.max_running > 1
+    for key, df in jobs:
+        pd.testing.assert_frame_equal(read_df(sinks.read(key)), df, check_freq=False)
+    metrics = sinks.determine_metrics()["s3"]
+    assert metrics["written"] == 16 and metrics["failed"] == 0
+    assert sinks.failed == []
+
+
+def test_content_md5_mismatch_is_retried(tmp_path):
+    s3 = FlakyS3(str(tmp_path))
+    s3.corrupt = 1  # S3 rejects the body: BadDigest
+    sinks = create_pipeline(s3, workers=1)
+    sinks.submit_df("Raw/obj.csv", create_df(0))
+    assert sinks.flush(timeout=10)
+    (report,) = sinks.determine_reports("Raw/obj.csv")
+    assert report["ok"] and report["attempts"] == 2
+    assert sinks.determine_metrics()["s3"]["retries"] == 1
+    assert read_df(sinks.read("Raw/obj.csv"))["mid"].iloc[-1] == 49
+
+
+def test_etag_mismatch_is_retried_until_out_of_retries(tmp_path):
+    s3 = FlakyS3(str(tmp_path), bad_etags=5)
+    sinks = create_pipeline(s3, workers=1, retries=1)
+    sinks.submit_df("Raw/obj.csv", create_df(0))
+    assert sinks.flush(timeout=10)
+    (report,) = sinks.determine_reports()
+    assert not report["ok"] and report["attempts"] == 2
+    assert report["error"].startswith("Checksum mismatch")
+    assert sinks.failed == [("s3", "Raw/obj.csv")]
+    assert s3.calls["put_object"] == 2
+
+
+def test_report_per_object(tmp_path):
+    s3 = FlakyS3(str(tmp_path))
+    sinks = create_pipeline(s3)
+    sinks.submit_dfs([("Raw/a.csv", create_df(0)), ("Raw/b.csv", create_df(1))])
+    assert sinks.flush(timeout=10)
+    reports = {r["key"]: r for r in sinks.determine_reports()}
+    assert set(reports) == {"Raw/a.csv", "Raw/b.csv"}
+    report = reports["Raw/a.csv"]
+    assert report["ok"] and report["attempts"] == 1 and report["error"] is None
+    assert report["sink"] == "s3" and report["encoding"] == "gzip"
+    assert report["bytes"] < report["raw_bytes"]
+    etag = s3.head_object(Bucket="arb", Key="Raw/a.csv")["ETag"].strip('"')
+    assert report["md5"] == etag
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from classes.SpreadBars import create_bars
+
+
+def create_wide() -> pd.DataFrame:
+    rng = np.random.default_rng(6)
+    index = pd.date_range("2024-01-02", periods=15 * 12, freq="5s")
+    index = index[(index < "2024-01-02 00:02") | (index >= "2024-01-02 00:03")]
+    wide = pd.DataFrame(
+        {
+            "KRAKEN": 100 + rng.normal(0, 1, len(index)).cumsum(),
+            "KRAKEN-COINBASE": rng.random(len(index)),
+        },
+        index=index,
+    )
+    wide.iloc[::7, 1] = np.nan  # spreads missing on some ticks
+    return wide
+
+
+def create_expected(series: pd.Series, rule: str) -> pd.DataFrame:
+    resampled = series.resample(rule)
+    expected = resampled.ohlc()
+    expected["count"] = resampled.count()
+    return expected[expected["count"] > 0]
+
+
+@pytest.mark.parametrize("resolution", ["1min", "5min"])
+def test_bars_match_pandas_resample(resolution):
+    wide = create_wide()
+    bars = create_bars(wide, ["mid", "spread"], ["1min", "5min"])[resolution]
+    for name, kind in [("KRAKEN", "mid"), ("KRAKEN-COINBASE", "spread")]:
+        got = bars[bars["name"] == name]
+        assert (got["kind"] == kind).all()
+        expected = create_expected(wide[name], resolution)
+        pd.testing.assert_frame_equal(
+            got[["open", "high", "low", "close", "count"]],
+            expected,
+            check_names=False,
+            check_freq=False,
+        )
+
+
+def test_gap_buckets_are_absent():
+    bars = create_bars(create_wide(), ["mid", "spread"], ["1min", "5min"])["1min"]
+    gap = pd.Timestamp("2024-01-02 00:02")
+    assert gap not in bars.index
+    assert (bars["count"] > 0).all()
+    assert len(bars) == 2 * 14  # 15 minutes minus the gap, two series
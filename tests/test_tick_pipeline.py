@@ -0,0 +1,118 @@
+import threading, time
+import pandas as pd
+
+from ArbDataPuller import ArbDataPuller
+from classes.Profiler import Profiler
+from classes.QuoteStore import QuoteStore
+from classes.TickPipeline import Stage, TickPipeline
+
+
+def create_tick(i: int) -> dict:
+    return {"i": i, "fetched": time.monotonic()}
+
+
+class GatedRun:
+    def __init__(self):
+        self.gate = threading.Event()
+        self.entered = threading.Event()
+        self.seen = []
+
+    def __call__(self, tick: dict):
+        self.entered.set()
+        self.gate.wait(5)
+        self.seen.append(tick["i"])
+
+
+def wait_until_idle(stage: Stage):
+    deadline = time.monotonic() + 5
+    while stage.check_if_busy() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_full_drop_oldest_queue_drops_the_oldest_tick():
+    run = GatedRun()
+    stage = Stage("analyze", run, "drop_oldest")
+    stage.start(queue_size=2)
+    stage.submit(create_tick(1))
+    assert run.entered.wait(5)  # worker holds tick 1, the queue is empty
+    for i in [2, 3, 4]:
+        stage.submit(create_tick(i))  # 4 pushes out 2
+    run.gate.set()
+    wait_until_idle(stage)
+    assert run.seen == [1, 3, 4]
+    metrics = stage.determine_metrics()
+    assert metrics["dropped"] == 1
+    assert metrics["submitted"] == 4
+    assert metrics["processed"] == 3
+
+
+def test_full_block_queue_blocks_instead_of_dropping():
+    run = GatedRun()
+    stage = Stage("store", run, "block")
+    stage.start(queue_size=1)
+    stage.submit(create_tick(1))
+    assert run.entered.wait(5)
+    stage.submit(create_tick(2))  # fills the queue
+    blocked = threading.Thread(target=stage.submit, args=(create_tick(3),))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()  # waits for room
+    run.gate.set()
+    blocked.join(5)
+    wait_until_idle(stage)
+    assert run.seen == [1, 2, 3]
+    metrics = stage.determine_metrics()
+    assert metrics["dropped"] == 0
+    assert metrics["blocked_secs"] >= 0.15
+
+
+class FakePuller:
+    update_df_obj_with_new_bid_ask_data = (
+        ArbDataPuller.update_df_obj_with_new_bid_ask_data
+    )
+    handle_midnight_event = ArbDataPuller.handle_midnight_event
+
+    def __init__(self, tmp_path):
+        self.market = "BTC-USD"
+        self.today = "2024-01-02"
+        self.df_obj = QuoteStore(spill_dir=str(tmp_path), mode="full")
+        self.Scheduler = type("Scheduler", (), {"interval": 5})
+        self.Profiler = Profiler(self)
+        self.SharedQuotes = self
+        self.FrozenOrderbook = self
+        self.ExecutableSpreads = self
+        self.SpreadSketches = self
+        self.Discord = self
+        self.rows_at_eod = None
+
+    def publish(self, bid_asks):
+        time.sleep(0.002)  # the store stage falls behind the tick thread
+
+    def check_all_orderbooks_if_frozen(self):
+        pass
+
+    def update(self, bid_asks, interval=None):
+        pass
+
+    def determine_exchange_diff_and_alert_discord(self, bid_asks):
+        pass
+
+    def save_raw_data_n_eod_diff(self):
+        self.rows_at_eod = self.df_obj.count_rows("KRAKEN")
+
+    def reset_for_new_day(self):
+        pass
+
+
+def test_midnight_drains_the_pipeline_before_eod(tmp_path):
+    puller = FakePuller(tmp_path)
+    puller.Pipeline = TickPipeline(puller, mode="staged", queue_size=4)
+    start = pd.Timestamp("2024-01-02")
+    for i in range(50):
+        bid_ask = {"timestamp": start + pd.Timedelta(seconds=i), "mid": 100.0 + i}
+        puller.Pipeline.submit({"KRAKEN": bid_ask}, 1.0)
+    puller.handle_midnight_event()
+    assert puller.rows_at_eod == 50
+    metrics = puller.Pipeline.determine_metrics()["stages"]
+    assert metrics["store"]["dropped"] == 0
+    assert metrics["analyze"]["processed"] + metrics["analyze"]["dropped"] == 50
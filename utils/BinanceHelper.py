@@ -1,14 +1,12 @@
 # =============================================================================
 # IMPORTS
 # =============================================================================
-import requests
 from pprint import pprint
 
 # =============================================================================
-# CONSTANTS
+# FILE IMPORTS
 # =============================================================================
-# from utils.constants import BINANCE_GLOBAL_BASEURL
-BINANCE_GLOBAL_BASEURL = "https://api.binance.com/api/v3"
+from classes.InstrumentMetadata import get_instrument_metadata
 
 # =============================================================================
 # HELPER CLASS TO GET TOKEN INFO
@@ -16,26 +14,23 @@ BINANCE_GLOBAL_BASEURL = "https://api.binance.com/api/v3"
 class BinanceHelper:
     def __init__(self, token):
         self.token = token
+        self.Metadata = get_instrument_metadata()
+        self.Metadata.refresh_if_stale(["BINANCE_GLOBAL"])
 
     # =============================================================================
-    # GET INFO FOR A SPECIFIC TOKEN
+    # GET INFO FOR A SPECIFIC TOKEN (from the cached exchangeInfo)
     # =============================================================================
     def get_ticksize_from_binance(self):
-        res = requests.get(f"{BINANCE_GLOBAL_BASEURL}/exchangeInfo").json()
-        info = res["symbols"]
-        for symbol in info:
-            if symbol["symbol"] == self.token:
-                pprint(symbol)
-                for filt in symbol["filters"]:
-                    if filt["filterType"] == "PRICE_FILTER":
-                        tick_size = float(filt["tickSize"])
-        return tick_size
+        info = self.Metadata.get("BINANCE_GLOBAL", self.token)
+        pprint(info)
+        return info["tick"]
 
     # =============================================================================
     # COMPUTE DIFFERENCE BETWEEN BID AND ASK
     # =============================================================================
     def tick_diff(self, token, bid, ask):
-        ticks = round((ask - bid) / self.order_params[token]["price_rounder"], 3)
+        tick_size = self.Metadata.get_tick_size("BINANCE_GLOBAL", token)
+        ticks = round((ask - bid) / tick_size, 3)
         return abs(ticks)
 
 
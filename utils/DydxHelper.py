@@ -1,21 +1,23 @@
 # =============================================================================
 # IMPORTS
 # =============================================================================
-import requests
+import sys
+from classes.InstrumentMetadata import get_instrument_metadata
 
 # =============================================================================
 # Class to check orderbook diff between bid and ask
 # =============================================================================
 class DydxHelper:
     # =============================================================================
-    # Get tick size from dydx to check for lose orderbook
+    # Get tick size from dydx to check for lose orderbook (cached markets)
     # =============================================================================
-    def get_ticksize_from_dydx(self):
-        res = requests.get("https://api.dydx.exchange/v3/markets")
-        res = res.json()["markets"]["XYZ"]
-        return float(res["tickSize"])
+    def get_ticksize_from_dydx(self, market: str):
+        metadata = get_instrument_metadata()
+        metadata.refresh_if_stale(["DYDX"])
+        return metadata.get_tick_size("DYDX", market)
 
 
 if __name__ == "__main__":
+    # python -m utils.DydxHelper BTC-USD
     obj = DydxHelper()
-    print(obj.get_ticksize_from_dydx())
+    print(obj.get_ticksize_from_dydx(sys.argv[1]))
@@ -0,0 +1,43 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import gzip
+
+try:
+    import zstandard  # optional, falls back to gzip
+except ImportError:
+    zstandard = None
+
+
+# =============================================================================
+# Encoding that will actually be used (zstd needs the zstandard package)
+# =============================================================================
+def determine_encoding(encoding: str) -> str:
+    if encoding == "zstd" and zstandard is None:
+        print("zstandard not installed, compressing with gzip instead.")
+        return "gzip"
+    return encoding
+
+
+# =============================================================================
+# Compress body for the given Content-Encoding ("gzip", "zstd", "none")
+# =============================================================================
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    return body
+
+
+# =============================================================================
+# Undo Content-Encoding of a downloaded body
+# =============================================================================
+def decompress(body: bytes, encoding) -> bytes:
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "zstd":
+        if zstandard is None:
+            raise Exception("zstd encoded object, install zstandard to read it.")
+        return zstandard.ZstdDecompressor().decompress(body)
+    return body
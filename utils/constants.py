@@ -7,15 +7,262 @@ import os, boto3
 # CONSTANTS
 # =============================================================================
 BUCKET_NAME = "arb-live-data"
-DYDX_BASEURL = "https://api.dydx.exchange/v3"  # NO "/" AT THE END!!!
-OKX_BASEURL = "https://www.okx.com/"
-BINANCE_US_BASEURL = "https://api.binance.us/api/v3/depth?"
-BINANCE_GLOBAL_BASEURL = "https://api.binance.com/api/v3"
-COINBASE_BASEURL = "https://api.exchange.coinbase.com/products/"
-DISCORD_URL = "https://discord.com/api/webhooks/1028097581303205999/1UtTckX8MRHY9JwY4IibOL_syhB7mXEKUysNF3ZUxrHwK05vY77lyeGNUCPvIPvSovZj"
-DISCORD_PERSONAL = "https://discord.com/api/webhooks/1067057378874359890/Ehg1wOlHzvuUQVQnlqnh6akLhwkFVM62C77cv1ItyOQQ7J8uxRYKAmfsZkAfIQGfkJGb"
+# Base urls can be pointed elsewhere via env, e.g. the soak test mock server
+DYDX_BASEURL = os.getenv(
+    "DYDX_BASEURL", "https://api.dydx.exchange/v3"
+)  # NO "/" AT THE END!!!
+OKX_BASEURL = os.getenv("OKX_BASEURL", "https://www.okx.com/")
+BINANCE_US_BASEURL = os.getenv(
+    "BINANCE_US_BASEURL", "https://api.binance.us/api/v3/depth?"
+)
+BINANCE_US_API_URL = os.getenv("BINANCE_US_API_URL", "https://api.binance.us/api/v3")
+BINANCE_GLOBAL_BASEURL = os.getenv(
+    "BINANCE_GLOBAL_BASEURL", "https://api.binance.com/api/v3"
+)
+COINBASE_BASEURL = os.getenv(
+    "COINBASE_BASEURL", "https://api.exchange.coinbase.com/products/"
+)
+DISCORD_URL = os.getenv(
+    "DISCORD_URL",
+    "https://discord.com/api/webhooks/1028097581303205999/1UtTckX8MRHY9JwY4IibOL_syhB7mXEKUysNF3ZUxrHwK05vY77lyeGNUCPvIPvSovZj",
+)
+DISCORD_PERSONAL = os.getenv(
+    "DISCORD_PERSONAL",
+    "https://discord.com/api/webhooks/1067057378874359890/Ehg1wOlHzvuUQVQnlqnh6akLhwkFVM62C77cv1ItyOQQ7J8uxRYKAmfsZkAfIQGfkJGb",
+)
 SECS_PER_HOUR = 60 * 60
 
+# =============================================================================
+# QUOTE STORE (intraday memory budget, older chunks spill to disk)
+# =============================================================================
+QUOTE_STORE_MAX_MB = float(os.getenv("QUOTE_STORE_MAX_MB", 64))
+QUOTE_STORE_CHUNK_ROWS = int(os.getenv("QUOTE_STORE_CHUNK_ROWS", 4096))
+QUOTE_STORE_SPILL_DIR = os.getenv("QUOTE_STORE_SPILL_DIR", "spill")
+QUOTE_STORE_MODE = os.getenv("QUOTE_STORE_MODE", "full")  # "delta": changes only
+
+# =============================================================================
+# LOCAL QUERY SERVER (read-only, port 0 disables it). Pullers started from the
+# command line count up from this port: SHARD_INDEX * markets + market number
+# =============================================================================
+QUERY_SERVER_HOST = os.getenv("QUERY_SERVER_HOST", "127.0.0.1")
+QUERY_SERVER_PORT = int(os.getenv("QUERY_SERVER_PORT", 8765))
+
+# =============================================================================
+# HISTORICAL LOADER (local LRU cache of S3 objects)
+# =============================================================================
+LOADER_CACHE_DIR = os.getenv("LOADER_CACHE_DIR", os.path.expanduser("~/.arb_cache"))
+LOADER_CACHE_MAX_MB = float(os.getenv("LOADER_CACHE_MAX_MB", 2048))
+LOADER_FETCH_WORKERS = int(os.getenv("LOADER_FETCH_WORKERS", 16))
+LOADER_PARSE_WORKERS = int(os.getenv("LOADER_PARSE_WORKERS", os.cpu_count() or 1))
+
+# =============================================================================
+# DISCORD ALERT MODE: "static" (ratcheting threshold) or "zscore" (rolling stats)
+# =============================================================================
+ALERT_MODE = os.getenv("ALERT_MODE", "static")
+ZSCORE_WINDOW = int(os.getenv("ZSCORE_WINDOW", 720))  # ticks
+ZSCORE_HALFLIFE = float(os.getenv("ZSCORE_HALFLIFE", 120))  # ticks
+ZSCORE_MIN_PERIODS = int(os.getenv("ZSCORE_MIN_PERIODS", 60))  # ticks
+ZSCORE_ALERT_Z = float(os.getenv("ZSCORE_ALERT_Z", 4))
+ZSCORE_ALERT_PERCENTILE = float(os.getenv("ZSCORE_ALERT_PERCENTILE", 0))  # 0 = off
+ZSCORE_ALERT_COOLDOWN = int(os.getenv("ZSCORE_ALERT_COOLDOWN", 15 * 60))  # secs
+
+# =============================================================================
+# INSTRUMENT METADATA (tick/lot sizes of all symbols, cached on disk).
+# A book is loose if its spread exceeds the pct limit AND MAX_SPREAD_TICKS
+# ticks, so 1-2 tick spreads on coarse tick grids aren't flagged.
+# =============================================================================
+INSTRUMENT_CACHE_PATH = os.getenv(
+    "INSTRUMENT_CACHE_PATH", os.path.join(LOADER_CACHE_DIR, "instruments.json")
+)
+INSTRUMENT_CACHE_TTL = float(os.getenv("INSTRUMENT_CACHE_TTL", 6 * 60 * 60))  # secs
+INSTRUMENT_REQUEST_WEIGHTS = {
+    "BINANCE_GLOBAL": 20,  # exchangeInfo without symbol
+    "BINANCE_US": 10,
+    "OKX": 1,
+    "DYDX": 1,
+    "COINBASE": 1,
+}
+INSTRUMENT_RATE_LIMIT_WAIT = 30  # secs, refreshes run in the background
+MAX_SPREAD_TICKS = int(os.getenv("MAX_SPREAD_TICKS", 3))
+
+# =============================================================================
+# EXECUTABLE SPREADS: buy one venue's asks, sell another's bids, walking
+# DEPTH_LEVELS levels for each notional in EXEC_SIZES (quote currency)
+# =============================================================================
+DEPTH_LEVELS = int(os.getenv("DEPTH_LEVELS", 10))
+EXEC_SIZES = [float(s) for s in os.getenv("EXEC_SIZES", "1000,10000,50000").split(",")]
+EXEC_ALERT_PCT = float(os.getenv("EXEC_ALERT_PCT", 0))  # 0 = off
+EXEC_ALERT_COOLDOWN = int(os.getenv("EXEC_ALERT_COOLDOWN", 15 * 60))  # secs
+
+# =============================================================================
+# SAMPLING: "fixed" (user interval) or "adaptive" (floor * 2^k up to ceiling)
+# =============================================================================
+SAMPLING_MODE = os.getenv("SAMPLING_MODE", "fixed")
+ADAPTIVE_FLOOR_SECS = int(os.getenv("ADAPTIVE_FLOOR_SECS", 5))
+ADAPTIVE_CEILING_SECS = int(os.getenv("ADAPTIVE_CEILING_SECS", 80))
+ADAPTIVE_VOL_HIGH = float(os.getenv("ADAPTIVE_VOL_HIGH", 0.02))  # pct per tick
+ADAPTIVE_VOL_LOW = float(os.getenv("ADAPTIVE_VOL_LOW", 0.005))  # pct per tick
+ADAPTIVE_CHANGE_RATE_HIGH = float(os.getenv("ADAPTIVE_CHANGE_RATE_HIGH", 0.75))
+ADAPTIVE_CALM_TICKS = int(os.getenv("ADAPTIVE_CALM_TICKS", 12))
+
+# =============================================================================
+# SPREAD SKETCHES: relative accuracy of the per pair DDSketches and the
+# quantiles reported at EOD
+# =============================================================================
+SKETCH_ALPHA = float(os.getenv("SKETCH_ALPHA", 0.01))
+SKETCH_QUANTILES = [
+    float(q) for q in os.getenv("SKETCH_QUANTILES", "0.5,0.9,0.99,0.999").split(",")
+]
+
+# =============================================================================
+# LEAD-LAG: EOD cross-correlation of mid returns between all exchange pairs,
+# lags up to LEADLAG_MAX_LAG secs either way
+# =============================================================================
+LEADLAG_MAX_LAG = float(os.getenv("LEADLAG_MAX_LAG", 60))  # secs
+
+# =============================================================================
+# BARS: EOD OHLC + count bars of exchange mids & pair spreads, one object per
+# resolution (pandas offsets, finest first, each a multiple of the first)
+# =============================================================================
+BAR_RESOLUTIONS = os.getenv("BAR_RESOLUTIONS", "1min,5min,1h").split(",")
+
+# =============================================================================
+# SHARDS: SHARD_COUNT instances sample the same markets, instance SHARD_INDEX
+# offset by SHARD_INDEX / SHARD_COUNT of the floor interval. Every instance
+# saves its shard at EOD, shard 0 waits up to SHARD_WAIT secs for the others
+# (in the background), merges them into the day's raw data and runs the diffs. SHARD_SHARED_IP
+# "on" splits the rate limits between instances behind the same IP.
+# =============================================================================
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", 1))
+SHARD_INDEX = int(os.getenv("SHARD_INDEX", 0))
+SHARD_WAIT = float(os.getenv("SHARD_WAIT", 5 * 60))
+SHARD_SHARED_IP = os.getenv("SHARD_SHARED_IP", "off")
+
+# =============================================================================
+# RATE LIMITS: (capacity, period in secs) per exchange, scaled by a safety
+# factor. REQUEST_WEIGHTS: weight of one orderbook request on that venue.
+# =============================================================================
+RATE_LIMIT_SAFETY = float(os.getenv("RATE_LIMIT_SAFETY", 0.8))
+RATE_LIMIT_SHARE = 1 / SHARD_COUNT if SHARD_SHARED_IP == "on" else 1
+RATE_LIMIT_SCALE = RATE_LIMIT_SAFETY * RATE_LIMIT_SHARE  # our part of a limit
+RATE_LIMITS = {
+    ex: (capacity * RATE_LIMIT_SCALE, period)
+    for ex, (capacity, period) in {
+        "BINANCE_GLOBAL": (6000, 60),  # request weight per minute
+        "BINANCE_US": (1200, 60),  # request weight per minute
+        "OKX": (40, 2),  # market/books: 40 requests per 2 secs
+        "DYDX": (100, 10),  # public endpoints per IP
+        "COINBASE": (10, 1),  # public endpoints: 10 requests per sec
+    }.items()
+}
+REQUEST_WEIGHTS = {
+    "BINANCE_GLOBAL": 5,  # depth limit 1-100
+    "BINANCE_US": 1,  # depth limit 1-100
+    "OKX": 1,
+    "DYDX": 1,
+    "COINBASE": 1,
+}
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", 0.5))  # secs
+
+# =============================================================================
+# FETCH MODE: "single" (one orderbook request per market) or "batched" (one
+# bulk top-of-book request per venue and tick, shared by all markets).
+# Batched books only have the top level: on the bulk venues the VWAP
+# executable spreads are nan for every EXEC_SIZES notional beyond it
+# =============================================================================
+FETCH_MODE = os.getenv("FETCH_MODE", "single")
+BATCH_MAX_AGE = float(os.getenv("BATCH_MAX_AGE", 1.0))  # secs to reuse bulk data
+BULK_REQUEST_WEIGHTS = {
+    "BINANCE_GLOBAL": 4,  # ticker/bookTicker without symbol
+    "BINANCE_US": 4,
+    "OKX": 1,  # market/tickers
+}
+
+# =============================================================================
+# TICK PIPELINE: "staged" runs store & analysis stages on their own workers
+# behind PIPELINE_QUEUE_SIZE tick queues, "inline" on the tick thread
+# =============================================================================
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "staged")
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 64))  # ticks
+
+# =============================================================================
+# FETCH SYNC: "off" or "barrier" (wake FETCH_SYNC_LEAD secs early, prepare all
+# requests, send them together on the grid point). HTTP_POOL_SIZE: keep-alive
+# connections per venue.
+# =============================================================================
+FETCH_SYNC = os.getenv("FETCH_SYNC", "off")
+FETCH_SYNC_LEAD = float(os.getenv("FETCH_SYNC_LEAD", 0.05))  # secs
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 32))
+
+# =============================================================================
+# HEDGED REQUESTS: with HEDGE_MODE "on", a request that hasn't answered after
+# the venue's HEDGE_PERCENTILE latency is duplicated to an alternate host
+# (round robin), first answer wins. Hedges are capped at HEDGE_MAX_RATE of
+# the venue's last HEDGE_WINDOW requests. HEDGE_HOSTS_<EXCHANGE>: comma
+# separated scheme://host, empty = never hedge that venue.
+# =============================================================================
+HEDGE_MODE = os.getenv("HEDGE_MODE", "off")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", 95))
+HEDGE_MAX_RATE = float(os.getenv("HEDGE_MAX_RATE", 0.1))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", 50))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", 500))  # requests per venue
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", 32))
+HEDGE_HOSTS = {
+    ex: [h for h in os.getenv(f"HEDGE_HOSTS_{ex}", hosts).split(",") if h]
+    for ex, hosts in {
+        "BINANCE_GLOBAL": "https://api1.binance.com,https://api2.binance.com,https://api3.binance.com,https://api-gcp.binance.com",
+        "BINANCE_US": "",
+        "OKX": "https://aws.okx.com",
+        "DYDX": "",
+        "COINBASE": "",
+    }.items()
+}
+
+# =============================================================================
+# SHARED MEMORY: latest quotes & pair spreads of every market, for readers on
+# this host (classes/SharedQuotes.py), segment name SHM_PREFIX + market.
+# Opt-in: SHM_PUBLISH=on
+# =============================================================================
+SHM_PUBLISH = os.getenv("SHM_PUBLISH", "off")
+SHM_PREFIX = os.getenv(
+    "SHM_PREFIX", "arbq_" if SHARD_COUNT == 1 else f"arbq{SHARD_INDEX}_"
+)
+
+# =============================================================================
+# TICK REPORTER: "quiet", "info" or "debug". `kill -USR1 <pid>` dumps all data
+# =============================================================================
+REPORT_LEVEL = os.getenv("REPORT_LEVEL", "info")
+REPORT_EVERY_N_TICKS = int(os.getenv("REPORT_EVERY_N_TICKS", 1))
+REPORT_MAX_LINES_PER_MIN = int(os.getenv("REPORT_MAX_LINES_PER_MIN", 60))
+
+# =============================================================================
+# PROFILING: `kill -USR2 <pid>` or GET /profile?ticks=20&mode=cprofile,sample
+# modes: "cprofile", "sample" (all threads) and "tracemalloc"
+# =============================================================================
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_TICKS = int(os.getenv("PROFILE_TICKS", 20))
+PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile,tracemalloc")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))  # secs
+
+# =============================================================================
+# EOD UPLOADS: compression is "none", "gzip" or "zstd" (needs zstandard).
+# Compressed objects keep their .csv keys (Content-Encoding says how), so
+# only turn it on if every consumer decompresses like HistoricalLoader does
+# =============================================================================
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 8))  # S3 sink threads
+UPLOAD_COMPRESSION = os.getenv("UPLOAD_COMPRESSION", "none")
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", 3))
+
+# =============================================================================
+# OUTPUT SINKS: comma separated "s3", "local" (files) and "queue" (append-only
+# outbox file), written in the background from bounded queues
+# =============================================================================
+SINKS = os.getenv("SINKS", "s3")
+SINK_LOCAL_DIR = os.getenv("SINK_LOCAL_DIR", "data")
+SINK_QUEUE_PATH = os.getenv("SINK_QUEUE_PATH", "outbox/outbox.log")
+SINK_QUEUE_SIZE = int(os.getenv("SINK_QUEUE_SIZE", 256))  # jobs per sink
+SINK_SUBMIT_TIMEOUT = float(os.getenv("SINK_SUBMIT_TIMEOUT", 30))  # secs
+
 # =============================================================================
 # AWS CONFIG
 # =============================================================================
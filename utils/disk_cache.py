@@ -0,0 +1,115 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import os, json, time, hashlib, threading
+
+
+# =============================================================================
+# Size-bounded local file cache with LRU eviction, entries remember their ETag
+# so callers can validate them against S3 before use.
+# Hits only touch last_access in memory, the index is written on put/evict
+# and at most every FLUSH_SECS for hits (lost access times only age an entry).
+# =============================================================================
+class DiskCache:
+    INDEX_FILE = "index.json"
+    FLUSH_SECS = 30
+
+    def __init__(self, root: str, max_mb: float):
+        self.root = root
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.index = self.load_index()
+        self.dirty = False  # access times not written yet
+        self.saved_at = time.monotonic()
+
+    # =============================================================================
+    # Path of cached key if the ETag still matches, else None
+    # =============================================================================
+    def get(self, key: str, etag: str):
+        with self.lock:
+            entry = self.index.get(key)
+            if entry is None or entry["etag"] != etag:
+                return None
+            path = self.determine_path(key)
+            if not os.path.exists(path):
+                del self.index[key]
+                return None
+            entry["last_access"] = time.time()
+            self.dirty = True
+            if time.monotonic() - self.saved_at > self.FLUSH_SECS:
+                self.save_index()
+            return path
+
+    # =============================================================================
+    # Write pending access times, e.g. at the end of a load
+    # =============================================================================
+    def flush(self):
+        with self.lock:
+            if self.dirty:
+                self.save_index()
+
+    # =============================================================================
+    # Add/replace key in cache, evict least recently used entries if too large
+    # =============================================================================
+    def put(self, key: str, body: bytes, etag: str) -> str:
+        path = self.determine_path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)  # readers never see half written files
+        with self.lock:
+            self.index[key] = {
+                "etag": etag,
+                "size": len(body),
+                "last_access": time.time(),
+            }
+            self.evict_least_recently_used(keep=key)
+            self.save_index()
+        return path
+
+    # =============================================================================
+    # Drop oldest entries until cache fits into max_bytes
+    # =============================================================================
+    def evict_least_recently_used(self, keep: str):
+        total = sum(e["size"] for e in self.index.values())
+        by_age = sorted(self.index.items(), key=lambda kv: kv[1]["last_access"])
+        for key, entry in by_age:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(self.determine_path(key))
+            except FileNotFoundError:
+                pass
+            total -= entry["size"]
+            del self.index[key]
+
+    # =============================================================================
+    # Cached files are named by key hash, keys contain slashes
+    # =============================================================================
+    def determine_path(self, key: str) -> str:
+        name = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.root, name)
+
+    # =============================================================================
+    # Index survives restarts
+    # =============================================================================
+    def load_index(self) -> dict:
+        path = os.path.join(self.root, self.INDEX_FILE)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except ValueError:
+            return {}  # corrupt index, start over
+
+    def save_index(self):
+        path = os.path.join(self.root, self.INDEX_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.index, f)
+        os.replace(path + ".tmp", path)
+        self.dirty = False
+        self.saved_at = time.monotonic()
@@ -0,0 +1,104 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import os, json, base64, hashlib, threading
+from io import BytesIO
+from botocore.exceptions import ClientError
+
+
+# =============================================================================
+# Minimal local stand-in for the boto3 S3 client, objects live in a folder.
+# Only the calls this repo uses: put_object, get_object, head_object,
+# list_objects_v2. Lets loaders & uploaders run without AWS.
+# =============================================================================
+class LocalS3:
+    def __init__(self, root: str):
+        self.root = root
+        self.lock = threading.Lock()
+        self.calls = {"put_object": 0, "get_object": 0, "head_object": 0}
+
+    # =============================================================================
+    # Write object + metadata sidecar
+    # =============================================================================
+    def put_object(self, Bucket: str, Key: str, Body, **kwargs) -> dict:
+        body = Body.encode() if isinstance(Body, str) else bytes(Body)
+        md5 = hashlib.md5(body)
+        if "ContentMD5" in kwargs:
+            if base64.b64encode(md5.digest()).decode() != kwargs["ContentMD5"]:
+                err = {"Error": {"Code": "BadDigest", "Message": "Content-MD5"}}
+                raise ClientError(err, "PutObject")
+        etag = f'"{md5.hexdigest()}"'
+        meta = {
+            "ETag": etag,
+            "ContentLength": len(body),
+            "ContentEncoding": kwargs.get("ContentEncoding"),
+            "ContentType": kwargs.get("ContentType"),
+            "Metadata": kwargs.get("Metadata", {}),
+        }
+        path = self.determine_path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.lock:
+            self.calls["put_object"] += 1
+            with open(path, "wb") as f:
+                f.write(body)
+            with open(path + ".meta", "w") as f:
+                json.dump(meta, f)
+        return {"ETag": etag, "ResponseMetadata": {"HTTPStatusCode": 200}}
+
+    # =============================================================================
+    # Read object, Body mimics the StreamingBody `.read()`
+    # =============================================================================
+    def get_object(self, Bucket: str, Key: str, **kwargs) -> dict:
+        meta = self.head_object(Bucket, Key, count=False)
+        with self.lock:
+            self.calls["get_object"] += 1
+        with open(self.determine_path(Bucket, Key), "rb") as f:
+            meta["Body"] = BytesIO(f.read())
+        return meta
+
+    # =============================================================================
+    # Object metadata only, raises 404 ClientError like boto3
+    # =============================================================================
+    def head_object(self, Bucket: str, Key: str, count: bool = True, **kwargs) -> dict:
+        path = self.determine_path(Bucket, Key)
+        if count:
+            with self.lock:
+                self.calls["head_object"] += 1
+        if not os.path.exists(path + ".meta"):
+            err = {"Error": {"Code": "404", "Message": f"Not Found: {Key}"}}
+            raise ClientError(err, "HeadObject")
+        with open(path + ".meta") as f:
+            meta = json.load(f)
+        meta = {k: v for k, v in meta.items() if v is not None}
+        meta["ResponseMetadata"] = {"HTTPStatusCode": 200}
+        return meta
+
+    # =============================================================================
+    # List keys under prefix (no pagination needed locally)
+    # =============================================================================
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", **kwargs) -> dict:
+        base = os.path.join(self.root, Bucket)
+        contents = []
+        for folder, _, files in os.walk(base):
+            for name in files:
+                if name.endswith(".meta"):
+                    continue
+                key = os.path.relpath(os.path.join(folder, name), base)
+                key = key.replace(os.sep, "/")
+                if key.startswith(Prefix):
+                    meta = self.head_object(Bucket, key, count=False)
+                    contents.append(
+                        {
+                            "Key": key,
+                            "ETag": meta["ETag"],
+                            "Size": meta["ContentLength"],
+                        }
+                    )
+        contents.sort(key=lambda c: c["Key"])
+        return {"Contents": contents, "KeyCount": len(contents), "IsTruncated": False}
+
+    # =============================================================================
+    # Local file path of an object
+    # =============================================================================
+    def determine_path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, *key.split("/"))
@@ -0,0 +1,107 @@
+# =============================================================================
+# S3 key scheme, shared by the puller (writes) and the loaders (reads)
+#   raw:  {exchange}/{market}/{exchange}-{market}-{YYYY-MM-DD}.csv
+#   diff: Difference/{market}/{YYYY-MM-DD}/{ex0}-{ex1}_{market}_{YYYY-MM-DD}.csv
+#   shard: Shards/{market}/{YYYY-MM-DD}/{exchange}-{market}-{YYYY-MM-DD}-shard{i}of{k}.csv
+#   sketch: Sketches/{market}/{YYYY-MM-DD}/{market}_{YYYY-MM-DD}.csv
+#   lead-lag: LeadLag/{market}/{YYYY-MM-DD}/{market}_{YYYY-MM-DD}.csv
+#   ticks: Ticks/{market}/{YYYY-MM-DD}/{market}_{YYYY-MM-DD}.csv (delta mode)
+#   changes: Changes/{market}/{YYYY-MM-DD}/{exchange}-{market}-{YYYY-MM-DD}.csv
+#            (delta mode: changed rows only, instead of the raw key)
+#   bars: Bars/{market}/{YYYY-MM-DD}/{market}_{YYYY-MM-DD}_{resolution}.csv
+# =============================================================================
+
+
+# =============================================================================
+# Base path of raw exchange data, date gets appended
+# =============================================================================
+def create_raw_base_path(exchange: str, market: str) -> str:
+    return f"{exchange}/{market}/{exchange}-{market}"
+
+
+# =============================================================================
+# Full key of raw exchange data for a date
+# =============================================================================
+def create_raw_key(exchange: str, market: str, date: str) -> str:
+    return f"{create_raw_base_path(exchange, market)}-{date}.csv"
+
+
+# =============================================================================
+# Raw data of one phase shifted instance, merged into the raw key by shard 0
+# =============================================================================
+def create_raw_shard_key(exchange, market, date, index: int, count: int) -> str:
+    name = f"{exchange}-{market}-{date}-shard{index}of{count}.csv"
+    return f"Shards/{market}/{date}/{name}"
+
+
+# =============================================================================
+# Tick grid of a market for a date when raw data holds changed rows only
+# =============================================================================
+def create_ticks_key(market: str, date: str) -> str:
+    return f"Ticks/{market}/{date}/{market}_{date}.csv"
+
+
+# =============================================================================
+# Changed rows of an exchange for a date saved by a delta store. Not under the
+# raw key: readers of raw data would get sparse rows without intervals
+# =============================================================================
+def create_changes_key(exchange: str, market: str, date: str) -> str:
+    return f"Changes/{market}/{date}/{exchange}-{market}-{date}.csv"
+
+
+# =============================================================================
+# Spread quantile sketches of all pairs of a market for a date
+# =============================================================================
+def create_sketch_key(market: str, date: str) -> str:
+    return f"Sketches/{market}/{date}/{market}_{date}.csv"
+
+
+# =============================================================================
+# Sketches of one shard, merged into the sketch key by shard 0
+# =============================================================================
+def create_sketch_shard_key(market, date, index: int, count: int) -> str:
+    return f"Shards/{market}/{date}/sketches-{market}-{date}-shard{index}of{count}.csv"
+
+
+# =============================================================================
+# Lead-lag of all pairs of a market for a date
+# =============================================================================
+def create_lead_lag_key(market: str, date: str) -> str:
+    return f"LeadLag/{market}/{date}/{market}_{date}.csv"
+
+
+# =============================================================================
+# OHLC bars of all mids & spreads of a market for a date at one resolution
+# =============================================================================
+def create_bars_key(market: str, date: str, resolution: str) -> str:
+    return f"Bars/{market}/{date}/{market}_{date}_{resolution}.csv"
+
+
+# =============================================================================
+# Folder holding all diff objects of a market for a date
+# =============================================================================
+def create_diff_base_path(market: str, date: str) -> str:
+    return f"Difference/{market}/{date}"
+
+
+# =============================================================================
+# Full key of the diff data of an exchange pair for a date
+# =============================================================================
+def create_diff_key(pair: str, market: str, date: str) -> str:
+    return f"{create_diff_base_path(market, date)}/{pair}_{market}_{date}.csv"
+
+
+# =============================================================================
+# Monthly compacted parquet, hive style partitions
+#   Compacted/{kind}/market={market}/{col}={name}/month={YYYY-MM}/part.parquet
+# =============================================================================
+def create_compacted_key(kind: str, market: str, name: str, month: str) -> str:
+    col = "exchange" if kind == "raw" else "pair"
+    return f"Compacted/{kind}/market={market}/{col}={name}/month={month}/part.parquet"
+
+
+# =============================================================================
+# Min/max statistics sidecar of all compacted files of a market
+# =============================================================================
+def create_compacted_index_key(market: str) -> str:
+    return f"Compacted/index/{market}.json"
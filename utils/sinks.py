@@ -0,0 +1,177 @@
+# =============================================================================
+# IMPORTS
+# =============================================================================
+import os, json, time, base64, hashlib, threading
+from io import StringIO
+from botocore.exceptions import ClientError
+
+# =============================================================================
+# FILE IMPORTS
+# =============================================================================
+from utils.compression import compress, decompress
+
+EXTENSIONS = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+
+
+# =============================================================================
+# One object to persist. Serialized + compressed once, on first use, by
+# whichever sink gets to it first; all sinks share the same bytes.
+# =============================================================================
+class Payload:
+    def __init__(self, key: str, df, encoding: str):
+        self.key = key
+        self.df = df
+        self.encoding = encoding
+        self.lock = threading.Lock()
+        self.body = None
+
+    def serialize(self):
+        with self.lock:
+            if self.body is None:
+                csv_buffer = StringIO()
+                self.df.to_csv(csv_buffer)
+                raw = csv_buffer.getvalue().encode()
+                self.raw_bytes = len(raw)
+                self.body = compress(raw, self.encoding)
+                self.md5 = hashlib.md5(self.body)
+                self.df = None  # bytes are all we need from here on
+        return self.body
+
+
+# =============================================================================
+# S3 put with Content-MD5 (S3 rejects corrupted bodies) and ETag check.
+# Same key + same body => retrying is idempotent.
+# =============================================================================
+class S3Sink:
+    name = "s3"
+
+    def __init__(self, s3, bucket: str, workers: int):
+        self.s3 = s3
+        self.bucket = bucket
+        self.workers = workers
+
+    def write(self, payload: Payload):
+        body = payload.serialize()
+        kwargs = {
+            "ContentType": "text/csv",
+            "ContentMD5": base64.b64encode(payload.md5.digest()).decode(),
+        }
+        if payload.encoding != "none":
+            kwargs["ContentEncoding"] = payload.encoding
+        res = self.s3.put_object(
+            Bucket=self.bucket, Key=payload.key, Body=body, **kwargs
+        )
+        status = res["ResponseMetadata"]["HTTPStatusCode"]
+        if status != 200:
+            raise Exception(f"S3 answered with status code {status}")
+        etag, md5 = res.get("ETag", "").strip('"'), payload.md5.hexdigest()
+        if len(etag) == 32 and etag != md5:  # KMS etags aren't md5s
+            raise Exception(f"Checksum mismatch: ETag {etag} != md5 {md5}")
+
+    # =============================================================================
+    # Decompressed body of key, None if it doesn't exist (yet)
+    # =============================================================================
+    def read(self, key: str):
+        try:
+            res = self.s3.get_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ["404", "NoSuchKey"]:
+                return None
+            raise
+        return decompress(res["Body"].read(), res.get("ContentEncoding"))
+
+
+# =============================================================================
+# Files under root/{key}{.gz|.zst}, written to a temp file and renamed so a
+# reader never sees half a file
+# =============================================================================
+class LocalFsSink:
+    name = "local"
+
+    def __init__(self, root: str, workers: int = 1):
+        self.root = root
+        self.workers = workers
+
+    def write(self, payload: Payload):
+        body = payload.serialize()
+        path = os.path.join(self.root, payload.key + EXTENSIONS[payload.encoding])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+
+    def read(self, key: str):
+        for encoding, extension in EXTENSIONS.items():
+            path = os.path.join(self.root, key + extension)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    return decompress(f.read(), encoding)
+        return None
+
+
+# =============================================================================
+# Append-only outbox file, e.g. to ship later or replay into another sink.
+# Record: json header line {key, encoding, bytes, md5, ts} + body + "\n"
+# =============================================================================
+class LocalQueueSink:
+    name = "queue"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.workers = 1  # appends have to be serialized anyway
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def write(self, payload: Payload):
+        body = payload.serialize()
+        header = {
+            "key": payload.key,
+            "encoding": payload.encoding,
+            "bytes": len(body),
+            "md5": payload.md5.hexdigest(),
+            "ts": time.time(),
+        }
+        record = json.dumps(header).encode() + b"\n" + body + b"\n"
+        with self.lock:
+            with open(self.path, "ab") as f:
+                f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def read(self, key: str):
+        return None  # no lookups by key, see read_queue
+
+
+# =============================================================================
+# Yield (header, body) of every complete record in a queue file
+# =============================================================================
+def read_queue(path: str):
+    with open(path, "rb") as f:
+        while True:
+            line = f.readline()
+            if not line:
+                return
+            header = json.loads(line)
+            body = f.read(header["bytes"])
+            if len(body) < header["bytes"] or f.read(1) != b"\n":
+                return  # torn last record of a crashed writer
+            yield header, body
+
+
+# =============================================================================
+# "s3,local" -> [S3Sink, LocalFsSink]
+# =============================================================================
+def create_sinks(names: str, s3, bucket, local_dir, queue_path, s3_workers) -> list:
+    sinks = []
+    for name in [n.strip() for n in names.split(",") if n.strip()]:
+        if name == "s3":
+            sinks.append(S3Sink(s3, bucket, s3_workers))
+        elif name == "local":
+            sinks.append(LocalFsSink(local_dir))
+        elif name == "queue":
+            sinks.append(LocalQueueSink(queue_path))
+        else:
+            raise ValueError(f"Unknown sink {name}, choose from s3, local, queue")
+    return sinks
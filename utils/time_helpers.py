@@ -1,18 +1,51 @@
 import datetime as dt
 import time
 
+# =============================================================================
+# Simulated clock for time-compressed runs (soak tests): sim time starts at
+# `start` and runs `scale` times faster than the wall clock. None = real time.
+# =============================================================================
+_sim_clock = None
+
+
+def set_simulated_clock(start: dt.datetime, scale: float, real: float = None):
+    global _sim_clock
+    start = start.replace(tzinfo=dt.timezone.utc).timestamp()  # start is UTC
+    real = time.time() if real is None else real  # processes can share one
+    _sim_clock = {"start": start, "real": real, "scale": scale}
+
+
+# =============================================================================
+# How many simulated secs pass per real sec
+# =============================================================================
+def determine_time_scale() -> float:
+    return 1.0 if _sim_clock is None else _sim_clock["scale"]
+
+
+# =============================================================================
+# Epoch seconds, simulated if a simulated clock is set
+# =============================================================================
+def determine_cur_epoch() -> float:
+    if _sim_clock is None:
+        return time.time()
+    elapsed = (time.time() - _sim_clock["real"]) * _sim_clock["scale"]
+    return _sim_clock["start"] + elapsed
+
+
 # =============================================================================
 # Generate cur datetime object
 # =============================================================================
 def determine_cur_utc_timestamp() -> dt.datetime:
-    return dt.datetime.utcnow()
+    if _sim_clock is None:
+        return dt.datetime.utcnow()
+    return dt.datetime.utcfromtimestamp(determine_cur_epoch())
 
 
 # =============================================================================
 # Generate cur datetime object, convert to string
 # =============================================================================
 def determine_cur_utc_timestamp_as_str() -> str:
-    return dt.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    return determine_cur_utc_timestamp().strftime("%Y-%m-%d %H:%M:%S")
 
 
 # =============================================================================
@@ -42,10 +75,11 @@ def determine_if_new_day(midnight: dt.datetime) -> bool:
 
 
 # =============================================================================
-# Sleep until top of minute, hour, etc
+# Sleep until top of minute, hour, etc (+ offset secs, for phase shifted shards)
 # =============================================================================
-def sleep_to_desired_interval(interval: int):
-    time.sleep(float(interval) - (time.time() % float(interval)))
+def sleep_to_desired_interval(interval: int, offset: float = 0.0):
+    secs = float(interval) - ((determine_cur_epoch() - offset) % float(interval))
+    time.sleep(secs / determine_time_scale())
 
 
 # =============================================================================